@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+"""
+UniCurses benchmarks.
+
+Run the suite with `python -m benchmarks` from the repository root; see
+benchmarks/suite.py. The suite runs on the headless backend so no terminal
+is needed.
+"""
+
+import os
+
+# Must be set before unicurses is first imported
+os.environ.setdefault("UNICURSES_BACKEND", "headless")
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark: redrawing a grid cell-by-cell versus with draw_batch().
+
+Draws a ROWS x COLS grid of single-character cells, alternating attributes
+every 8 columns, to a no-op window so only the Python-side cost is measured.
+
+Usage: python benchmarks/bench_batch.py [rows] [cols]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import unicurses as uni
+
+
+class NullWindow(object):
+    """Window stand-in whose methods do nothing."""
+    def addstr(self, *args):
+        return None
+
+
+def make_ops(rows, cols):
+    attrs = (uni.A_NORMAL, uni.A_BOLD)
+    return [(y, x, ".", attrs[(x // 8) % 2])
+            for y in range(rows) for x in range(cols)]
+
+
+def per_cell(win, ops):
+    for y, x, text, attr in ops:
+        uni.mvwaddstr(win, y, x, text, attr)
+
+
+def run(rows=60, cols=200):
+    """Return (per_cell_ms, batch_ms) for one full-grid redraw."""
+    win = NullWindow()
+    ops = make_ops(rows, cols)
+    cell = min(timeit.repeat(lambda: per_cell(win, ops), number=10, repeat=5)) / 10
+    batch = min(timeit.repeat(lambda: uni.draw_batch(win, ops),
+                              number=10, repeat=5)) / 10
+    return (cell * 1e3, batch * 1e3)
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    cols = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    cell, batch = run(rows, cols)
+    print("{0}x{1} grid: per-cell {2:.2f} ms, draw_batch {3:.2f} ms ({4:.1f}x)".format(
+        cols, rows, cell, batch, cell / batch))
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark: per-call cost of the unicurses wrapper dispatch.
+
+Compares the unified wrappers (which branch on the backend on every call)
+against the backend-specialised wrappers installed by ucs_bind_backend().
+The calls go to a no-op window object so only the Python-side wrapper cost
+is measured; no terminal is needed.
+
+Usage: python benchmarks/bench_dispatch.py [calls]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import unicurses as uni
+
+
+class NullWindow(object):
+    """Window stand-in whose methods do nothing."""
+    def addstr(self, *args):
+        return None
+
+    def addch(self, *args):
+        return None
+
+    def attron(self, attr):
+        return None
+
+
+CASES = [
+    ("mvwaddstr", "uni.mvwaddstr(win, 1, 2, 'label')"),
+    ("mvwaddstr+attr", "uni.mvwaddstr(win, 1, 2, 'label', uni.A_BOLD)"),
+    ("waddch", "uni.waddch(win, 65)"),
+    ("wattron", "uni.wattron(win, uni.A_BOLD)"),
+    ]
+
+
+def run(calls=200000):
+    """Return [(case, unified_ns, bound_ns)] per-call timings."""
+    env = {"uni": uni, "win": NullWindow()}
+    results = []
+    for name, stmt in CASES:
+        uni.ucs_unbind_backend()
+        unified = min(timeit.repeat(stmt, globals=env, number=calls, repeat=5))
+        uni.ucs_bind_backend()
+        bound = min(timeit.repeat(stmt, globals=env, number=calls, repeat=5))
+        results.append((name, unified / calls * 1e9, bound / calls * 1e9))
+    return results
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    print("{0:<16}{1:>14}{2:>14}{3:>10}".format(
+        "call", "unified ns", "bound ns", "speedup"))
+    for name, unified, bound in run(n):
+        print("{0:<16}{1:>14.1f}{2:>14.1f}{3:>9.2f}x".format(
+            name, unified, bound, unified / bound))
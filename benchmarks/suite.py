@@ -0,0 +1,511 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite for the unicurses wrapper and uniwidgets hot paths.
+
+Usage:
+    python -m benchmarks [-o results.json] [-c baseline.json] [-t 1.25]
+                         [-k name-filter] [--quick]
+
+Every benchmark reports the best time per operation in seconds. Results are
+written as JSON; with --compare, each result is checked against a baseline
+file and the exit status is 1 if any benchmark is slower than the baseline
+by more than the --threshold ratio.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+from itertools import count
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "widgets"))
+
+import benchmarks  # noqa: sets the headless backend before unicurses loads
+import unicurses as uni
+
+LINES = 60
+COLS = 300
+
+# name -> setup function returning (callable, description)
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """Registers a setup function under `name`."""
+    def register(setup):
+        BENCHMARKS.append((name, setup))
+        return setup
+    return register
+
+
+def _screen():
+    """The shared virtual terminal, initialised on first use."""
+    if uni.HEADLESS:
+        uni.curses.configure(lines=LINES, cols=COLS)
+    return uni.initscr()
+
+
+def _window():
+    import uniwidgets
+    if not hasattr(_window, "win"):
+        _screen()
+        _window.win = uniwidgets.Window()
+    return _window.win
+
+
+# +++ WRAPPER OVERHEAD +++
+
+@benchmark("wrapper.mvwaddstr")
+def _bench_mvwaddstr():
+    win = uni.newwin(3, 40, 0, 0)
+    return lambda: uni.mvwaddstr(win, 1, 2, "label")
+
+
+@benchmark("wrapper.waddch")
+def _bench_waddch():
+    win = uni.newwin(3, 40, 0, 0)
+    # Writes past the last cell scroll instead of failing
+    uni.scrollok(win, True)
+    return lambda: uni.waddch(win, 65)
+
+
+@benchmark("wrapper.mvwaddch")
+def _bench_mvwaddch():
+    win = uni.newwin(3, 40, 0, 0)
+    return lambda: uni.mvwaddch(win, 1, 2, 65)
+
+
+@benchmark("wrapper.wattron")
+def _bench_wattron():
+    win = uni.newwin(3, 40, 0, 0)
+    return lambda: uni.wattron(win, uni.A_BOLD)
+
+
+@benchmark("wrapper.encode")
+def _bench_encode():
+    # The per-call encode of the PDCurses string path, without the cache
+    labels = ["File", "Edit", "Options", "Help", "Column header"]
+    return lambda: [uni.CSTR(label) for label in labels]
+
+
+@benchmark("wrapper.encode_cached")
+def _bench_encode_cached():
+    labels = ["File", "Edit", "Options", "Help", "Column header"]
+    return lambda: [uni._cstr(label) for label in labels]
+
+
+# +++ FULL-SCREEN FILLS +++
+
+@benchmark("fill.rows")
+def _bench_fill_rows():
+    win = uni.newwin(LINES, COLS, 0, 0)
+    row = "x" * (COLS - 1)
+
+    def fill():
+        for y in range(LINES):
+            uni.mvwaddstr(win, y, 0, row)
+    return fill
+
+
+@benchmark("fill.cells")
+def _bench_fill_cells():
+    win = uni.newwin(LINES, COLS, 0, 0)
+
+    ops = _cell_ops()
+
+    def fill():
+        for y, x, text, attr in ops:
+            uni.mvwaddstr(win, y, x, text, attr)
+    return fill
+
+
+@benchmark("fill.draw_batch")
+def _bench_fill_batch():
+    win = uni.newwin(LINES, COLS, 0, 0)
+    ops = _cell_ops()
+    return lambda: uni.draw_batch(win, ops)
+
+
+def _cell_ops():
+    """Two-character cells covering the screen, attribute changing every 8 columns."""
+    attrs = (uni.A_NORMAL, uni.A_BOLD)
+    return [(y, x, "ab", attrs[(x // 8) % 2])
+            for y in range(LINES) for x in range(0, COLS - 2, 2)]
+
+
+# +++ WIDGETS +++
+
+@benchmark("widget.box_render")
+def _bench_box():
+    import uniwidgets
+    box = uniwidgets.Box(_window(), 0, 0, 10, 40, label="Box")
+    for i in range(6):
+        box.add_content("content line %d" % i)
+    return box.render
+
+
+def _textbox(n, store=False):
+    def setup():
+        import uniwidgets
+        textbox = uniwidgets.Textbox(
+            _window(), 0, 3, 20, 60, label="Text",
+            store=uniwidgets.LineStore() if store else None)
+        for i in range(n):
+            textbox.add_line("log line %d" % i)
+        return textbox.render
+    return setup
+
+
+for _n in (10, 1000, 10000, 100000):
+    benchmark("widget.textbox_render[%d]" % _n)(_textbox(_n))
+    benchmark("widget.textbox_render_store[%d]" % _n)(_textbox(_n, store=True))
+
+
+def _menubar(n):
+    def setup():
+        import uniwidgets
+        menu = uniwidgets.Menubar(_window(), label="Menu")
+        for i in range(n):
+            menu.add_submenu("Menu%02d" % i, {"Open": None, "Close": None})
+        return menu.render
+    return setup
+
+
+for _n in (2, 8, 32):
+    benchmark("widget.menubar_render[%d]" % _n)(_menubar(_n))
+
+
+@benchmark("widget.scrollview_scroll")
+def _bench_scrollview():
+    import uniwidgets
+    view = uniwidgets.ScrollView(_window(), 0, 3, 20, 60, label="Scroll")
+    for i in range(10000):
+        view.add_line("log line %d" % i)
+    view.render()
+
+    def scroll():
+        view.scroll(1)
+        if view.top == view.content_height - view.rows:
+            view.jump(0)
+    return scroll
+
+
+@benchmark("widget.fileview_page")
+def _bench_fileview():
+    import tempfile
+    import uniwidgets
+    with tempfile.NamedTemporaryFile("w", suffix=".log", delete=False) as f:
+        for i in range(100000):
+            f.write("log line %d\n" % i)
+    view = uniwidgets.FileView(_window(), 0, 3, 20, 60, f.name,
+                               background=False)
+    try:
+        os.unlink(f.name)  # stays mapped
+    except OSError:  # Windows keeps open files
+        pass
+
+    def page():
+        view.page(1)
+        if view.offset == view._last_page():
+            view.jump(0)
+        view.render()
+    return page
+
+
+@benchmark("widget.pane_updates")
+def _bench_pane_updates():
+    # 36 boxed panes whose last line changes every frame; only content changes
+    import uniwidgets
+    panes = [uniwidgets.Box(_window(), (i % 6) * 50, (i // 6) * 10, 10, 50,
+                            label="Pane %d" % i) for i in range(36)]
+    for pane in panes:
+        pane.content = ["status: ok", "load: 0.5", "tick"]
+    tick = count()
+
+    def update():
+        line = "tick %d" % next(tick)
+        for pane in panes:
+            pane.content[-1] = line
+            pane.render()
+    return update
+
+
+# +++ LAYOUT +++
+# A dashboard: header, 6x6 grid of panes with three widgets each, footer
+
+def _dashboard():
+    import uniwidgets
+
+    class Stub(object):
+        pass
+    grid = uniwidgets.Grid(6, 6, spacing=1)
+    for row in range(6):
+        for col in range(6):
+            grid.place(uniwidgets.Column(
+                uniwidgets.LayoutItem(Stub(), size=1), Stub(),
+                uniwidgets.LayoutItem(Stub(), max_size=4)), row, col)
+    leaf = grid.children[-1].children[0]
+    root = uniwidgets.Column(uniwidgets.LayoutItem(Stub(), size=3), grid,
+                             uniwidgets.LayoutItem(Stub(), size=1))
+    root.solve((0, 0, LINES, COLS))
+    return root, leaf
+
+
+@benchmark("layout.resize")
+def _bench_layout_resize():
+    root, leaf = _dashboard()
+    sizes = [(0, 0, LINES, COLS), (0, 0, LINES - 1, COLS - 1)]
+
+    def resize():
+        sizes.reverse()
+        root.solve(sizes[0])
+    return resize
+
+
+@benchmark("layout.update_leaf")
+def _bench_layout_update():
+    root, leaf = _dashboard()
+    rect = (0, 0, LINES, COLS)
+
+    def update():
+        leaf.update(size=3 - leaf.min_size)
+        root.solve(rect)
+    return update
+
+
+# +++ CELL BUFFER +++
+# A full redraw of a map where only the player moved between frames
+
+def _map_cells():
+    return [(y, x, "#" if (x + y) % 7 == 0 else ".")
+            for y in range(LINES) for x in range(COLS - 1)]
+
+
+@benchmark("cells.clear_redraw")
+def _bench_clear_redraw():
+    win = uni.newwin(LINES, COLS, 0, 0)
+    cells = _map_cells()
+
+    def redraw():
+        uni.werase(win)
+        for y, x, char in cells:
+            uni.mvwaddstr(win, y, x, char)
+        uni.mvwaddstr(win, 5, 5, "@")
+    return redraw
+
+
+@benchmark("cells.buffer_redraw")
+def _bench_buffer_redraw():
+    import uniwidgets
+    win = uni.newwin(LINES, COLS, 0, 0)
+    cells = _map_cells()
+    buf = uniwidgets.CellBuffer(LINES, COLS)
+    player = [0]
+
+    def redraw():
+        buf.clear()
+        for y, x, char in cells:
+            buf.put(y, x, char)
+        player[0] = (player[0] + 1) % 2
+        buf.put(5, 5 + player[0], "@")
+        buf.flush(win)
+    return redraw
+
+
+# +++ THEMES +++
+# Switching between two themes on a window of 100 boxes: compiles the styles
+# and re-renders the boxes whose styles changed
+
+@benchmark("theme.switch")
+def _bench_theme_switch():
+    import uniwidgets
+    win = uniwidgets.Window()
+    win.widgets = [uniwidgets.Box(win, (i % 10) * 30, (i // 10) * 6, 6, 30,
+                                  label="Box %d" % i) for i in range(100)]
+    themes = [uniwidgets.Theme("plain"),
+              uniwidgets.Theme("bold", label=uni.A_BOLD,
+                               border=uniwidgets.Style("cyan", "blue"))]
+    flip = [0]
+
+    def switch():
+        flip[0] ^= 1
+        win.set_theme(themes[flip[0]])
+        win.draw()
+    return switch
+
+
+# +++ COLOR PAIRS +++
+# Per-cell colors of a heat map: 64 combinations, looked up for every cell
+
+@benchmark("colors.attr_hit")
+def _bench_color_hit():
+    import uniwidgets
+    _screen()
+    uni.start_color()
+    pairs = uniwidgets.ColorPairs()
+    combos = [(fg, bg) for fg in range(8) for bg in range(8)] * 50
+
+    def lookup():
+        for fg, bg in combos:
+            pairs.attr(fg, bg)
+    return lookup
+
+
+@benchmark("colors.attr_churn")
+def _bench_color_churn():
+    # 64 combinations through 16 pairs: every lookup recycles a pair
+    import uniwidgets
+    _screen()
+    uni.start_color()
+    pairs = uniwidgets.ColorPairs(limit=17)
+    combos = [(fg, bg) for fg in range(8) for bg in range(8)] * 50
+
+    def lookup():
+        for fg, bg in combos:
+            pairs.attr(fg, bg)
+    return lookup
+
+
+# +++ PANELS +++
+
+def _panels(n):
+    def setup():
+        _screen()
+        panels = []
+        for i in range(n):
+            win = uni.newwin(5, 20, i % (LINES - 5), (i * 7) % (COLS - 20))
+            uni.box(win)
+            panels.append(uni.new_panel(win))
+
+        def update():
+            uni.update_panels()
+        # Keep the panels alive for the duration of the benchmark
+        update.panels = panels
+        return update
+    return setup
+
+
+for _n in (10, 100):
+    benchmark("panels.update_panels[%d]" % _n)(_panels(_n))
+
+
+# +++ IMPORT TIME +++
+# Cold start of a fresh interpreter; compare with import.interpreter for the
+# cost of the import itself. The native backend is used where available.
+
+def _importer(statement):
+    def setup():
+        env = dict(os.environ)
+        env.pop("UNICURSES_BACKEND", None)
+        cmd = [sys.executable, "-c",
+               "import sys; sys.path[:0] = [%r, %r]; %s"
+               % (ROOT, os.path.join(ROOT, "widgets"), statement)]
+        with open(os.devnull, "w") as devnull:
+            if subprocess.call(cmd, env=env, stderr=devnull) != 0:
+                # No native backend here
+                env = os.environ
+        return lambda: subprocess.check_call(cmd, env=env)
+    return setup
+
+
+benchmark("import.interpreter")(_importer("pass"))
+benchmark("import.unicurses")(_importer("import unicurses"))
+benchmark("import.uniwidgets")(_importer("import uniwidgets"))
+
+
+# +++ RUNNER +++
+
+def measure(fn, min_time=0.2, repeat=5):
+    """Best seconds per call of fn, over `repeat` runs of at least min_time."""
+    number = 1
+    while True:
+        elapsed = timeit.timeit(fn, number=number)
+        if elapsed >= min_time / repeat or number >= 10 ** 7:
+            break
+        number *= 10
+    best = min(timeit.repeat(fn, number=number, repeat=repeat))
+    return best / number, number
+
+
+def run(pattern="", min_time=0.2):
+    """Runs the benchmarks whose names contain `pattern`; returns a result dict."""
+    _screen()
+    results = {}
+    for name, setup in BENCHMARKS:
+        if pattern not in name:
+            continue
+        fn = setup()
+        seconds, number = measure(fn, min_time=min_time)
+        results[name] = {"seconds": seconds, "number": number}
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "backend": "headless" if uni.HEADLESS else "native",
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+        "results": results,
+        }
+
+
+def compare(results, baseline, threshold):
+    """Returns [(name, ratio)] for benchmarks slower than threshold x baseline."""
+    regressions = []
+    for name, result in sorted(results["results"].items()):
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        ratio = result["seconds"] / base["seconds"]
+        if ratio > threshold:
+            regressions.append((name, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description=__doc__.split("\n")[1])
+    parser.add_argument("-o", "--output", help="write JSON results to this file")
+    parser.add_argument("-c", "--compare", help="baseline JSON results file")
+    parser.add_argument("-t", "--threshold", type=float, default=1.25,
+                        help="slowdown ratio counted as a regression (1.25)")
+    parser.add_argument("-k", "--filter", default="",
+                        help="only run benchmarks whose name contains this")
+    parser.add_argument("--quick", action="store_true",
+                        help="shorter timing runs (noisier)")
+    args = parser.parse_args(argv)
+
+    results = run(args.filter, min_time=0.05 if args.quick else 0.2)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    for name, result in sorted(results["results"].items()):
+        line = "{0:<34}{1:>12.2f} us".format(name, result["seconds"] * 1e6)
+        if baseline and name in baseline["results"]:
+            ratio = result["seconds"] / baseline["results"][name]["seconds"]
+            line += "{0:>9.2f}x".format(ratio)
+        sys.stderr.write(line + "\n")
+
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        for name, ratio in regressions:
+            sys.stderr.write("REGRESSION: {0} is {1:.2f}x slower than baseline\n".format(
+                name, ratio))
+        if regressions:
+            return 1
+    return 0
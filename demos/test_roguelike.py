@@ -1,5 +1,12 @@
+import os
+import sys
+
 from unicurses import *
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "widgets"))
+from uniwidgets import CellBuffer
+
 RAW_LEVEL_MAP = ['                              ',
                  '                              ',
                  '                              ',
@@ -36,35 +43,26 @@ def load_level_map():
         for j in range(len(RAW_LEVEL_MAP[i])):
             LEVEL_MAP[i].append(RAW_LEVEL_MAP[i][j])
 
-def render_game_map():
+def render_game_map(buf):
     # render the map
     for i in range(len(LEVEL_MAP)):
             for j in range(len(LEVEL_MAP[i])):
                 obj = LEVEL_MAP[i][j]
                 if obj == OBJ_WALL:
-                    attron(COLOR_PAIR(2))
-                    mvaddstr(i, j, obj)
-                    attroff(COLOR_PAIR(2))
+                    buf.put(i, j, obj, COLOR_PAIR(2))
                 elif obj == OBJ_STATUE:
-                    attron(COLOR_PAIR(3) | A_BOLD)
-                    mvaddstr(i, j, obj)
-                    attroff(COLOR_PAIR(3) | A_BOLD)
+                    buf.put(i, j, obj, COLOR_PAIR(3) | A_BOLD)
     # render the player
-    mvaddch(PLAYER_Y, PLAYER_X, CCHAR(OBJ_PLAYER))
-
-def render_status_bar():
-    attron(A_BOLD)
-    mvaddstr(21, 0, MSG)
-    attron(COLOR_PAIR(1))
-    mvaddstr(22, 0, str.format("The Unnamed Adventurer -- Turn: {0}, HP: ", TURN))
-    clrtoeol()
-    if HP > 3: addstr(HP)
-    attroff(COLOR_PAIR(1))
-    if HP <= 3:
-        attron(COLOR_PAIR(4))
-        addstr(HP)
-        attroff(COLOR_PAIR(4))
-    attroff(A_BOLD)
+    buf.put(PLAYER_Y, PLAYER_X, OBJ_PLAYER)
+
+def render_status_bar(buf):
+    buf.put(21, 0, MSG, A_BOLD)
+    status = str.format("The Unnamed Adventurer -- Turn: {0}, HP: ", TURN)
+    buf.put(22, 0, status, COLOR_PAIR(1) | A_BOLD)
+    if HP > 3:
+        buf.put(22, len(status), str(HP), COLOR_PAIR(1) | A_BOLD)
+    else:
+        buf.put(22, len(status), str(HP), COLOR_PAIR(4) | A_BOLD)
     
 def move_player(nx, ny):
     global TURN, PLAYER_X, PLAYER_Y, HP, MSG
@@ -130,10 +128,15 @@ PLAYER_X = START_X
 PLAYER_Y = START_Y
 load_level_map()
 
+# Frames are drawn into the buffer; only the cells that changed reach curses
+max_y, max_x = getmaxyx(stdscr)
+buf = CellBuffer(max_y, max_x)
+
 while HP > 0:
-    clear()
-    render_game_map()
-    render_status_bar()
+    buf.clear()
+    render_game_map(buf)
+    render_status_bar(buf)
+    buf.flush(stdscr)
 
     k = getch()
     if k == KEY_LEFT:
@@ -0,0 +1,653 @@
+# -*- coding: utf-8 -*-
+"""
+Regression tests for uniwidgets on the headless backend
+
+Run from the repository root with `python -m unittest discover tests` (or
+pytest). No terminal is needed: the screen is an in-memory virtual terminal
+whose contents are checked with headless.screen_lines().
+"""
+
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import weakref
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "widgets"))
+
+# Must be set before unicurses is imported
+os.environ["UNICURSES_BACKEND"] = "headless"
+
+import unicurses as uni  # noqa: E402
+from unicurses import headless  # noqa: E402
+
+import uniwidgets as uw  # noqa: E402
+
+
+class HeadlessTestCase(unittest.TestCase):
+    """Gives each test a fresh virtual terminal and Window."""
+    lines = 24
+    cols = 80
+    color_pairs = 256
+
+    def setUp(self):
+        headless.reset()
+        headless.configure(self.lines, self.cols, color_pairs=self.color_pairs)
+        self.win = uw.Window()
+
+    def tearDown(self):
+        uw.scheduler.flush()
+        uni.endwin()
+
+    def draw(self):
+        """Draws the window and returns the screen text."""
+        self.win.draw()
+        uw.scheduler.flush()
+        return headless.screen_lines()
+
+
+# =============================================================================
+# UNICURSES WRAPPERS
+
+class DrawBatchTest(HeadlessTestCase):
+    def test_adjacent_runs_are_coalesced(self):
+        ops = [(0, 0, "ab", 0), (0, 2, "cd", 0), (0, 4, "e", uni.A_BOLD),
+               (0, 6, "f", uni.A_BOLD), (1, 0, "g", 0), (1, 1, 5, 0)]
+        self.assertEqual(list(uni._coalesce_ops(ops)), [
+            (0, 0, "abcd", 0), (0, 4, "e", uni.A_BOLD), (0, 6, "f", uni.A_BOLD),
+            (1, 0, "g5", 0)])
+
+    def test_draws_each_run_with_its_attribute(self):
+        win = uni.newwin(3, 10, 0, 0)
+        uni.wattrset(win, uni.A_UNDERLINE)
+        self.assertEqual(uni.draw_batch(win, [
+            (0, 0, "ab", uni.A_BOLD), (0, 2, "c", uni.A_BOLD),
+            (1, 3, "d", None)]), uni.OK)
+        uni.wrefresh(win)
+        self.assertEqual(headless.screen_lines()[:2],
+                         ["abc" + " " * 77, "   d" + " " * 76])
+        self.assertEqual(headless.screen_cell(0, 2)[1], uni.A_BOLD)
+        # None draws with the window's attribute, which is left as it was
+        self.assertEqual(headless.screen_cell(1, 3)[1], uni.A_UNDERLINE)
+        self.assertEqual(uni.draw_batch(win, [(5, 0, "x", 0)]), uni.ERR)
+
+
+class StringCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.maxsize = uni.ucs_string_cache_info()["maxsize"]
+        uni.ucs_string_cache_clear()
+
+    def tearDown(self):
+        uni.ucs_string_cache_clear(self.maxsize)
+
+    def test_hits_and_misses(self):
+        encoded = uni._cstr("label")
+        self.assertEqual(encoded, uni.CSTR("label"))
+        self.assertIs(uni._cstr("label"), encoded)
+        # Pre-encoded bytes and other objects bypass the cache
+        self.assertEqual(uni._cstr(b"raw"), b"raw")
+        self.assertEqual(uni._cstr(42), b"42")
+        self.assertEqual(uni.ucs_string_cache_info(),
+                         {"hits": 1, "misses": 1, "size": 1,
+                          "maxsize": self.maxsize})
+
+    def test_bounded(self):
+        uni.ucs_string_cache_clear(2)
+        for text in ("a", "b", "c", "b"):
+            uni._cstr(text)
+        info = uni.ucs_string_cache_info()
+        self.assertEqual((info["hits"], info["misses"], info["size"]), (1, 3, 2))
+        # The oldest string was dropped
+        uni._cstr("a")
+        self.assertEqual(uni.ucs_string_cache_info()["misses"], 4)
+        uni.ucs_string_cache_clear(0)
+        self.assertEqual(uni._cstr("a"), b"a")
+        self.assertEqual(uni.ucs_string_cache_info()["size"], 0)
+
+
+class AttrTrackerTest(HeadlessTestCase):
+    def test_wattrset_is_tracked_and_wattron_forgets(self):
+        win = uni.newwin(2, 10, 0, 0)
+        uni.wattrset(win, uni.A_BOLD)
+        self.assertEqual(uni._attr_state[uni._attr_key(win)], uni.A_BOLD)
+        uni.wattron(win, uni.A_REVERSE)
+        self.assertNotIn(uni._attr_key(win), uni._attr_state)
+        uni.wattrset(win, uni.A_BOLD)
+        uni.delwin(win)
+        self.assertNotIn(uni._attr_key(win), uni._attr_state)
+
+    def test_attrs_block_restores_the_tracked_attribute(self):
+        win = uni.newwin(2, 10, 0, 0)
+        uni.wattrset(win, uni.A_UNDERLINE)
+        with uni.attrs(win, uni.A_BOLD):
+            uni.mvwaddstr(win, 0, 0, "b")
+        uni.mvwaddstr(win, 0, 1, "u")
+        uni.wrefresh(win)
+        self.assertEqual(headless.screen_cell(0, 0), ("b", uni.A_BOLD))
+        self.assertEqual(headless.screen_cell(0, 1), ("u", uni.A_UNDERLINE))
+
+    def test_new_window_does_not_inherit_a_stale_entry(self):
+        win = uni.newwin(2, 10, 0, 0)
+        key = uni._attr_key(win)
+        # As if a window dropped without delwin() had used this id
+        uni._attr_state[key] = uni.A_BOLD
+        uni._attr_new(win)
+        self.assertNotIn(key, uni._attr_state)
+
+
+# =============================================================================
+# WIDGETS
+
+class PanelOrderTest(HeadlessTestCase):
+    def test_content_update_keeps_stacking_order(self):
+        a = uw.Box(self.win, 0, 0, 8, 30, label="A")
+        b = uw.Box(self.win, 10, 3, 8, 30, label="B")
+        self.win.add_widget("a", a)
+        self.win.add_widget("b", b)
+        self.draw()
+        z = a.z
+        a.add_content("x")
+        screen = self.draw()
+        # B was added last and stays on top of A
+        self.assertEqual(screen[3][10:14], "+-B-")
+        self.assertEqual(screen[2][:4], "| x ")
+        self.assertEqual(a.z, z)
+
+    def test_shown_again_after_hide_is_raised(self):
+        a = uw.Box(self.win, 0, 0, 8, 30, label="A")
+        b = uw.Box(self.win, 10, 3, 8, 30, label="B")
+        self.win.add_widget("a", a)
+        self.win.add_widget("b", b)
+        self.draw()
+        a.hide()
+        a.show()
+        screen = self.draw()
+        # A's inside now covers B's corner
+        self.assertEqual(screen[3][10:14], "    ")
+
+
+class ListViewTest(HeadlessTestCase):
+    def test_top_is_clamped_when_the_view_grows(self):
+        view = uw.ListView(self.win, 0, 0, 12, 30, ["item %d" % i for i in range(100)])
+        self.win.add_widget("view", view)
+        view.jump_end()
+        self.draw()
+        view.height = 20
+        screen = self.draw()
+        self.assertEqual(view.top, 82)
+        self.assertEqual(screen[18].rstrip(), "|item 99" + " " * 21 + "|")
+
+
+class LogViewTest(HeadlessTestCase):
+    def rows(self, screen, log):
+        """The text rows, checking that each keeps its border cells."""
+        rows = []
+        for row in screen[1:1 + log.rows]:
+            self.assertEqual((row[0], row[log.width - 1]), ("|", "|"))
+            rows.append(row[1:log.width - 1].rstrip())
+        return rows
+
+    def test_incremental_scrolling(self):
+        log = uw.LogView(self.win, 0, 0, 6, 20, label="Log")
+        self.win.add_widget("log", log)
+        for i in range(3):
+            log.add_line("line %d" % i)
+        self.assertEqual(self.rows(self.draw(), log),
+                         ["line 0", "line 1", "line 2", ""])
+        # One and two new lines at a time are scrolled in (wscrl)
+        expected = ["line %d" % i for i in range(12)]
+        n = 3
+        for step in (1, 2, 1, 1, 2, 1):
+            for _ in range(step):
+                log.add_line("line %d" % n)
+                n += 1
+            self.assertFalse(log._full_render)
+            self.assertEqual(self.rows(self.draw(), log), expected[n - 4:n])
+        screen = headless.screen_lines()
+        self.assertTrue(screen[0].startswith("+-Log"))
+        self.assertTrue(screen[5].startswith("+----"))
+
+    def test_more_new_lines_than_rows(self):
+        log = uw.LogView(self.win, 0, 0, 6, 20)
+        self.win.add_widget("log", log)
+        self.draw()
+        for i in range(10):
+            log.add_line("line %d" % i)
+        self.assertEqual(self.rows(self.draw(), log),
+                         ["line 6", "line 7", "line 8", "line 9"])
+
+
+# =============================================================================
+# RENDER SCHEDULING
+
+class FakeClock(object):
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class SchedulerTest(HeadlessTestCase):
+    def setUp(self):
+        super(SchedulerTest, self).setUp()
+        # Ahead of the shared scheduler's last flush on the real clock
+        self.saved_clock = uw.scheduler.clock
+        self.clock = FakeClock(self.saved_clock() + 1000)
+        uw.scheduler.clock = self.clock
+
+    def tearDown(self):
+        uw.scheduler.clock = self.saved_clock
+        super(SchedulerTest, self).tearDown()
+
+    def test_updates_within_a_frame_are_deferred(self):
+        scheduler = uw.RenderScheduler(fps=10, clock=self.clock)
+        win = uni.newwin(2, 10, 0, 0)
+        scheduler.request(win)
+        scheduler.request(win)
+        self.assertTrue(scheduler.maybe_flush())
+        self.clock.now += 0.05
+        scheduler.request(win)
+        self.assertFalse(scheduler.maybe_flush())
+        self.assertTrue(scheduler.pending)
+        self.clock.now += 0.06
+        self.assertTrue(scheduler.maybe_flush())
+        self.assertFalse(scheduler.pending)
+        self.assertFalse(scheduler.maybe_flush())
+        self.assertEqual(scheduler.flushes, 2)
+
+    def test_requests_are_coalesced_into_one_update(self):
+        scheduler = uw.RenderScheduler(clock=self.clock)
+        win = uni.newwin(2, 10, 0, 0)
+        headless.stats.reset()
+        for _ in range(5):
+            scheduler.request(win)
+            scheduler.request_panels()
+        scheduler.flush()
+        scheduler.flush()
+        self.assertEqual(headless.stats.doupdates, 1)
+        self.assertFalse(scheduler.pending)
+
+    def test_idle_frame_completes_a_deferred_flush(self):
+        box = uw.Box(self.win, 0, 0, 6, 20, label="A")
+        self.win.add_widget("box", box)
+        self.win.draw()
+        self.assertFalse(uw.scheduler.pending)
+        box.add_content("hello")
+        self.clock.now += 0.001
+        self.assertTrue(self.win.draw())
+        self.assertTrue(uw.scheduler.pending)
+        self.assertNotIn("hello", headless.screen_lines()[2])
+        for _ in range(5):
+            self.clock.now += 0.05
+            self.assertFalse(self.win.draw())
+        self.assertFalse(uw.scheduler.pending)
+        self.assertEqual(headless.screen_lines()[2][:8], "| hello ")
+
+
+class FileViewTest(HeadlessTestCase):
+    def setUp(self):
+        super(FileViewTest, self).setUp()
+        self.dir = tempfile.mkdtemp()
+        path = os.path.join(self.dir, "file.txt")
+        with open(path, "w") as f:
+            for i in range(100):
+                f.write("line %d%s\n" % (i, " wide" * 10 if i == 50 else ""))
+        self.view = uw.FileView(self.win, 0, 0, 6, 20, path, background=False)
+        self.win.add_widget("view", self.view)
+
+    def tearDown(self):
+        self.view.close()
+        shutil.rmtree(self.dir)
+        super(FileViewTest, self).tearDown()
+
+    def rows(self):
+        return [row[1:19].rstrip() for row in self.draw()[1:5]]
+
+    def test_scrolling_and_jumps(self):
+        self.assertEqual(self.rows(), ["line 0", "line 1", "line 2", "line 3"])
+        self.view.scroll(3)
+        self.assertEqual(self.rows()[0], "line 3")
+        self.view.page(1)
+        self.assertEqual(self.rows()[0], "line 7")
+        self.view.jump(40)
+        self.assertEqual(self.view.line_number, 40)
+        self.view.jump_end()
+        self.assertEqual(self.rows(), ["line 96", "line 97", "line 98", "line 99"])
+        self.view.scroll(5)
+        self.assertEqual(self.rows()[0], "line 96")
+        self.view.scroll(-200)
+        self.assertEqual(self.rows()[0], "line 0")
+
+    def test_search_and_pan(self):
+        self.assertTrue(self.view.search("line 50"))
+        self.assertEqual(self.rows()[0], "line 50 wide wide")
+        self.view.pan(8)
+        self.assertEqual(self.rows()[0], "wide wide wide wid")
+        self.view.pan(-8)
+        self.assertFalse(self.view.search("no such text"))
+        self.assertTrue(self.view.search("line 5", backward=True))
+        self.assertEqual(self.rows()[0], "line 5")
+        self.assertTrue(self.view.search_next())
+        self.assertEqual(self.rows()[0], "line 50 wide wide")
+
+
+class ScrollViewTest(HeadlessTestCase):
+    def setUp(self):
+        super(ScrollViewTest, self).setUp()
+        self.view = uw.ScrollView(self.win, 0, 0, 6, 20)
+        self.win.add_widget("view", self.view)
+        for i in range(50):
+            self.view.add_line("row %d" % i)
+        self.view.write(10, 30, "far right")
+
+    def rows(self):
+        return [row[1:19].rstrip() for row in self.draw()[1:5]]
+
+    def test_scroll_is_clamped_to_the_content(self):
+        self.assertEqual(self.rows(), ["row 0", "row 1", "row 2", "row 3"])
+        self.view.scroll(10)
+        self.assertEqual(self.rows(), ["row 10", "row 11", "row 12", "row 13"])
+        self.view.jump_end()
+        self.assertEqual(self.view.top, 46)
+        self.assertEqual(self.rows()[-1], "row 49")
+        self.view.scroll(-100)
+        self.assertEqual(self.view.top, 0)
+
+    def test_pan_and_hit_regions(self):
+        self.view.scroll_to(10, 30)
+        self.assertEqual(self.rows()[0], " " * 9 + "far right")
+        self.assertEqual(self.view.left, 21)
+        self.view.jump(20)
+        self.draw()
+        self.assertEqual(self.win.hit_test(2, 5), (self.view, 21))
+        self.assertEqual(self.win.hit_test(0, 5), (self.view, None))
+
+
+class ResizeTest(HeadlessTestCase):
+    def test_resize_relays_out_the_widgets_once_settled(self):
+        left = uw.Box(self.win, 0, 0, 1, 1, label="L")
+        right = uw.Box(self.win, 0, 0, 1, 1, label="R")
+        self.win.set_layout(uw.Row(left, right))
+        self.draw()
+        self.assertEqual((left.width, right.xpos), (40, 40))
+        headless.resize_term(30, 100)
+        self.win.request_resize()
+        # Not applied until no resize has been requested for resize_delay
+        self.win.draw()
+        self.assertEqual(self.win.maxx, 79)
+        self.win._resize_at -= self.win.resize_delay
+        screen = self.draw()
+        self.assertEqual((self.win.maxy, self.win.maxx), (29, 99))
+        self.assertEqual((left.height, left.width, right.xpos), (30, 50, 50))
+        self.assertTrue(screen[0].startswith("+-L"))
+        self.assertEqual(screen[0][50:53], "+-R")
+        self.assertEqual(screen[29][99], "+")
+        self.assertFalse(self.win.apply_resize())
+
+
+# =============================================================================
+# LAYOUT
+
+class DistributeTest(unittest.TestCase):
+    def sizes(self, total, *nodes):
+        return uw._distribute(list(nodes), total)
+
+    def test_rounding_leftovers_are_handed_out(self):
+        self.assertEqual(self.sizes(10, uw.Layout(), uw.Layout(), uw.Layout()),
+                         [4, 3, 3])
+        self.assertEqual(self.sizes(2, uw.Layout(), uw.Layout(), uw.Layout()),
+                         [1, 1, 0])
+
+    def test_weights(self):
+        self.assertEqual(self.sizes(9, uw.Layout(weight=1), uw.Layout(weight=2)),
+                         [3, 6])
+        self.assertEqual(self.sizes(10, uw.Layout(weight=1), uw.Layout(weight=2)),
+                         [4, 6])
+
+    def test_max_size_passes_space_on(self):
+        self.assertEqual(
+            self.sizes(20, uw.Layout(max_size=4), uw.Layout(), uw.Layout()),
+            [4, 8, 8])
+
+    def test_fixed_and_minimum_sizes(self):
+        self.assertEqual(
+            self.sizes(20, uw.Layout(size=5), uw.Layout(min_size=10), uw.Layout()),
+            [5, 13, 2])
+        # Too small for the minimums: the last nodes give way first
+        self.assertEqual(
+            self.sizes(8, uw.Layout(min_size=5), uw.Layout(min_size=5)), [5, 3])
+
+    def test_sizes_add_up(self):
+        for total in range(0, 50):
+            nodes = [uw.Layout(weight=w) for w in (1, 3, 2, 1)]
+            self.assertEqual(sum(self.sizes(total, *nodes)), total)
+
+
+# =============================================================================
+# KEY BINDINGS
+
+class KeymapTest(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.keys = uw.Keymap()
+        self.dispatcher = uw.KeyDispatcher(self.keys)
+
+    def press(self, *keys):
+        return [self.dispatcher.dispatch(code) for code in uw.key_sequence(keys)]
+
+    def test_chord(self):
+        self.keys.bind("gg", self.calls.append, "top")
+        self.assertEqual(self.press("g"), [False])
+        self.assertTrue(self.dispatcher.pending)
+        self.assertEqual(self.press("g"), [True])
+        self.assertFalse(self.dispatcher.pending)
+        self.assertEqual(self.calls, ["top"])
+
+    def test_prefix_swallows_an_unbound_key(self):
+        self.keys.bind([uw.ctrl("x"), "s"], self.calls.append, "save")
+        self.keys.bind("s", self.calls.append, "s")
+        self.assertEqual(self.press(uw.ctrl("x"), "z", "s"), [False, False, True])
+        self.assertEqual(self.calls, ["s"])
+        self.press(uw.ctrl("x"), "s")
+        self.assertEqual(self.calls, ["s", "save"])
+
+    def test_prefix_conflicts(self):
+        self.keys.bind([uw.ctrl("x"), "s"], self.calls.append, "save")
+        with self.assertRaises(ValueError):
+            self.keys.bind(uw.ctrl("x"), self.calls.append, "x")
+        with self.assertRaises(ValueError):
+            self.keys.bind([uw.ctrl("x"), "s", "s"], self.calls.append, "ss")
+
+    def test_focus_and_modal_keymaps(self):
+        self.keys.bind("q", self.calls.append, "global")
+
+        class Focused(object):
+            keymap = uw.Keymap()
+        Focused.keymap.bind("q", self.calls.append, "focus")
+        modal = uw.Keymap()
+        modal.bind("y", self.calls.append, "modal")
+        self.press("q")
+        self.dispatcher.focus = Focused()
+        self.press("q")
+        self.dispatcher.push_modal(modal)
+        self.assertEqual(self.press("q", "y"), [False, True])
+        self.dispatcher.pop_modal()
+        self.assertEqual(self.calls, ["global", "focus", "modal"])
+
+
+# =============================================================================
+# HIT TESTING
+
+class HitIndexTest(unittest.TestCase):
+    def test_topmost_and_smallest_target_wins(self):
+        hits = uw.HitIndex(bucket_height=2, bucket_width=4)
+        hits.add(0, 0, 10, 20, "back", z=1)
+        hits.add(2, 2, 3, 3, "front", "item", z=2)
+        hits.add(8, 0, 1, 20, "back", "row", z=1)
+        self.assertEqual(len(hits), 3)
+        self.assertEqual(hits.hit(3, 3), ("front", "item"))
+        # Same z: the item wins over the whole widget
+        self.assertEqual(hits.hit(8, 15), ("back", "row"))
+        self.assertEqual(hits.hit(10, 0), (None, None))
+        hits.add(0, 0, 0, 5, "empty")
+        self.assertEqual(len(hits), 3)
+        hits.clear()
+        self.assertEqual(hits.hit(3, 3), (None, None))
+
+    def test_window_hit_test_follows_the_stacking_order(self):
+        headless.reset()
+        headless.configure(24, 80)
+        win = uw.Window()
+        try:
+            a = uw.Box(win, 0, 0, 8, 30, label="A")
+            b = uw.Box(win, 10, 3, 8, 30, label="B")
+            win.add_widget("a", a)
+            win.add_widget("b", b)
+            win.draw()
+            self.assertIs(win.hit_test(4, 12)[0], b)
+            a.hide()
+            a.show()
+            self.assertIs(win.hit_test(4, 12)[0], a)
+            self.assertEqual(win.hit_test(20, 70), (None, None))
+        finally:
+            uw.scheduler.flush()
+            uni.endwin()
+
+
+# =============================================================================
+# CELL BUFFER
+
+class CellBufferTest(HeadlessTestCase):
+    def test_changes_are_runs_of_changed_cells(self):
+        buf = uw.CellBuffer(3, 10)
+        buf.clear()
+        buf.put(0, 0, "abc")
+        buf.put(0, 3, "de", uni.A_BOLD)
+        buf.put(2, 8, "xyz")  # clipped
+        # Nothing has been written yet: every cell is a change
+        self.assertEqual(list(buf.changes()), [
+            (0, 0, "abc", uni.A_NORMAL), (0, 3, "de", uni.A_BOLD),
+            (0, 5, "     ", uni.A_NORMAL), (1, 0, " " * 10, uni.A_NORMAL),
+            (2, 0, " " * 8 + "xy", uni.A_NORMAL)])
+        win = uni.newwin(3, 10, 0, 0)
+        self.assertEqual(buf.flush(win), 5)
+        self.assertEqual(list(buf.changes()), [])
+
+        buf.clear()
+        buf.put(0, 0, "abc")
+        buf.put(0, 3, "de", uni.A_BOLD)
+        buf.put(1, 4, "@")
+        self.assertEqual(list(buf.changes()),
+                         [(1, 4, "@", uni.A_NORMAL), (2, 8, "  ", uni.A_NORMAL)])
+        buf.flush(win)
+        uw.scheduler.flush()
+        self.assertEqual(headless.screen_lines()[:3],
+                         ["abcde" + " " * 75, "    @" + " " * 75, " " * 80])
+        self.assertEqual(headless.screen_cell(0, 3)[1], uni.A_BOLD)
+
+    def test_invalidate_redraws_everything(self):
+        buf = uw.CellBuffer(2, 4)
+        buf.put(0, 0, "ab")
+        buf.flush(uni.newwin(2, 4, 0, 0))
+        buf.invalidate()
+        self.assertEqual(list(buf.changes()), [
+            (0, 0, "ab  ", uni.A_NORMAL), (1, 0, "    ", uni.A_NORMAL)])
+
+
+# =============================================================================
+# COLORS AND RESOURCES
+
+class ColorPairsTest(HeadlessTestCase):
+    color_pairs = 8
+
+    def test_theme_and_scheme_pairs_are_not_recycled(self):
+        theme = uw.Theme("test", border=uw.Style("cyan", "blue"),
+                         label=uw.Style("yellow", "black"))
+        self.win.set_theme(theme)
+        pairs = uw.color_pairs
+        for fg in range(8):
+            pairs.attr(fg, uni.COLOR_RED)
+            pairs.attr(fg, uni.COLOR_MAGENTA)
+        self.assertGreater(pairs.evictions, 0)
+        self.assertEqual(uni.pair_content(uni.pair_number(theme["label"])),
+                         (uni.COLOR_YELLOW, uni.COLOR_BLACK))
+        self.assertEqual(uni.pair_content(uni.pair_number(theme["border"])),
+                         (uni.COLOR_CYAN, uni.COLOR_BLUE))
+        for number, (fg, bg) in enumerate(uw.color_schemes.values(), 1):
+            self.assertEqual(uni.pair_content(number), (fg, bg))
+
+    def test_reenabling_colors_keeps_scheme_pairs_pinned(self):
+        # Shares the "cyan" scheme's pair
+        self.win.set_theme(uw.Theme("test", border=uw.Style("cyan", "blue")))
+        self.win.enable_colors()
+        self.assertEqual(uw.color_pairs._pins[uni.COLOR_CYAN, uni.COLOR_BLUE], 2)
+        self.win.set_theme(uw.Theme("plain"))
+        self.assertEqual(uw.color_pairs._pins[uni.COLOR_CYAN, uni.COLOR_BLUE], 1)
+        pairs = uw.color_pairs
+        for fg in range(8):
+            pairs.attr(fg, uni.COLOR_RED)
+            pairs.attr(fg, uni.COLOR_YELLOW)
+        self.assertGreater(pairs.evictions, 0)
+        self.assertEqual(uni.pair_content(uni.pair_number(uw.scheme("cyan"))),
+                         (uni.COLOR_CYAN, uni.COLOR_BLUE))
+
+    def test_least_recently_used_pair_is_recycled(self):
+        pairs = uw.ColorPairs(limit=4)
+        pairs.attr(1, 0)
+        pairs.attr(2, 0)
+        pairs.attr(3, 0)
+        self.assertEqual(len(pairs), 3)
+        pairs.attr(1, 0)
+        # (2, 0) is the least recently used
+        self.assertEqual(pairs.pair_number(4, 0), 2)
+        self.assertEqual(uni.pair_content(2), (4, 0))
+        self.assertEqual(pairs.pair_number(1, 0), 1)
+        self.assertEqual(pairs.evictions, 1)
+
+    def test_released_theme_pairs_can_be_recycled(self):
+        pairs = uw.ColorPairs(limit=3)
+        pairs.pin(1, 0)
+        pairs.pin(2, 0)
+        with self.assertRaises(ValueError):
+            pairs.attr(3, 0)
+        pairs.unpin(1, 0)
+        pairs.attr(3, 0)
+        self.assertEqual(pairs.evictions, 1)
+        self.assertEqual(pairs.pair_number(3, 0), 1)
+
+
+class ReleaseTest(HeadlessTestCase):
+    def test_destroyed_widget_windows_are_freed(self):
+        live = uw.window_manager.live_windows
+        tracked = len(uni._attr_state)
+        refs = []
+        for i in range(50):
+            box = uw.Box(self.win, 0, 0, 8, 30, label="Box %d" % i)
+            self.win.widgets = [box]
+            self.draw()
+            refs.append(weakref.ref(box.win))
+            box.destroy()
+        del box
+        gc.collect()
+        self.assertEqual(uw.window_manager.live_windows, live)
+        self.assertEqual([ref for ref in refs if ref() is not None], [])
+        # New windows may also clear entries left at reused ids
+        self.assertLessEqual(len(uni._attr_state), tracked)
+
+    def test_attribute_tracker_does_not_keep_windows_alive(self):
+        win = uni.newwin(2, 10, 0, 0)
+        uni.wattrset(win, uni.A_BOLD)
+        ref = weakref.ref(win)
+        # Dropped without delwin(), as NCurses programs usually do
+        del win
+        gc.collect()
+        self.assertIsNone(ref())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -17,7 +17,6 @@
 # import Curses (either natively if supported or via PDCurses using FFI if on MS Windows)
 import sys
 import os
-import locale
 global pdlib
 global NCURSES
 global PDC_LEAVEOK
@@ -28,28 +27,101 @@ NCURSES = False            # Native curses support
 NCURSES_AVAILABLE = False  # True if the NCurses is available natively
 pdlib = None               # PD library, if applicable
 UCS_DEFAULT_WRAPPER = ""   # A constant for the default wrapper (ucs_reconfigure)
+UCS_HEADLESS_WRAPPER = "headless"  # The in-memory virtual terminal (ucs_reconfigure)
+HEADLESS = False           # True if the headless backend is in use
+_ucs_native_curses = None  # The native curses module, if available
 stdscr = -1                # A pointer to the standard screen
 
-locale.setlocale(locale.LC_ALL, '')
-code = locale.getpreferredencoding()   # TODO: fix this to actually work on native ncurses
+code = None                # Preferred encoding, set with the locale (_ucs_locale)
+ctypes = None              # Imported for the PDCurses backend (_ucs_import_ctypes)
+
+# Importing UniCurses is kept cheap (tools may import it just to check what is
+# available): the locale is set up by initscr() or the first string encoding,
+# ctypes is only imported for PDCurses, and the PDCurses DLL is only loaded
+# when the first curses function is called.
+
+
+def _ucs_locale():
+    """Set the locale from the environment (once) and return its encoding."""
+    global code
+    if code is None:
+        import locale
+        locale.setlocale(locale.LC_ALL, '')
+        # TODO: fix this to actually work on native ncurses
+        code = locale.getpreferredencoding()
+    return code
+
+
+def _ucs_import_ctypes():
+    """Import ctypes and define the ctypes-based structures (once)."""
+    global ctypes, MEVENT
+    if ctypes is not None:
+        return ctypes
+    try:
+        import ctypes as _ctypes
+    except ImportError:
+        raise ImportError("""
+            Fatal error: this Python release does not support ctypes.
+            Please upgrade your Python distribution
+            if you want to use UniCurses on a {} platform.
+            """.format(sys.platform))
+    ctypes = _ctypes
+
+    # A PDC structure for the mouse events
+    class MEVENT(ctypes.Structure):
+        _fields_ = [("id", ctypes.c_short),
+                    ("x", ctypes.c_int),
+                    ("y", ctypes.c_int),
+                    ("z", ctypes.c_int),
+                    ("mmask_t", ctypes.c_ulong)]
+    return ctypes
+
+
+class _LazyLibrary(object):
+    """
+    Stands in for pdlib until a PDCurses function is first used, then loads
+    the DLL, declares the function prototypes and replaces itself.
+    """
+    def __init__(self, path):
+        self._path = path
+
+    def _load(self):
+        global pdlib
+        lib = ctypes.CDLL(self._path)
+        _pd_apply_prototypes(lib)
+        pdlib = lib
+        return lib
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+
+def _pd_library():
+    """The loaded PDCurses library."""
+    if isinstance(pdlib, _LazyLibrary):
+        return pdlib._load()
+    return pdlib
+
+
+def __getattr__(name):
+    # Names created on demand (Python 3.7+ module __getattr__)
+    if name == "MEVENT":
+        _ucs_import_ctypes()
+        return MEVENT
+    raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
 
-try:
-    import ctypes
-except ImportError:
-    raise ImportError("""
-        Fatal error: this Python release does not support ctypes.
-        Please upgrade your Python distribution
-        if you want to use UniCurses on a {} platform.
-        """.format(sys.platform))
 
 try:
     # See if the platform supports curses natively
     import curses
     import curses.panel
+    _ucs_native_curses = curses
     NCURSES_AVAILABLE = True
     NCURSES = True
 except ImportError:
-    if sys.platform.find('win') == -1:
+    if os.environ.get("UNICURSES_BACKEND") == UCS_HEADLESS_WRAPPER:
+        pass
+    elif sys.platform.find('win') == -1:
         raise ImportError("""
             Fatal error: this platform is not supported by UniCurses.
             Either you're running a very old Python distribution below v2.6,
@@ -67,23 +139,27 @@ except ImportError:
                 if you want to use UniCurses on a {} platform.
                 """.format(sys.platform))
         # We're on winXX, use pdcurses instead of native ncurses
-        pdlib = ctypes.CDLL(path_to_pdcurses)
+        _ucs_import_ctypes()
+        pdlib = _LazyLibrary(path_to_pdcurses)
+
+# The headless backend (an in-memory virtual terminal, see headless.py) stands
+# in for the native curses module, so the NCurses code paths drive it.
+if os.environ.get("UNICURSES_BACKEND") == UCS_HEADLESS_WRAPPER:
+    from . import headless as curses
+    NCURSES = True
+    HEADLESS = True
 
 
 # +++ PDCurses/NCurses curses.h marco wrappers and other prereqs +++
 
-# A PDC structure for the mouse events
-if not NCURSES:
-    class MEVENT(ctypes.Structure):
-        _fields_ = [("id", ctypes.c_short),
-                    ("x", ctypes.c_int),
-                    ("y", ctypes.c_int),
-                    ("z", ctypes.c_int),
-                    ("mmask_t", ctypes.c_ulong)]
+# A PDC structure for the mouse events: MEVENT (see _ucs_import_ctypes)
 
 # Reconfigure the UniCurses wrapper to use a certain library instead of the default
 # PDCurses and the default NCurses. This must be called before initscr().
 # Pass an empty string or UCS_DEFAULT_WRAPPER to use the default wrapper.
+# Pass UCS_HEADLESS_WRAPPER (for either library) to use the in-memory virtual
+# terminal; note that constants keep the values of the backend detected at
+# import time, so prefer setting UNICURSES_BACKEND=headless before importing.
 # !!! THIS IS NOT FOR GENERAL USE AND WILL IN MOST CASES BREAK UNICURSES !!!
 # !!! EVEN IF IT DOESN'T MAKE YOUR APP CRASH OR HANG, IT MAY BREAK PORTABILITY !!!
 # !!! IF YOU DON'T KNOW WHAT THIS MAY BE USED FOR, YOU DON'T NEED TO USE IT !!!
@@ -92,7 +168,19 @@ if not NCURSES:
 def ucs_reconfigure(wrapper_ncurses, wrapper_pdcurses):
     global NCURSES
     global NCURSES_AVAILABLE
+    global HEADLESS
     global pdlib
+    global curses
+    if UCS_HEADLESS_WRAPPER in (wrapper_ncurses, wrapper_pdcurses):
+        from . import headless as curses
+        NCURSES = True
+        HEADLESS = True
+        ucs_bind_backend()
+        return
+    if HEADLESS and _ucs_native_curses is not None:
+        curses = _ucs_native_curses
+    HEADLESS = False
+    _ucs_import_ctypes()
     if NCURSES_AVAILABLE:
         if wrapper_ncurses == UCS_DEFAULT_WRAPPER:
             NCURSES = True
@@ -122,6 +210,8 @@ def ucs_reconfigure(wrapper_ncurses, wrapper_pdcurses):
                 raise Exception("""
                     UCS_CONFIGURE: There was an error configuring the
                     NCurses wrapper using the library {}""".format(wrapper_ncurses))
+    # Rebuild the public function table for the selected backend
+    ucs_bind_backend()
 
 
 def CSTR(s):
@@ -129,7 +219,145 @@ def CSTR(s):
     Return a bytes-encoded C style string from anything that's convertable with str.
     It is used to pass strings to PDCurses which expects a C-formatted string.
     """
-    return str(s).encode(code)
+    return str(s).encode(code or _ucs_locale())
+
+
+# Bounded cache of encoded strings for the PDCurses string output functions
+# (waddstr, mvwaddstr, winsstr, ...), so static labels are not re-encoded on
+# every frame. A plain dict: a hit is one lookup, cheaper than both
+# functools.lru_cache and encoding. When full, the oldest entry is dropped.
+# Python 2's str is already a byte string, so only unicode is encoded there
+# (uncached).
+UCS_STRING_CACHE_SIZE = 1024
+_string_cache = {}
+# Strings that are cached (none on Python 2)
+_cached_type = str if str is not bytes else None
+_string_cache_hits = 0
+_string_cache_misses = 0
+
+
+def _encode_miss(s):
+    global _string_cache_misses
+    _string_cache_misses += 1
+    if len(_string_cache) >= UCS_STRING_CACHE_SIZE:
+        if not UCS_STRING_CACHE_SIZE:
+            return CSTR(s)
+        del _string_cache[next(iter(_string_cache))]
+    b = _string_cache[s] = CSTR(s)
+    return b
+
+
+def _cstr(s):
+    """
+    CSTR for the string output functions: bytes (pre-encoded with ucs_encode)
+    are passed through, str goes through the cache.
+    """
+    global _string_cache_hits
+    t = type(s)
+    if t is _cached_type:
+        try:
+            b = _string_cache[s]
+        except KeyError:
+            return _encode_miss(s)
+        _string_cache_hits += 1
+        return b
+    if t is bytes:
+        return s
+    return CSTR(s)
+
+
+# Current attribute of each window as last set through the wrappers, so the
+# temporary attribute of waddstr(..., attr) and friends costs no getattrs
+# call and no wattrset at all when it is already set. Wrappers that change
+# a window's attribute in other ways (wattron, wstandout, ...) forget it.
+# NCurses windows cannot be weakly referenced and are usually dropped without
+# delwin(), so they are keyed by id() to keep them collectable; the wrappers
+# that create a window forget any entry left under a reused id.
+_attr_state = {}
+
+
+def _attr_key(scr_id):
+    if NCURSES:
+        return id(scr_id)
+    # PDCurses windows are handles; some wrappers return them as c_void_p
+    if type(scr_id) is ctypes.c_void_p:
+        return scr_id.value
+    return scr_id
+
+
+def _attr_new(win):
+    """Forget the attribute recorded for a dead window at a new window's id."""
+    _attr_state.pop(id(win), None)
+    return win
+
+
+def _pd_known_attr(scr_id):
+    key = _attr_key(scr_id)
+    attr = _attr_state.get(key)
+    if attr is None:
+        attr = _attr_state[key] = pdlib.getattrs(scr_id)
+    return attr
+
+
+def _pd_with_attr(scr_id, attr, write, *args):
+    """Run a PDCurses write with a temporary attribute."""
+    oldattr = _pd_known_attr(scr_id)
+    if attr == oldattr:
+        return write(scr_id, *args)
+    pdlib.wattrset(scr_id, attr)
+    ret = write(scr_id, *args)
+    pdlib.wattrset(scr_id, oldattr)
+    return ret
+
+
+def _attr_changed(scr_id, attr=None):
+    """Record (or, with attr None, forget) the current attribute of a window."""
+    if attr is None:
+        _attr_state.pop(_attr_key(scr_id), None)
+    else:
+        _attr_state[_attr_key(scr_id)] = attr
+
+
+def ucs_encode(s):
+    """
+    Pre-encode an immutable string (label, title, column header) once for the
+    string output functions. On PDCurses this returns the encoded bytes; on
+    NCurses, which encodes by itself, the string is returned unchanged.
+    """
+    if NCURSES:
+        return s
+    return _cstr(s)
+
+
+def ucs_string_cache_info():
+    """
+    Return a dict with the hits, misses, size and maxsize of the encoded string
+    cache.
+    """
+    return {"hits": _string_cache_hits, "misses": _string_cache_misses,
+            "size": len(_string_cache), "maxsize": UCS_STRING_CACHE_SIZE}
+
+
+def ucs_string_cache_clear(maxsize=None):
+    """
+    Empty the encoded string cache and reset its counters; optionally give it
+    a new maximum size.
+    """
+    global _string_cache_hits, _string_cache_misses, UCS_STRING_CACHE_SIZE
+    if maxsize is not None:
+        UCS_STRING_CACHE_SIZE = maxsize
+    _string_cache.clear()
+    _string_cache_hits = _string_cache_misses = 0
+
+
+def ucs_color_pairs():
+    """
+    Return the number of color pairs the terminal supports (COLOR_PAIRS in
+    C), or 0 before start_color().
+    """
+    if NCURSES:
+        return getattr(curses, "COLOR_PAIRS", 0)
+    return ctypes.c_int.in_dll(_pd_library(), "COLOR_PAIRS").value
 
 
 
@@ -146,7 +374,8 @@ def PD_PAIR_NUMBER(n):
 
 def PD_GET_CURSCR():
     """Get the PDC curscr (NOT PORTABLE!)"""
-    return ctypes.c_int.in_dll(pdlib, "curscr")
+    # A WINDOW pointer: c_int would truncate it on 64-bit
+    return ctypes.c_void_p.in_dll(_pd_library(), "curscr")
 
 # --- PDCurses/NCurses curses.h macro wrappers and other prereqs ---
 
@@ -744,25 +973,219 @@ else:
 
 # +++ FUNCTION DEFINITIONS (PDC) +++
 
-if not NCURSES:
-    pdlib.erasechar.restype = ctypes.c_char
-    pdlib.keyname.restype = ctypes.c_char_p
-    pdlib.killchar.restype = ctypes.c_char
-    pdlib.longname.restype = ctypes.c_char_p
-    pdlib.nc_getmouse.restype = MEVENT
-    pdlib.termattrs.restype = ctypes.c_ulong
-    pdlib.termname.restype = ctypes.c_char_p
-    pdlib.winch.restype = ctypes.c_uint
-    pdlib.mvwinch.restype = ctypes.c_uint
-    pdlib.unctrl.restype = ctypes.c_char_p
-    pdlib.is_wintouched.restype = ctypes.c_bool
-    pdlib.is_linetouched.restype = ctypes.c_bool
-    pdlib.can_change_color.restype = ctypes.c_bool
-    pdlib.has_colors.restype = ctypes.c_bool
-    pdlib.has_ic.restype = ctypes.c_bool
-    pdlib.has_il.restype = ctypes.c_bool
-    pdlib.has_key.restype = ctypes.c_bool
-    pdlib.isendwin.restype = ctypes.c_bool
+# Prototypes of every PDCurses function UniCurses calls, as
+# {name: (restype, argtypes)}. With argtypes declared ctypes converts the
+# arguments with fixed converters instead of guessing on every call, and
+# WINDOW/PANEL pointers are returned as full-width handles on 64-bit.
+# Applied when the DLL is loaded (see _LazyLibrary) or by ucs_bind_backend()
+# after ucs_reconfigure().
+
+
+def _pd_prototypes():
+    W = P = ptr = ctypes.c_void_p     # WINDOW *, PANEL *, other pointers
+    ch = ctypes.c_ulong               # chtype / attr_t (PDCurses 3.4)
+    mm = ctypes.c_ulong               # mmask_t
+    i = ctypes.c_int
+    sh = ctypes.c_short
+    b = ctypes.c_bool                 # PDCurses bool is one byte
+    sz = ctypes.c_char_p              # C strings and char buffers
+    lng = ctypes.c_long
+    sh_p = ctypes.POINTER(ctypes.c_short)
+    ev_p = ctypes.POINTER(MEVENT)
+    void = None
+    return {
+        # Terminal and modes
+        "initscr": (W, []),
+        "endwin": (i, []),
+        "isendwin": (b, []),
+        "baudrate": (i, []),
+        "beep": (i, []),
+        "flash": (i, []),
+        "cbreak": (i, []),
+        "nocbreak": (i, []),
+        "echo": (i, []),
+        "noecho": (i, []),
+        "nl": (i, []),
+        "nonl": (i, []),
+        "raw": (i, []),
+        "noraw": (i, []),
+        "halfdelay": (i, [i]),
+        "curs_set": (i, [i]),
+        "napms": (i, [i]),
+        "delay_output": (i, [i]),
+        "def_prog_mode": (i, []),
+        "def_shell_mode": (i, []),
+        "reset_prog_mode": (i, []),
+        "reset_shell_mode": (i, []),
+        "resize_term": (i, [i, i]),
+        "doupdate": (i, []),
+        "filter": (void, []),
+        "flushinp": (i, []),
+        "qiflush": (void, []),
+        "noqiflush": (void, []),
+        "typeahead": (i, [i]),
+        "use_env": (void, [b]),
+        "setsyx": (void, [i, i]),
+        "erasechar": (ctypes.c_char, []),
+        "killchar": (ctypes.c_char, []),
+        "keyname": (sz, [i]),
+        "longname": (sz, []),
+        "termname": (sz, []),
+        "termattrs": (ch, []),
+        "unctrl": (sz, [ch]),
+        "has_ic": (b, []),
+        "has_il": (b, []),
+        "has_key": (b, [i]),
+        "PDC_ungetch": (i, [i]),
+        "putp": (i, [sz]),
+        "setupterm": (i, [sz, i, ptr]),
+        "tigetflag": (i, [sz]),
+        "tigetnum": (i, [sz]),
+        "tigetstr": (sz, [sz]),
+        "tparm": (sz, [sz] + [lng] * 9),
+        # Colors
+        "start_color": (i, []),
+        "has_colors": (b, []),
+        "can_change_color": (b, []),
+        "use_default_colors": (i, []),
+        "init_color": (i, [sh, sh, sh, sh]),
+        "init_pair": (i, [sh, sh, sh]),
+        "color_content": (i, [sh, sh_p, sh_p, sh_p]),
+        "pair_content": (i, [sh, sh_p, sh_p]),
+        # Mouse
+        "mousemask": (mm, [mm, ptr]),
+        "mouseinterval": (i, [i]),
+        "nc_getmouse": (i, [ev_p]),
+        "ungetmouse": (i, [ev_p]),
+        "wenclose": (b, [W, i, i]),
+        # Window creation and geometry
+        "newwin": (W, [i, i, i, i]),
+        "newpad": (W, [i, i]),
+        "subwin": (W, [W, i, i, i, i]),
+        "subpad": (W, [W, i, i, i, i]),
+        "derwin": (W, [W, i, i, i, i]),
+        "delwin": (i, [W]),
+        "mvwin": (i, [W, i, i]),
+        "mvderwin": (i, [W, i, i]),
+        "wresize": (i, [W, i, i]),
+        "getbegx": (i, [W]),
+        "getbegy": (i, [W]),
+        "getcurx": (i, [W]),
+        "getcury": (i, [W]),
+        "getmaxx": (i, [W]),
+        "getmaxy": (i, [W]),
+        "getparx": (i, [W]),
+        "getpary": (i, [W]),
+        "copywin": (i, [W, W, i, i, i, i, i, i, i]),
+        "overlay": (i, [W, W]),
+        "overwrite": (i, [W, W]),
+        # Window options
+        "clearok": (i, [W, b]),
+        "idcok": (void, [W, b]),
+        "idlok": (i, [W, b]),
+        "immedok": (void, [W, b]),
+        "keypad": (i, [W, b]),
+        "leaveok": (i, [W, b]),
+        "meta": (i, [W, b]),
+        "nodelay": (i, [W, b]),
+        "notimeout": (i, [W, b]),
+        "scrollok": (i, [W, b]),
+        "syncok": (i, [W, b]),
+        "wtimeout": (void, [W, i]),
+        "wsetscrreg": (i, [W, i, i]),
+        # Output
+        "waddch": (i, [W, ch]),
+        "mvwaddch": (i, [W, i, i, ch]),
+        "wechochar": (i, [W, ch]),
+        "waddstr": (i, [W, sz]),
+        "mvwaddstr": (i, [W, i, i, sz]),
+        "waddnstr": (i, [W, sz, i]),
+        "mvwaddnstr": (i, [W, i, i, sz, i]),
+        "winsch": (i, [W, ch]),
+        "mvwinsch": (i, [W, i, i, ch]),
+        "winsstr": (i, [W, sz]),
+        "mvwinsstr": (i, [W, i, i, sz]),
+        "winsnstr": (i, [W, sz, i]),
+        "mvwinsnstr": (i, [W, i, i, sz, i]),
+        "box": (i, [W, ch, ch]),
+        "wborder": (i, [W] + [ch] * 8),
+        "whline": (i, [W, ch, i]),
+        "mvwhline": (i, [W, i, i, ch, i]),
+        "wvline": (i, [W, ch, i]),
+        "mvwvline": (i, [W, i, i, ch, i]),
+        "wattroff": (i, [W, ch]),
+        "wattron": (i, [W, ch]),
+        "wattrset": (i, [W, ch]),
+        "getattrs": (ch, [W]),
+        "wstandend": (i, [W]),
+        "wstandout": (i, [W]),
+        "wbkgd": (i, [W, ch]),
+        "wbkgdset": (void, [W, ch]),
+        "wchgat": (i, [W, i, ch, sh, ptr]),
+        "mvwchgat": (i, [W, i, i, i, ch, sh, ptr]),
+        "wmove": (i, [W, i, i]),
+        "wclear": (i, [W]),
+        "werase": (i, [W]),
+        "wclrtobot": (i, [W]),
+        "wclrtoeol": (i, [W]),
+        "wdelch": (i, [W]),
+        "mvwdelch": (i, [W, i, i]),
+        "wdeleteln": (i, [W]),
+        "mvwdeleteln": (i, [W, i, i]),
+        "winsdelln": (i, [W, i]),
+        "winsertln": (i, [W]),
+        "wscrl": (i, [W, i]),
+        # Input
+        "wgetch": (i, [W]),
+        "mvwgetch": (i, [W, i, i]),
+        "wgetstr": (i, [W, sz]),
+        "mvwgetstr": (i, [W, i, i, sz]),
+        "winch": (ch, [W]),
+        "mvwinch": (ch, [W, i, i]),
+        "winnstr": (i, [W, sz, i]),
+        "mvwinnstr": (i, [W, i, i, sz, i]),
+        # Refresh
+        "wrefresh": (i, [W]),
+        "wnoutrefresh": (i, [W]),
+        "prefresh": (i, [W, i, i, i, i, i, i]),
+        "redrawwin": (i, [W]),
+        "wredrawln": (i, [W, i, i]),
+        "touchwin": (i, [W]),
+        "untouchwin": (i, [W]),
+        "wtouchln": (i, [W, i, i, i]),
+        "is_linetouched": (b, [W, i]),
+        "is_wintouched": (b, [W]),
+        "wcursyncup": (void, [W]),
+        "wsyncdown": (void, [W]),
+        "wsyncup": (void, [W]),
+        # Panels
+        "new_panel": (P, [W]),
+        "del_panel": (i, [P]),
+        "show_panel": (i, [P]),
+        "hide_panel": (i, [P]),
+        "top_panel": (i, [P]),
+        "bottom_panel": (i, [P]),
+        "move_panel": (i, [P, i, i]),
+        "replace_panel": (i, [P, W]),
+        "panel_above": (P, [P]),
+        "panel_below": (P, [P]),
+        "panel_hidden": (i, [P]),
+        "panel_window": (W, [P]),
+        "panel_userptr": (ptr, [P]),
+        "set_panel_userptr": (i, [P, ptr]),
+        "update_panels": (void, []),
+        }
+
+
+def _pd_apply_prototypes(lib):
+    """Declare restype and argtypes on a PDCurses library; skip missing names."""
+    for name, (restype, argtypes) in _pd_prototypes().items():
+        try:
+            func = getattr(lib, name)
+        except AttributeError:
+            continue
+        func.restype = restype
+        func.argtypes = argtypes
 
 # --- FUNCTION DEFINITIONS (PDC) ---
 
@@ -791,12 +1214,8 @@ def waddstr(scr_id, cstr, attr="NO_USE"):
             return ERR
     else:
         if attr != "NO_USE":
-            oldattr = pdlib.getattrs(scr_id)
-            pdlib.wattrset(scr_id, attr)
-        ret = pdlib.waddstr(scr_id, CSTR(cstr))
-        if attr != "NO_USE":
-            pdlib.wattrset(scr_id, oldattr)
-        return ret
+            return _pd_with_attr(scr_id, attr, pdlib.waddstr, _cstr(cstr))
+        return pdlib.waddstr(scr_id, _cstr(cstr))
 
 
 def waddnstr(scr_id, cstr, n, attr="NO_USE"):
@@ -809,15 +1228,12 @@ def waddnstr(scr_id, cstr, n, attr="NO_USE"):
             return ERR
     else:
         if attr != "NO_USE":
-            oldattr = pdlib.getattrs(scr_id)
-            pdlib.wattrset(scr_id, attr)
-        ret = pdlib.waddnstr(scr_id, CSTR(cstr), n)
-        if attr != "NO_USE":
-            pdlib.wattrset(scr_id, oldattr)
-        return ret
+            return _pd_with_attr(scr_id, attr, pdlib.waddnstr, _cstr(cstr), n)
+        return pdlib.waddnstr(scr_id, _cstr(cstr), n)
 
 
 def wattroff(scr_id, attr):
+    _attr_changed(scr_id)
     if NCURSES:
         try:
             return scr_id.attroff(attr)
@@ -828,6 +1244,7 @@ def wattroff(scr_id, attr):
 
 
 def wattron(scr_id, attr):
+    _attr_changed(scr_id)
     if NCURSES:
         try:
             return scr_id.attron(attr)
@@ -838,6 +1255,7 @@ def wattron(scr_id, attr):
 
 
 def wattrset(scr_id, attr):
+    _attr_changed(scr_id, attr)
     if NCURSES:
         try:
             return scr_id.attrset(attr)
@@ -1090,6 +1508,8 @@ def wdeleteln(scr_id):
 
 
 def delwin(scr_id):
+    # Its tracked attribute is stale once the window is gone
+    _attr_changed(scr_id)
     if NCURSES:
         try:
             del scr_id
@@ -1103,11 +1523,10 @@ def delwin(scr_id):
 def derwin(srcwin, nlines, ncols, begin_y, begin_x):
     if NCURSES:
         try:
-            return srcwin.derwin(nlines, ncols, begin_y, begin_x)
+            return _attr_new(srcwin.derwin(nlines, ncols, begin_y, begin_x))
         except curses.error:
             return ERR
     else:
-        pdlib.derwin.restype = ctypes.c_void_p
         return ctypes.c_void_p(pdlib.derwin(srcwin, nlines, ncols, begin_y, begin_x))
 
 
@@ -1266,7 +1685,9 @@ def getmouse():
         except curses.error:
             return ERR
     else:
-        m_event = pdlib.nc_getmouse()
+        m_event = MEVENT()
+        if pdlib.nc_getmouse(ctypes.byref(m_event)) == ERR:
+            return ERR
         return (m_event.id, m_event.x, m_event.y, m_event.z, m_event.mmask_t)
 
 
@@ -1290,7 +1711,7 @@ def wgetstr(scr_id):
             return ERR
     else:
         t_str = ctypes.create_string_buffer(1023)
-        pdlib.wgetstr(scr_id, ctypes.byref(t_str))
+        pdlib.wgetstr(scr_id, t_str)
         return t_str.value.decode()
 
 
@@ -1311,7 +1732,7 @@ def getsyx():
 def getwin(file):   # THIS IS NOT CROSS-PLATFORM YET, AVOID IF POSSIBLE
     if NCURSES:
         try:
-            return curses.getwin(file)
+            return _attr_new(curses.getwin(file))
         except curses.error:
             return ERR
     else:
@@ -1452,14 +1873,14 @@ def init_pair(pair_number, fg, bg):
 
 def initscr():
     global stdscr
+    _ucs_locale()
     if NCURSES:
         try:
-            stdscr = curses.initscr()
+            stdscr = _attr_new(curses.initscr())
             return stdscr
         except curses.error:
             return ERR
     else:
-        pdlib.initscr.restype = ctypes.c_void_p
         stdscr = ctypes.c_void_p(pdlib.initscr())
         return stdscr
 
@@ -1495,12 +1916,8 @@ def winsstr(scr_id, strn, attr="NO_USE"):
     else:
         oldattr = 0
         if attr != "NO_USE":
-            oldattr = pdlib.getattrs(scr_id)
-            pdlib.wattrset(scr_id, attr)
-        ret = pdlib.winsstr(scr_id, CSTR(strn))
-        if attr != "NO_USE":
-            pdlib.wattrset(scr_id, oldattr)
-        return ret
+            return _pd_with_attr(scr_id, attr, pdlib.winsstr, _cstr(strn))
+        return pdlib.winsstr(scr_id, _cstr(strn))
 
 
 def winsnstr(scr_id, strn, n, attr="NO_USE"):
@@ -1514,12 +1931,8 @@ def winsnstr(scr_id, strn, n, attr="NO_USE"):
     else:
         oldattr = 0
         if attr != "NO_USE":
-            oldattr = pdlib.getattrs(scr_id)
-            pdlib.wattrset(scr_id, attr)
-        ret = pdlib.winsnstr(scr_id, CSTR(strn), n)
-        if attr != "NO_USE":
-            pdlib.wattrset(scr_id, oldattr)
-        return ret
+            return _pd_with_attr(scr_id, attr, pdlib.winsnstr, _cstr(strn), n)
+        return pdlib.winsnstr(scr_id, _cstr(strn), n)
 
 
 def winstr(scr_id, n=-1):
@@ -1530,7 +1943,7 @@ def winstr(scr_id, n=-1):
             return ERR
     else:
         t_str = ctypes.create_string_buffer(1023)
-        pdlib.winnstr(scr_id, ctypes.byref(t_str), n)
+        pdlib.winnstr(scr_id, t_str, n)
         return t_str.value.decode()
 
 
@@ -1612,7 +2025,7 @@ def leaveok(scr_id, yes):
         except curses.error:
             return ERR
     else:
-        if scr_id.value == PD_GET_CURSCR().value:
+        if getattr(scr_id, "value", scr_id) == PD_GET_CURSCR().value:
             PDC_LEAVEOK = yes
         return pdlib.leaveok(scr_id, yes)
 
@@ -1687,12 +2100,8 @@ def mvwaddstr(scr_id, y, x, cstr, attr="NO_USE"):
             return ERR
     else:
         if attr != "NO_USE":
-            oldattr = pdlib.getattrs(scr_id)
-            pdlib.wattrset(scr_id, attr)
-        ret = pdlib.mvwaddstr(scr_id, y, x, CSTR(cstr))
-        if attr != "NO_USE":
-            pdlib.wattrset(scr_id, oldattr)
-        return ret
+            return _pd_with_attr(scr_id, attr, pdlib.mvwaddstr, y, x, _cstr(cstr))
+        return pdlib.mvwaddstr(scr_id, y, x, _cstr(cstr))
 
 
 def mvwaddnstr(scr_id, y, x, cstr, n, attr="NO_USE"):
@@ -1705,12 +2114,8 @@ def mvwaddnstr(scr_id, y, x, cstr, n, attr="NO_USE"):
             return ERR
     else:
         if attr != "NO_USE":
-            oldattr = pdlib.getattrs(scr_id)
-            pdlib.wattrset(scr_id, attr)
-        ret = pdlib.mvwaddnstr(scr_id, y, x, CSTR(cstr), n)
-        if attr != "NO_USE":
-            pdlib.wattrset(scr_id, oldattr)
-        return ret
+            return _pd_with_attr(scr_id, attr, pdlib.mvwaddnstr, y, x, _cstr(cstr), n)
+        return pdlib.mvwaddnstr(scr_id, y, x, _cstr(cstr), n)
 
 
 def mvwchgat(scr_id, y, x, num, attr, color, opts=None):
@@ -1772,7 +2177,7 @@ def mvwgetstr(scr_id, y, x):
             return ERR
     else:
         t_str = ctypes.create_string_buffer(1023)
-        pdlib.mvwgetstr(scr_id, y, x, ctypes.byref(t_str))
+        pdlib.mvwgetstr(scr_id, y, x, t_str)
         return t_str.value.decode()
 
 
@@ -1817,12 +2222,8 @@ def mvwinsstr(scr_id, y, x, strn, attr="NO_USE"):
     else:
         oldattr = 0
         if attr != "NO_USE":
-            oldattr = pdlib.getattrs(scr_id)
-            pdlib.wattrset(scr_id, attr)
-        ret = pdlib.mvwinsstr(scr_id, y, x, CSTR(strn))
-        if attr != "NO_USE":
-            pdlib.wattrset(scr_id, oldattr)
-        return ret
+            return _pd_with_attr(scr_id, attr, pdlib.mvwinsstr, y, x, _cstr(strn))
+        return pdlib.mvwinsstr(scr_id, y, x, _cstr(strn))
 
 
 def mvwinsnstr(scr_id, y, x, strn, n, attr="NO_USE"):
@@ -1836,12 +2237,8 @@ def mvwinsnstr(scr_id, y, x, strn, n, attr="NO_USE"):
     else:
         oldattr = 0
         if attr != "NO_USE":
-            oldattr = pdlib.getattrs(scr_id)
-            pdlib.wattrset(scr_id, attr)
-        ret = pdlib.mvwinsnstr(scr_id, y, x, CSTR(strn), n)
-        if attr != "NO_USE":
-            pdlib.wattrset(scr_id, oldattr)
-        return ret
+            return _pd_with_attr(scr_id, attr, pdlib.mvwinsnstr, y, x, _cstr(strn), n)
+        return pdlib.mvwinsnstr(scr_id, y, x, _cstr(strn), n)
 
 
 def mvwinstr(scr_id, y, x, n=-1):
@@ -1852,7 +2249,7 @@ def mvwinstr(scr_id, y, x, n=-1):
             return ERR
     else:
         t_str = ctypes.create_string_buffer(1023)
-        pdlib.mvwinnstr(scr_id, y, x, ctypes.byref(t_str), n)
+        pdlib.mvwinnstr(scr_id, y, x, t_str, n)
         return t_str.value.decode()
 
 
@@ -1889,22 +2286,20 @@ def napms(ms):
 def newpad(nlines, ncols):
     if NCURSES:
         try:
-            return curses.newpad(nlines, ncols)
+            return _attr_new(curses.newpad(nlines, ncols))
         except curses.error:
             return ERR
     else:
-        pdlib.newpad.restype = ctypes.c_void_p
         return ctypes.c_void_p(pdlib.newpad(nlines, ncols))
 
 
 def newwin(nlines, ncols, begin_y, begin_x):
     if NCURSES:
         try:
-            return curses.newwin(nlines, ncols, begin_y, begin_x)
+            return _attr_new(curses.newwin(nlines, ncols, begin_y, begin_x))
         except curses.error:
             return ERR
     else:
-        pdlib.newwin.restype = ctypes.c_void_p
         return ctypes.c_void_p(pdlib.newwin(nlines, ncols, begin_y, begin_x))
 
 
@@ -2141,6 +2536,23 @@ def reset_shell_mode():
         return pdlib.reset_shell_mode()
 
 
+def resize_term(nlines, ncols):
+    """
+    Resize the curses screen. resize_term(0, 0) adopts the current size of the
+    terminal: PDCurses needs it after KEY_RESIZE, NCurses resizes itself when
+    the terminal does, so there it does nothing.
+    """
+    if NCURSES:
+        if not nlines or not ncols:
+            return OK
+        try:
+            return curses.resize_term(nlines, ncols)
+        except curses.error:
+            return ERR
+    else:
+        return pdlib.resize_term(nlines, ncols)
+
+
 def wresize(scr_id, lines, columns):
     if NCURSES:
         try:
@@ -2204,10 +2616,11 @@ def setupterm(termstr, fd):
         except curses.error:
             return ERR
     else:
-        return pdlib.setupterm(termstr, fd, None)
+        return pdlib.setupterm(CSTR(termstr), fd, None)
 
 
 def wstandend(scr_id):
+    _attr_changed(scr_id)
     if NCURSES:
         try:
             return scr_id.standend()
@@ -2218,6 +2631,7 @@ def wstandend(scr_id):
 
 
 def wstandout(scr_id):
+    _attr_changed(scr_id)
     if NCURSES:
         try:
             return scr_id.standout()
@@ -2240,22 +2654,20 @@ def start_color():
 def subpad(scrwin, nlines, ncols, begin_y, begin_x):
     if NCURSES:
         try:
-            return scrwin.subpad(nlines, ncols, begin_y, begin_x)
+            return _attr_new(scrwin.subpad(nlines, ncols, begin_y, begin_x))
         except curses.error:
             return ERR
     else:
-        pdlib.subpad.restype = ctypes.c_void_p
         return ctypes.c_void_p(pdlib.subpad(scrwin, nlines, ncols, begin_y, begin_x))
 
 
 def subwin(srcwin, nlines, ncols, begin_y, begin_x):
     if NCURSES:
         try:
-            return srcwin.subwin(nlines, ncols, begin_y, begin_x)
+            return _attr_new(srcwin.subwin(nlines, ncols, begin_y, begin_x))
         except curses.error:
             return ERR
     else:
-        pdlib.subwin.restype = ctypes.c_void_p
         return ctypes.c_void_p(pdlib.subwin(srcwin, nlines, ncols, begin_y, begin_x))
 
 
@@ -2850,4 +3262,639 @@ def panel_window(pan_id):
     else:
         return pdlib.panel_window(pan_id)
 
+# ++ UNICURSES EXTENSIONS ++
+
+
+def _coalesce_ops(ops):
+    """
+    Merge (y, x, text, attr) drawing operations into runs: an operation that
+    starts on the same row right where the previous one ended, with the same
+    attribute, is appended to the previous run.
+    """
+    run_y = run_x = run_attr = None
+    run_end = -1
+    parts = []
+    for y, x, text, attr in ops:
+        text = str(text)
+        if parts and y == run_y and x == run_end and attr == run_attr:
+            parts.append(text)
+        else:
+            if parts:
+                yield (run_y, run_x, "".join(parts), run_attr)
+            run_y, run_x, run_attr = y, x, attr
+            parts = [text]
+            run_end = x
+        run_end += len(text)
+    if parts:
+        yield (run_y, run_x, "".join(parts), run_attr)
+
+
+class attrs(object):
+    """
+    Context manager that sets a window attribute once for a block of writes
+    and restores the previous one afterwards:
+
+        with attrs(win, A_REVERSE | COLOR_PAIR(2)):
+            mvwaddstr(win, 1, 1, "highlighted")
+            mvwaddstr(win, 2, 1, "row", A_REVERSE | COLOR_PAIR(2))
+
+    Writes inside the block that pass the same attribute cost no extra
+    wattrset calls. NCurses cannot report a window's attribute, so there the
+    previous one is the last set with wattrset (A_NORMAL if unknown).
+    """
+    __slots__ = ("scr_id", "attr", "oldattr")
+
+    def __init__(self, scr_id, attr):
+        self.scr_id = scr_id
+        self.attr = attr
+        self.oldattr = None
+
+    def __enter__(self):
+        if NCURSES:
+            self.oldattr = _attr_state.get(id(self.scr_id), A_NORMAL)
+        else:
+            self.oldattr = _pd_known_attr(self.scr_id)
+        if self.attr != self.oldattr:
+            wattrset(self.scr_id, self.attr)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.attr != self.oldattr:
+            wattrset(self.scr_id, self.oldattr)
+        return False
+
+
+def draw_batch(scr_id, ops):
+    """
+    Draw many (y, x, text, attr) operations on a window in one pass.
+    Adjacent operations with the same attribute are coalesced into a single
+    write; an attr of None draws with the window's current attribute.
+    Returns ERR if any write failed, OK otherwise.
+    """
+    if NCURSES:
+        ret = OK
+        for y, x, text, attr in _coalesce_ops(ops):
+            try:
+                if attr is None:
+                    scr_id.addstr(y, x, text)
+                else:
+                    scr_id.addstr(y, x, text, attr)
+            except curses.error:
+                ret = ERR
+        return ret
+    else:
+        ret = OK
+        oldattr = _pd_known_attr(scr_id)
+        current = oldattr
+        for y, x, text, attr in _coalesce_ops(ops):
+            if attr is None:
+                attr = oldattr
+            if attr != current:
+                pdlib.wattrset(scr_id, attr)
+                current = attr
+            if pdlib.mvwaddstr(scr_id, y, x, _cstr(text)) == ERR:
+                ret = ERR
+        if current != oldattr:
+            pdlib.wattrset(scr_id, oldattr)
+        return ret
+
 # --- UNIFIED CURSES ---
+
+
+# +++ BACKEND BINDING +++
+
+# The unified functions above decide between NCurses and PDCurses on every
+# call. The functions below are the same wrappers specialised for a single
+# backend; ucs_bind_backend() installs the right set over the unified names
+# once, right after the backend is detected or reconfigured, so the hot
+# drawing path no longer pays for the branch.
+# NOTE: names imported with "from unicurses import *" are copies, so call
+# ucs_reconfigure() before importing them into another namespace.
+
+# NCurses specialisations
+def _nc_waddch(scr_id, ch, attr=A_NORMAL):
+    try:
+        return scr_id.addch(ch, attr)
+    except curses.error:
+        return ERR
+
+
+def _nc_mvwaddch(scr_id, y, x, ch, attr=A_NORMAL):
+    try:
+        return scr_id.addch(y, x, ch, attr)
+    except curses.error:
+        return ERR
+
+
+def _nc_waddstr(scr_id, cstr, attr="NO_USE"):
+    try:
+        if attr != "NO_USE":
+            return scr_id.addstr(str(cstr), attr)
+        return scr_id.addstr(str(cstr))
+    except curses.error:
+        return ERR
+
+
+def _nc_mvwaddstr(scr_id, y, x, cstr, attr="NO_USE"):
+    try:
+        if attr != "NO_USE":
+            return scr_id.addstr(y, x, str(cstr), attr)
+        return scr_id.addstr(y, x, str(cstr))
+    except curses.error:
+        return ERR
+
+
+def _nc_waddnstr(scr_id, cstr, n, attr="NO_USE"):
+    try:
+        if attr != "NO_USE":
+            return scr_id.addnstr(str(cstr), n, int(attr))
+        return scr_id.addnstr(str(cstr), n)
+    except curses.error:
+        return ERR
+
+
+def _nc_mvwaddnstr(scr_id, y, x, cstr, n, attr="NO_USE"):
+    try:
+        if attr != "NO_USE":
+            return scr_id.addnstr(y, x, str(cstr), n, attr)
+        return scr_id.addnstr(y, x, str(cstr), n)
+    except curses.error:
+        return ERR
+
+
+def _nc_wattroff(scr_id, attr):
+    _attr_state.pop(id(scr_id), None)
+    try:
+        return scr_id.attroff(attr)
+    except curses.error:
+        return ERR
+
+
+def _nc_wattron(scr_id, attr):
+    _attr_state.pop(id(scr_id), None)
+    try:
+        return scr_id.attron(attr)
+    except curses.error:
+        return ERR
+
+
+def _nc_wattrset(scr_id, attr):
+    _attr_state[id(scr_id)] = attr
+    try:
+        return scr_id.attrset(attr)
+    except curses.error:
+        return ERR
+
+
+def _nc_box(scr_id, verch=ACS_VLINE, horch=ACS_HLINE):
+    try:
+        return scr_id.box(verch, horch)
+    except curses.error:
+        return ERR
+
+
+def _nc_color_pair(color_number):
+    try:
+        return curses.color_pair(color_number)
+    except curses.error:
+        return ERR
+
+
+def _nc_copywin(src_id, dest_id, sminrow, smincol, dminrow, dmincol, dmaxrow,
+                dmaxcol, overlay):
+    try:
+        if overlay:
+            return src_id.overlay(dest_id, sminrow, smincol, dminrow, dmincol,
+                                  dmaxrow, dmaxcol)
+        return src_id.overwrite(dest_id, sminrow, smincol, dminrow, dmincol,
+                                dmaxrow, dmaxcol)
+    except curses.error:
+        return ERR
+
+
+def _nc_wclear(scr_id):
+    try:
+        return scr_id.clear()
+    except curses.error:
+        return ERR
+
+
+def _nc_wclrtobot(scr_id):
+    try:
+        return scr_id.clrtobot()
+    except curses.error:
+        return ERR
+
+
+def _nc_wclrtoeol(scr_id):
+    try:
+        return scr_id.clrtoeol()
+    except curses.error:
+        return ERR
+
+
+def _nc_doupdate():
+    try:
+        return curses.doupdate()
+    except curses.error:
+        return ERR
+
+
+def _nc_werase(scr_id):
+    try:
+        return scr_id.erase()
+    except curses.error:
+        return ERR
+
+
+def _nc_wgetch(scr_id):
+    try:
+        return scr_id.getch()
+    except curses.error:
+        return ERR
+
+
+def _nc_getmaxyx(scr_id):
+    try:
+        return scr_id.getmaxyx()
+    except curses.error:
+        return ERR
+
+
+def _nc_getyx(scr_id):
+    try:
+        return scr_id.getyx()
+    except curses.error:
+        return ERR
+
+
+def _nc_whline(scr_id, ch, n):
+    try:
+        return scr_id.hline(ch, n)
+    except curses.error:
+        return ERR
+
+
+def _nc_mvwhline(scr_id, y, x, ch, n):
+    try:
+        return scr_id.hline(y, x, ch, n)
+    except curses.error:
+        return ERR
+
+
+def _nc_mvwvline(scr_id, y, x, ch, n):
+    try:
+        return scr_id.vline(y, x, ch, n)
+    except curses.error:
+        return ERR
+
+
+def _nc_wmove(scr_id, new_y, new_x):
+    try:
+        return scr_id.move(new_y, new_x)
+    except curses.error:
+        return ERR
+
+
+def _nc_mvwin(scr_id, y, x):
+    try:
+        return scr_id.mvwin(y, x)
+    except curses.error:
+        return ERR
+
+
+def _nc_newwin(nlines, ncols, begin_y, begin_x):
+    try:
+        return _attr_new(curses.newwin(nlines, ncols, begin_y, begin_x))
+    except curses.error:
+        return ERR
+
+
+def _nc_noutrefresh(scr_id):
+    try:
+        return scr_id.noutrefresh()
+    except curses.error:
+        return ERR
+
+
+def _nc_wrefresh(scr_id):
+    try:
+        return scr_id.refresh()
+    except curses.error:
+        return ERR
+
+
+def _nc_prefresh(scr_id, pminrow, pmincol, sminrow, smincol, smaxrow, smaxcol):
+    try:
+        return scr_id.refresh(pminrow, pmincol, sminrow, smincol, smaxrow, smaxcol)
+    except curses.error:
+        return ERR
+
+
+def _nc_wresize(scr_id, lines, columns):
+    try:
+        return scr_id.resize(lines, columns)
+    except curses.error:
+        return ERR
+
+
+def _nc_wscrl(scr_id, lines=1):
+    try:
+        return scr_id.scroll(lines)
+    except curses.error:
+        return ERR
+
+
+def _nc_touchwin(scr_id):
+    try:
+        return scr_id.touchwin()
+    except curses.error:
+        return ERR
+
+
+def _nc_update_panels():
+    try:
+        return curses.panel.update_panels()
+    except curses.panel.error:
+        return ERR
+
+
+def _nc_show_panel(pan_id):
+    try:
+        return pan_id.show()
+    except curses.panel.error:
+        return ERR
+
+
+def _nc_hide_panel(pan_id):
+    try:
+        return pan_id.hide()
+    except curses.panel.error:
+        return ERR
+
+
+def _nc_top_panel(pan_id):
+    try:
+        return pan_id.top()
+    except curses.panel.error:
+        return ERR
+
+
+def _nc_move_panel(pan_id, y, x):
+    try:
+        return pan_id.move(y, x)
+    except curses.panel.error:
+        return ERR
+
+
+def _nc_new_panel(scr_id):
+    try:
+        return curses.panel.new_panel(scr_id)
+    except curses.panel.error:
+        return ERR
+
+
+def _nc_draw_batch(scr_id, ops):
+    ret = OK
+    addstr = scr_id.addstr
+    for y, x, text, attr in _coalesce_ops(ops):
+        try:
+            if attr is None:
+                addstr(y, x, text)
+            else:
+                addstr(y, x, text, attr)
+        except curses.error:
+            ret = ERR
+    return ret
+
+
+# PDCurses specialisations
+def _pd_waddch(scr_id, ch, attr=A_NORMAL):
+    return pdlib.waddch(scr_id, ch | attr)
+
+
+def _pd_mvwaddch(scr_id, y, x, ch, attr=A_NORMAL):
+    return pdlib.mvwaddch(scr_id, y, x, ch | attr)
+
+
+def _pd_waddstr(scr_id, cstr, attr="NO_USE"):
+    if attr != "NO_USE":
+        return _pd_with_attr(scr_id, attr, pdlib.waddstr, _cstr(cstr))
+    return pdlib.waddstr(scr_id, _cstr(cstr))
+
+
+def _pd_mvwaddstr(scr_id, y, x, cstr, attr="NO_USE"):
+    if attr != "NO_USE":
+        return _pd_with_attr(scr_id, attr, pdlib.mvwaddstr, y, x, _cstr(cstr))
+    return pdlib.mvwaddstr(scr_id, y, x, _cstr(cstr))
+
+
+def _pd_waddnstr(scr_id, cstr, n, attr="NO_USE"):
+    if attr != "NO_USE":
+        return _pd_with_attr(scr_id, attr, pdlib.waddnstr, _cstr(cstr), n)
+    return pdlib.waddnstr(scr_id, _cstr(cstr), n)
+
+
+def _pd_mvwaddnstr(scr_id, y, x, cstr, n, attr="NO_USE"):
+    if attr != "NO_USE":
+        return _pd_with_attr(scr_id, attr, pdlib.mvwaddnstr, y, x, _cstr(cstr), n)
+    return pdlib.mvwaddnstr(scr_id, y, x, _cstr(cstr), n)
+
+
+def _pd_wattroff(scr_id, attr):
+    _attr_changed(scr_id)
+    return pdlib.wattroff(scr_id, attr)
+
+
+def _pd_wattron(scr_id, attr):
+    _attr_changed(scr_id)
+    return pdlib.wattron(scr_id, attr)
+
+
+def _pd_wattrset(scr_id, attr):
+    _attr_changed(scr_id, attr)
+    return pdlib.wattrset(scr_id, attr)
+
+
+def _pd_box(scr_id, verch=ACS_VLINE, horch=ACS_HLINE):
+    return pdlib.box(scr_id, verch, horch)
+
+
+def _pd_copywin(src_id, dest_id, sminrow, smincol, dminrow, dmincol, dmaxrow,
+                dmaxcol, overlay):
+    return pdlib.copywin(src_id, dest_id, sminrow, smincol, dminrow, dmincol,
+                         dmaxrow, dmaxcol, overlay)
+
+
+def _pd_wclear(scr_id):
+    return pdlib.wclear(scr_id)
+
+
+def _pd_wclrtobot(scr_id):
+    return pdlib.wclrtobot(scr_id)
+
+
+def _pd_wclrtoeol(scr_id):
+    return pdlib.wclrtoeol(scr_id)
+
+
+def _pd_doupdate():
+    return pdlib.doupdate()
+
+
+def _pd_werase(scr_id):
+    return pdlib.werase(scr_id)
+
+
+def _pd_wgetch(scr_id):
+    return pdlib.wgetch(scr_id)
+
+
+def _pd_getmaxyx(scr_id):
+    return (pdlib.getmaxy(scr_id), pdlib.getmaxx(scr_id))
+
+
+def _pd_getyx(scr_id):
+    return (pdlib.getcury(scr_id), pdlib.getcurx(scr_id))
+
+
+def _pd_whline(scr_id, ch, n):
+    return pdlib.whline(scr_id, ch, n)
+
+
+def _pd_mvwhline(scr_id, y, x, ch, n):
+    return pdlib.mvwhline(scr_id, y, x, ch, n)
+
+
+def _pd_mvwvline(scr_id, y, x, ch, n):
+    return pdlib.mvwvline(scr_id, y, x, ch, n)
+
+
+def _pd_wmove(scr_id, new_y, new_x):
+    return pdlib.wmove(scr_id, new_y, new_x)
+
+
+def _pd_mvwin(scr_id, y, x):
+    return pdlib.mvwin(scr_id, y, x)
+
+
+def _pd_newwin(nlines, ncols, begin_y, begin_x):
+    return ctypes.c_void_p(pdlib.newwin(nlines, ncols, begin_y, begin_x))
+
+
+def _pd_noutrefresh(scr_id):
+    return pdlib.wnoutrefresh(scr_id)
+
+
+def _pd_wrefresh(scr_id):
+    return pdlib.wrefresh(scr_id)
+
+
+def _pd_prefresh(scr_id, pminrow, pmincol, sminrow, smincol, smaxrow, smaxcol):
+    return pdlib.prefresh(scr_id, pminrow, pmincol, sminrow, smincol, smaxrow, smaxcol)
+
+
+def _pd_wresize(scr_id, lines, columns):
+    return pdlib.wresize(scr_id, lines, columns)
+
+
+def _pd_wscrl(scr_id, lines=1):
+    return pdlib.wscrl(scr_id, lines)
+
+
+def _pd_touchwin(scr_id):
+    return pdlib.touchwin(scr_id)
+
+
+def _pd_update_panels():
+    return pdlib.update_panels()
+
+
+def _pd_show_panel(pan_id):
+    return pdlib.show_panel(pan_id)
+
+
+def _pd_hide_panel(pan_id):
+    return pdlib.hide_panel(pan_id)
+
+
+def _pd_top_panel(pan_id):
+    return pdlib.top_panel(pan_id)
+
+
+def _pd_move_panel(pan_id, y, x):
+    return pdlib.move_panel(pan_id, y, x)
+
+
+def _pd_new_panel(scr_id):
+    return pdlib.new_panel(scr_id)
+
+
+def _pd_draw_batch(scr_id, ops):
+    ret = OK
+    wattrset = pdlib.wattrset
+    mvwaddstr = pdlib.mvwaddstr
+    oldattr = _pd_known_attr(scr_id)
+    current = oldattr
+    for y, x, text, attr in _coalesce_ops(ops):
+        if attr is None:
+            attr = oldattr
+        if attr != current:
+            wattrset(scr_id, attr)
+            current = attr
+        if mvwaddstr(scr_id, y, x, _cstr(text)) == ERR:
+            ret = ERR
+    if current != oldattr:
+        wattrset(scr_id, oldattr)
+    return ret
+
+
+# Names that have a specialised implementation for each backend
+_UCS_BOUND_NAMES = [
+    "waddch", "mvwaddch", "waddstr", "mvwaddstr", "waddnstr", "mvwaddnstr",
+    "wattroff", "wattron", "wattrset", "box", "color_pair", "copywin",
+    "wclear", "wclrtobot", "wclrtoeol", "doupdate", "werase", "wgetch",
+    "getmaxyx", "getyx", "whline", "mvwhline", "mvwvline", "wmove", "mvwin",
+    "newwin", "noutrefresh", "wrefresh", "prefresh", "wresize", "wscrl",
+    "touchwin", "update_panels", "show_panel", "hide_panel", "top_panel",
+    "move_panel", "new_panel", "draw_batch"]
+
+# The unified (branching) implementations, kept for ucs_unbind_backend()
+_UCS_UNIFIED = dict((name, globals()[name]) for name in _UCS_BOUND_NAMES)
+
+
+def _ucs_backend_table():
+    """Build the {name: callable} table for the active backend."""
+    if NCURSES:
+        prefix = "_nc_"
+        table = {"color_pair": _nc_color_pair}
+    else:
+        prefix = "_pd_"
+        if not isinstance(pdlib, _LazyLibrary):
+            _pd_apply_prototypes(pdlib)
+        table = {"color_pair": PD_COLOR_PAIR}
+    g = globals()
+    for name in _UCS_BOUND_NAMES:
+        if name not in table:
+            table[name] = g[prefix + name]
+    return table
+
+
+def ucs_bind_backend():
+    """
+    Install the backend-specialised wrappers over the unified names.
+    Called automatically at import time and by ucs_reconfigure().
+    """
+    globals().update(_ucs_backend_table())
+    # Attributes tracked for the previous backend's windows are meaningless now
+    _attr_state.clear()
+
+
+def ucs_unbind_backend():
+    """Restore the unified (per-call branching) wrappers."""
+    globals().update(_UCS_UNIFIED)
+
+
+ucs_bind_backend()
+
+# --- BACKEND BINDING ---
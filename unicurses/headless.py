@@ -0,0 +1,1258 @@
+# UniCurses -- A unified multiplatform Curses provider library for Python 2.x/3.x
+# Copyright (C) 2010 by Michael Kamensky.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Headless UniCurses backend: an in-memory virtual terminal.
+
+This module implements the parts of the Python `curses` and `curses.panel`
+modules that UniCurses uses, on top of a grid of (character, attribute)
+cells instead of a real terminal. Input comes from a scripted queue
+(push_keys, push_mouse, resize_term). It is selected with the environment
+variable UNICURSES_BACKEND=headless (before importing unicurses) or with
+ucs_reconfigure(UCS_HEADLESS_WRAPPER, UCS_HEADLESS_WRAPPER).
+
+Inspect the result of a run with screen_lines(), screen_cell() and stats.
+"""
+
+import sys
+import weakref
+from collections import deque
+
+
+class error(Exception):
+    """Raised where the curses module would raise curses.error."""
+    pass
+
+
+class InputExhausted(Exception):
+    """Raised by a blocking getch() when the scripted input queue is empty."""
+    pass
+
+
+# +++ CONSTANTS (NCurses values) +++
+
+OK = 0
+ERR = -1
+
+A_NORMAL = 0
+A_CHARTEXT = 0x000000ff
+A_COLOR = 0x0000ff00
+A_ATTRIBUTES = 0xffffff00
+A_STANDOUT = 0x00010000
+A_UNDERLINE = 0x00020000
+A_REVERSE = 0x00040000
+A_BLINK = 0x00080000
+A_DIM = 0x00100000
+A_BOLD = 0x00200000
+A_ALTCHARSET = 0x00400000
+A_INVIS = 0x00800000
+A_PROTECT = 0x01000000
+
+COLOR_BLACK = 0
+COLOR_RED = 1
+COLOR_GREEN = 2
+COLOR_YELLOW = 3
+COLOR_BLUE = 4
+COLOR_MAGENTA = 5
+COLOR_CYAN = 6
+COLOR_WHITE = 7
+
+KEY_MIN = 0o401
+KEY_BREAK = 0o401
+KEY_DOWN = 0o402
+KEY_UP = 0o403
+KEY_LEFT = 0o404
+KEY_RIGHT = 0o405
+KEY_HOME = 0o406
+KEY_BACKSPACE = 0o407
+KEY_F0 = 0o410
+KEY_DL = 0o510
+KEY_IL = 0o511
+KEY_DC = 0o512
+KEY_IC = 0o513
+KEY_EIC = 0o514
+KEY_CLEAR = 0o515
+KEY_EOS = 0o516
+KEY_EOL = 0o517
+KEY_SF = 0o520
+KEY_SR = 0o521
+KEY_NPAGE = 0o522
+KEY_PPAGE = 0o523
+KEY_STAB = 0o524
+KEY_CTAB = 0o525
+KEY_CATAB = 0o526
+KEY_ENTER = 0o527
+KEY_SRESET = 0o530
+KEY_RESET = 0o531
+KEY_PRINT = 0o532
+KEY_LL = 0o533
+KEY_A1 = 0o534
+KEY_A3 = 0o535
+KEY_B2 = 0o536
+KEY_C1 = 0o537
+KEY_C3 = 0o540
+KEY_BTAB = 0o541
+KEY_BEG = 0o542
+KEY_CANCEL = 0o543
+KEY_CLOSE = 0o544
+KEY_COMMAND = 0o545
+KEY_COPY = 0o546
+KEY_CREATE = 0o547
+KEY_END = 0o550
+KEY_EXIT = 0o551
+KEY_FIND = 0o552
+KEY_HELP = 0o553
+KEY_MARK = 0o554
+KEY_MESSAGE = 0o555
+KEY_MOVE = 0o556
+KEY_NEXT = 0o557
+KEY_OPEN = 0o560
+KEY_OPTIONS = 0o561
+KEY_PREVIOUS = 0o562
+KEY_REDO = 0o563
+KEY_REFERENCE = 0o564
+KEY_REFRESH = 0o565
+KEY_REPLACE = 0o566
+KEY_RESTART = 0o567
+KEY_RESUME = 0o570
+KEY_SAVE = 0o571
+KEY_SBEG = 0o572
+KEY_SCANCEL = 0o573
+KEY_SCOMMAND = 0o574
+KEY_SCOPY = 0o575
+KEY_SCREATE = 0o576
+KEY_SDC = 0o577
+KEY_SDL = 0o600
+KEY_SELECT = 0o601
+KEY_SEND = 0o602
+KEY_SEOL = 0o603
+KEY_SEXIT = 0o604
+KEY_SFIND = 0o605
+KEY_SHELP = 0o606
+KEY_SHOME = 0o607
+KEY_SIC = 0o610
+KEY_SLEFT = 0o611
+KEY_SMESSAGE = 0o612
+KEY_SMOVE = 0o613
+KEY_SNEXT = 0o614
+KEY_SOPTIONS = 0o615
+KEY_SPREVIOUS = 0o616
+KEY_SPRINT = 0o617
+KEY_SREDO = 0o620
+KEY_SREPLACE = 0o621
+KEY_SRIGHT = 0o622
+KEY_SRSUME = 0o623
+KEY_SSAVE = 0o624
+KEY_SSUSPEND = 0o625
+KEY_SUNDO = 0o626
+KEY_SUSPEND = 0o627
+KEY_UNDO = 0o630
+KEY_MOUSE = 0o631
+KEY_RESIZE = 0o632
+KEY_MAX = 0o777
+
+BUTTON1_RELEASED = 0o1
+BUTTON1_PRESSED = 0o2
+BUTTON1_CLICKED = 0o4
+BUTTON1_DOUBLE_CLICKED = 0o10
+BUTTON1_TRIPLE_CLICKED = 0o20
+BUTTON2_RELEASED = 0o100
+BUTTON2_PRESSED = 0o200
+BUTTON2_CLICKED = 0o400
+BUTTON2_DOUBLE_CLICKED = 0o1000
+BUTTON2_TRIPLE_CLICKED = 0o2000
+BUTTON3_RELEASED = 0o10000
+BUTTON3_PRESSED = 0o20000
+BUTTON3_CLICKED = 0o40000
+BUTTON3_DOUBLE_CLICKED = 0o100000
+BUTTON3_TRIPLE_CLICKED = 0o200000
+BUTTON4_RELEASED = 0o1000000
+BUTTON4_PRESSED = 0o2000000
+BUTTON4_CLICKED = 0o4000000
+BUTTON4_DOUBLE_CLICKED = 0o10000000
+BUTTON4_TRIPLE_CLICKED = 0o20000000
+BUTTON_CTRL = 0o1000000000
+BUTTON_SHIFT = 0o2000000000
+BUTTON_ALT = 0o4000000000
+REPORT_MOUSE_POSITION = 0o10000000000
+ALL_MOUSE_EVENTS = REPORT_MOUSE_POSITION - 1
+
+# Printable stand-ins for the alternate character set
+_ACS_GLYPHS = {
+    "l": "+", "m": "+", "k": "+", "j": "+", "t": "+", "u": "+", "v": "+",
+    "w": "+", "n": "+", "q": "-", "x": "|", "o": "-", "s": "_", "`": "+",
+    "a": ":", "f": "\\", "g": "#", "~": "o", ",": "<", "+": ">", ".": "v",
+    "-": "^", "h": "#", "i": "*", "0": "#", "p": "-", "r": "-", "y": "<",
+    "z": ">", "{": "n", "|": "+", "}": "L"}
+
+# --- CONSTANTS ---
+
+
+# +++ VIRTUAL TERMINAL +++
+
+class _Stats(object):
+    """Counters describing the work done by the virtual terminal."""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.doupdates = 0        # doupdate() calls (terminal flushes)
+        self.cells_flushed = 0    # cells that changed on the physical screen
+        self.noutrefreshes = 0    # window copies to the virtual screen
+
+    def as_dict(self):
+        return {"doupdates": self.doupdates,
+                "cells_flushed": self.cells_flushed,
+                "noutrefreshes": self.noutrefreshes}
+
+
+class _Screen(object):
+    """The virtual (newscr) and physical (curscr) screens and input queue."""
+    def __init__(self, lines, cols):
+        self.lines = lines
+        self.cols = cols
+        self.newscr = _blank(lines, cols)
+        self.curscr = _blank(lines, cols)
+        self.dirty_rows = set()
+        self.panels = []          # weak references, bottom to top
+        self.cursor = (0, 0)
+        self.leaveok = False
+
+
+def _blank(lines, cols):
+    """A grid of blank cells: one [chars, attrs] pair per row."""
+    return [[[" "] * cols, [0] * cols] for _ in range(lines)]
+
+
+# Module state
+_config = {"lines": 24, "cols": 80, "colors": 256, "color_pairs": 256}
+_screen = None
+_stdscr = None
+_input = deque()
+_mouse = deque()
+_pairs = {0: (COLOR_WHITE, COLOR_BLACK)}
+_colors = {}
+_isendwin = False
+stats = _Stats()
+
+LINES = _config["lines"]
+COLS = _config["cols"]
+COLORS = 0
+COLOR_PAIRS = 0
+
+
+def configure(lines=24, cols=80, colors=256, color_pairs=256):
+    """Sets the virtual terminal size and capabilities used by initscr()."""
+    _config.update(lines=lines, cols=cols, colors=colors, color_pairs=color_pairs)
+
+
+def _require_screen():
+    if _screen is None:
+        raise error("must call initscr() first")
+    return _screen
+
+
+def _glyph(ch):
+    """Converts a chtype or string to (char, attr bits)."""
+    if isinstance(ch, int):
+        attr = ch & A_ATTRIBUTES
+        c = chr(ch & A_CHARTEXT)
+        if attr & A_ALTCHARSET:
+            c = _ACS_GLYPHS.get(c, c)
+            attr &= ~A_ALTCHARSET
+        return c, attr
+    if isinstance(ch, bytes):
+        ch = ch.decode()
+    return str(ch)[:1], 0
+
+
+class _Window(object):
+    """An in-memory curses window, pad, or subwindow."""
+    def __init__(self, nlines, ncols, begin_y, begin_x, parent=None,
+                 is_pad=False):
+        self.nlines = nlines
+        self.ncols = ncols
+        self.begy = begin_y
+        self.begx = begin_x
+        self.parent = parent
+        self.is_pad = is_pad
+        if parent is None:
+            self.rows = _blank(nlines, ncols)
+            self.offy = self.offx = 0
+        else:
+            # Subwindows share their parent's cells
+            self.rows = parent.rows
+            self.offy = parent.offy + begin_y - parent.begy
+            self.offx = parent.offx + begin_x - parent.begx
+        self.cury = self.curx = 0
+        self.attr = 0
+        self.bkgd_ch = " "
+        self.bkgd_attr = 0
+        self.touched = set(range(nlines))
+        self.scroll_ok = False
+        self.scroll_top = 0
+        self.scroll_bot = nlines - 1
+        self.delay = -1
+        self.use_keypad = False
+        self.leave_ok = False
+
+    # -- cell access --
+    def _root(self):
+        win = self
+        while win.parent is not None:
+            win = win.parent
+        return win
+
+    def _touch(self, y):
+        self.touched.add(y)
+        if self.parent is not None:
+            self._root().touched.add(self.offy + y)
+
+    def _put(self, y, x, c, attr):
+        row = self.rows[self.offy + y]
+        row[0][self.offx + x] = c
+        row[1][self.offx + x] = attr
+        self._touch(y)
+
+    def _get(self, y, x):
+        row = self.rows[self.offy + y]
+        return row[0][self.offx + x], row[1][self.offx + x]
+
+    def _check(self, y, x):
+        if not (0 <= y < self.nlines and 0 <= x < self.ncols):
+            raise error("position out of window")
+
+    def _blank_line(self, y, start=0):
+        row = self.rows[self.offy + y]
+        n = self.ncols - start
+        row[0][self.offx + start:self.offx + self.ncols] = [self.bkgd_ch] * n
+        row[1][self.offx + start:self.offx + self.ncols] = [self.bkgd_attr] * n
+        self._touch(y)
+
+    def _addstr(self, text, attr):
+        n = len(text)
+        if self.curx + n < self.ncols and "\n" not in text:
+            # Fast path: the text fits on the current line
+            row = self.rows[self.offy + self.cury]
+            x = self.offx + self.curx
+            row[0][x:x + n] = list(text)
+            row[1][x:x + n] = [attr | self.attr] * n
+            self._touch(self.cury)
+            self.curx += n
+        else:
+            for c in text:
+                self._addch(c, attr)
+
+    def _scroll_region(self, top, bottom, n):
+        """Scrolls rows top..bottom up by n (down if n < 0)."""
+        height = bottom - top + 1
+        base = self.offy
+        old = [(list(self.rows[base + y][0][self.offx:self.offx + self.ncols]),
+                list(self.rows[base + y][1][self.offx:self.offx + self.ncols]))
+               for y in range(top, bottom + 1)]
+        for i in range(height):
+            src = i + n
+            y = top + i
+            if 0 <= src < height:
+                chars, attrs = old[src]
+                for x in range(self.ncols):
+                    self._put(y, x, chars[x], attrs[x])
+            else:
+                self._blank_line(y)
+
+    def _newline(self):
+        self.curx = 0
+        if self.cury == self.scroll_bot:
+            if not self.scroll_ok:
+                raise error("addwstr() returned ERR")
+            self._scroll_region(self.scroll_top, self.scroll_bot, 1)
+        elif self.cury < self.nlines - 1:
+            self.cury += 1
+        else:
+            raise error("addwstr() returned ERR")
+
+    def _addch(self, c, attr):
+        if c == "\n":
+            self.clrtoeol()
+            self._newline()
+            return
+        self._put(self.cury, self.curx, c, attr | self.attr)
+        if self.curx < self.ncols - 1:
+            self.curx += 1
+        else:
+            self._newline()
+
+    def _move_args(self, args, count):
+        """Splits off a leading (y, x) if more than `count` args were given."""
+        if len(args) > count:
+            self.move(args[0], args[1])
+            return args[2:]
+        return args
+
+    # -- output --
+    def addch(self, *args):
+        args = self._move_args(args, 2)
+        c, attr = _glyph(args[0])
+        if len(args) > 1:
+            attr |= args[1]
+        self._addch(c, attr)
+
+    def _with_attr(self, args, write, text):
+        """Writes a string; like the curses module, an attribute argument
+        replaces the window attribute for the call instead of adding to it."""
+        if not args:
+            return write(text, 0)
+        old, self.attr = self.attr, args[0]
+        try:
+            write(text, 0)
+        finally:
+            self.attr = old
+
+    def addstr(self, *args):
+        args = self._move_args(args, 2)
+        self._with_attr(args[1:], self._addstr, str(args[0]))
+
+    def addnstr(self, *args):
+        args = self._move_args(args, 3)
+        text = str(args[0])
+        if args[1] >= 0:
+            text = text[:args[1]]
+        self._with_attr(args[2:], self._addstr, text)
+
+    def echochar(self, ch, attr=0):
+        self.addch(ch, attr)
+        self.refresh()
+
+    def insch(self, *args):
+        args = self._move_args(args, 2)
+        c, attr = _glyph(args[0])
+        if len(args) > 1:
+            attr |= args[1]
+        y = self.cury
+        for x in range(self.ncols - 1, self.curx, -1):
+            self._put(y, x, *self._get(y, x - 1))
+        self._put(y, self.curx, c, attr | self.attr)
+
+    def insstr(self, *args):
+        args = self._move_args(args, 2)
+        self._with_attr(args[1:], self._insstr, str(args[0]))
+
+    def insnstr(self, *args):
+        args = self._move_args(args, 3)
+        text = str(args[0])
+        if args[1] >= 0:
+            text = text[:args[1]]
+        self._with_attr(args[2:], self._insstr, text)
+
+    def _insstr(self, text, attr):
+        y, x0 = self.cury, self.curx
+        for c in reversed(text):
+            self.insch(c, attr)
+        self.cury, self.curx = y, x0
+
+    def delch(self, *args):
+        self._move_args(args, 0)
+        y = self.cury
+        for x in range(self.curx, self.ncols - 1):
+            self._put(y, x, *self._get(y, x + 1))
+        self._put(y, self.ncols - 1, self.bkgd_ch, self.bkgd_attr)
+
+    def deleteln(self):
+        self._scroll_region(self.cury, self.nlines - 1, 1)
+
+    def insertln(self):
+        self._scroll_region(self.cury, self.nlines - 1, -1)
+
+    def insdelln(self, nlines):
+        # Positive counts insert lines (scroll down), negative ones delete
+        if nlines:
+            self._scroll_region(self.cury, self.nlines - 1, -nlines)
+
+    def hline(self, *args):
+        args = self._move_args(args, 2)
+        c, attr = _glyph(args[0] or (ord("q") | A_ALTCHARSET))
+        for x in range(self.curx, min(self.curx + args[1], self.ncols)):
+            self._put(self.cury, x, c, attr | self.attr)
+
+    def vline(self, *args):
+        args = self._move_args(args, 2)
+        c, attr = _glyph(args[0] or (ord("x") | A_ALTCHARSET))
+        for y in range(self.cury, min(self.cury + args[1], self.nlines)):
+            self._put(y, self.curx, c, attr | self.attr)
+
+    def border(self, ls=0, rs=0, ts=0, bs=0, tl=0, tr=0, bl=0, br=0):
+        acs = lambda ch, default: ch or (ord(default) | A_ALTCHARSET)
+        h, w = self.nlines - 1, self.ncols - 1
+        for x in range(1, w):
+            self._put(0, x, *_glyph(acs(ts, "q")))
+            self._put(h, x, *_glyph(acs(bs, "q")))
+        for y in range(1, h):
+            self._put(y, 0, *_glyph(acs(ls, "x")))
+            self._put(y, w, *_glyph(acs(rs, "x")))
+        self._put(0, 0, *_glyph(acs(tl, "l")))
+        self._put(0, w, *_glyph(acs(tr, "k")))
+        self._put(h, 0, *_glyph(acs(bl, "m")))
+        self._put(h, w, *_glyph(acs(br, "j")))
+
+    def box(self, verch=0, horch=0):
+        self.border(verch, verch, horch, horch)
+
+    def chgat(self, *args):
+        if len(args) >= 3:
+            self.move(args[0], args[1])
+            args = args[2:]
+        num = args[0] if len(args) > 1 else -1
+        attr = args[-1]
+        stop = self.ncols if num < 0 else min(self.curx + num, self.ncols)
+        for x in range(self.curx, stop):
+            c = self._get(self.cury, x)[0]
+            self._put(self.cury, x, c, attr)
+
+    # -- attributes and background --
+    def attron(self, attr):
+        self.attr |= attr
+
+    def attroff(self, attr):
+        self.attr &= ~attr
+
+    def attrset(self, attr):
+        self.attr = attr
+
+    def standout(self):
+        self.attr |= A_STANDOUT
+
+    def standend(self):
+        self.attr = 0
+
+    def bkgd(self, ch, attr=0):
+        c, battr = _glyph(ch)
+        old_c, old_attr = self.bkgd_ch, self.bkgd_attr
+        self.bkgdset(ch, attr)
+        for y in range(self.nlines):
+            for x in range(self.ncols):
+                cc, ca = self._get(y, x)
+                if cc == old_c:
+                    cc = self.bkgd_ch
+                self._put(y, x, cc, (ca & ~old_attr) | self.bkgd_attr)
+
+    def bkgdset(self, ch, attr=0):
+        c, battr = _glyph(ch)
+        self.bkgd_ch = c if c not in ("", "\x00") else " "
+        self.bkgd_attr = battr | attr
+
+    # -- clearing --
+    def erase(self):
+        for y in range(self.nlines):
+            self._blank_line(y)
+        self.cury = self.curx = 0
+
+    def clear(self):
+        self.erase()
+
+    def clrtobot(self):
+        self._blank_line(self.cury, self.curx)
+        for y in range(self.cury + 1, self.nlines):
+            self._blank_line(y)
+
+    def clrtoeol(self):
+        self._blank_line(self.cury, self.curx)
+
+    # -- cursor and geometry --
+    def move(self, y, x):
+        self._check(y, x)
+        self.cury, self.curx = y, x
+
+    def getyx(self):
+        return (self.cury, self.curx)
+
+    def getbegyx(self):
+        return (self.begy, self.begx)
+
+    def getmaxyx(self):
+        return (self.nlines, self.ncols)
+
+    def getparyx(self):
+        if self.parent is None:
+            return (-1, -1)
+        return (self.begy - self.parent.begy, self.begx - self.parent.begx)
+
+    def mvwin(self, y, x):
+        screen = _require_screen()
+        if y < 0 or x < 0 or y + self.nlines > screen.lines \
+                or x + self.ncols > screen.cols:
+            raise error("mvwin() returned ERR")
+        self.begy, self.begx = y, x
+        self.touchwin()
+
+    def mvderwin(self, pary, parx):
+        if self.parent is None:
+            raise error("mvderwin() returned ERR")
+        self.offy = self.parent.offy + pary
+        self.offx = self.parent.offx + parx
+        self.begy = self.parent.begy + pary
+        self.begx = self.parent.begx + parx
+
+    def resize(self, lines, cols):
+        if lines <= 0 or cols <= 0 or self.parent is not None:
+            raise error("wresize() returned ERR")
+        rows = _blank(lines, cols)
+        for y in range(min(lines, self.nlines)):
+            for x in range(min(cols, self.ncols)):
+                rows[y][0][x], rows[y][1][x] = self._get(y, x)
+        self.rows = rows
+        self.nlines, self.ncols = lines, cols
+        self.cury = min(self.cury, lines - 1)
+        self.curx = min(self.curx, cols - 1)
+        self.scroll_top, self.scroll_bot = 0, lines - 1
+        self.touchwin()
+
+    def enclose(self, y, x):
+        return (self.begy <= y < self.begy + self.nlines
+                and self.begx <= x < self.begx + self.ncols)
+
+    # -- subwindows --
+    def derwin(self, *args):
+        if len(args) == 2:
+            nlines, ncols, (begin_y, begin_x) = 0, 0, args
+        else:
+            nlines, ncols, begin_y, begin_x = args
+        return self.subwin(nlines, ncols, self.begy + begin_y,
+                           self.begx + begin_x)
+
+    def subwin(self, *args):
+        if len(args) == 2:
+            nlines, ncols, (begin_y, begin_x) = 0, 0, args
+        else:
+            nlines, ncols, begin_y, begin_x = args
+        if self.is_pad:
+            # Pad subwindows are positioned relative to the pad
+            begin_y += self.begy
+            begin_x += self.begx
+        nlines = nlines or self.begy + self.nlines - begin_y
+        ncols = ncols or self.begx + self.ncols - begin_x
+        if begin_y < self.begy or begin_x < self.begx \
+                or begin_y + nlines > self.begy + self.nlines \
+                or begin_x + ncols > self.begx + self.ncols:
+            raise error("subwin() returned NULL")
+        return _Window(nlines, ncols, begin_y, begin_x, parent=self,
+                       is_pad=self.is_pad)
+
+    def subpad(self, *args):
+        return self.subwin(*args)
+
+    # -- reading the window back --
+    def inch(self, *args):
+        self._move_args(args, 0)
+        c, attr = self._get(self.cury, self.curx)
+        return (ord(c) & A_CHARTEXT) | attr
+
+    def instr(self, *args):
+        args = self._move_args(args, 1)
+        n = args[0] if args else -1
+        stop = self.ncols if n < 0 else min(self.curx + n, self.ncols)
+        text = "".join(self._get(self.cury, x)[0] for x in range(self.curx, stop))
+        return text.encode()
+
+    # -- scrolling --
+    def scroll(self, lines=1):
+        if not self.scroll_ok:
+            raise error("scroll() returned ERR")
+        self._scroll_region(self.scroll_top, self.scroll_bot, lines)
+
+    def scrollok(self, flag):
+        self.scroll_ok = bool(flag)
+
+    def setscrreg(self, top, bottom):
+        if not (0 <= top <= bottom < self.nlines):
+            raise error("setscrreg() returned ERR")
+        self.scroll_top, self.scroll_bot = top, bottom
+
+    # -- refresh --
+    def noutrefresh(self, *args):
+        screen = _require_screen()
+        if args:
+            pminrow, pmincol, sminrow, smincol, smaxrow, smaxcol = args
+        else:
+            if self.is_pad:
+                raise error("noutrefresh() called for a pad without arguments")
+            pminrow, pmincol = 0, 0
+            sminrow, smincol = self.begy, self.begx
+            smaxrow = self.begy + self.nlines - 1
+            smaxcol = self.begx + self.ncols - 1
+        smaxrow = min(smaxrow, screen.lines - 1, sminrow + self.nlines - pminrow - 1)
+        smaxcol = min(smaxcol, screen.cols - 1, smincol + self.ncols - pmincol - 1)
+        if self.is_pad:
+            rows = range(pminrow, pminrow + smaxrow - sminrow + 1)
+        else:
+            rows = sorted(y for y in self.touched
+                          if pminrow <= y <= pminrow + smaxrow - sminrow)
+        for y in rows:
+            sy = sminrow + y - pminrow
+            if sy < 0:
+                continue
+            src = self.rows[self.offy + y]
+            dst = screen.newscr[sy]
+            start = self.offx + pmincol
+            stop = start + smaxcol - smincol + 1
+            if smincol < 0:
+                continue
+            dst[0][smincol:smaxcol + 1] = src[0][start:stop]
+            dst[1][smincol:smaxcol + 1] = src[1][start:stop]
+            screen.dirty_rows.add(sy)
+        self.touched.clear()
+        if not self.leave_ok:
+            screen.cursor = (self.begy + self.cury, self.begx + self.curx)
+        stats.noutrefreshes += 1
+
+    def refresh(self, *args):
+        self.noutrefresh(*args)
+        doupdate()
+
+    def redrawwin(self):
+        self.touchwin()
+
+    def redrawln(self, beg, num):
+        self.touchline(beg, num)
+
+    def touchwin(self):
+        self.touched.update(range(self.nlines))
+
+    def untouchwin(self):
+        self.touched.clear()
+
+    def touchline(self, start, count, changed=1):
+        rows = range(start, min(start + count, self.nlines))
+        if changed:
+            self.touched.update(rows)
+        else:
+            self.touched.difference_update(rows)
+
+    def is_linetouched(self, line):
+        if not 0 <= line < self.nlines:
+            raise error("is_linetouched: line number outside of boundaries")
+        return line in self.touched
+
+    def is_wintouched(self):
+        return bool(self.touched)
+
+    def syncup(self):
+        pass
+
+    def syncdown(self):
+        pass
+
+    def cursyncup(self):
+        pass
+
+    def syncok(self, flag):
+        pass
+
+    # -- copying between windows --
+    def overlay(self, dest, *args):
+        self._copy(dest, True, *args)
+
+    def overwrite(self, dest, *args):
+        self._copy(dest, False, *args)
+
+    def _copy(self, dest, skip_blanks, sminrow=None, smincol=None, dminrow=None,
+              dmincol=None, dmaxrow=None, dmaxcol=None):
+        if sminrow is None:
+            # Copy the overlapping screen area
+            top = max(self.begy, dest.begy)
+            left = max(self.begx, dest.begx)
+            bottom = min(self.begy + self.nlines, dest.begy + dest.nlines) - 1
+            right = min(self.begx + self.ncols, dest.begx + dest.ncols) - 1
+            sminrow, smincol = top - self.begy, left - self.begx
+            dminrow, dmincol = top - dest.begy, left - dest.begx
+            dmaxrow, dmaxcol = bottom - dest.begy, right - dest.begx
+        for dy in range(dminrow, dmaxrow + 1):
+            for dx in range(dmincol, dmaxcol + 1):
+                c, attr = self._get(sminrow + dy - dminrow, smincol + dx - dmincol)
+                if skip_blanks and c == " ":
+                    continue
+                dest._put(dy, dx, c, attr)
+
+    # -- input --
+    def getch(self, *args):
+        self._move_args(args, 0)
+        if self.touched and not self.is_pad:
+            self.refresh()
+        if _input:
+            return _input.popleft()
+        if self.delay >= 0:
+            return ERR
+        raise InputExhausted("no scripted input left")
+
+    def getkey(self, *args):
+        ch = self.getch(*args)
+        if ch == ERR:
+            raise error("no input")
+        return keyname(ch).decode() if ch > 255 else chr(ch)
+
+    def getstr(self, *args):
+        args = self._move_args(args, 1)
+        n = args[0] if args else 1023
+        chars = []
+        while len(chars) < n:
+            ch = self.getch()
+            if ch in (ERR, 10, 13, KEY_ENTER):
+                break
+            chars.append(chr(ch))
+        return "".join(chars).encode()
+
+    def keypad(self, yes):
+        self.use_keypad = bool(yes)
+
+    def nodelay(self, yes):
+        self.delay = 0 if yes else -1
+
+    def timeout(self, delay):
+        self.delay = delay
+
+    def notimeout(self, yes):
+        pass
+
+    # -- options without a virtual-terminal effect --
+    def clearok(self, yes):
+        if yes:
+            self.touchwin()
+
+    def idcok(self, flag):
+        pass
+
+    def idlok(self, yes):
+        pass
+
+    def immedok(self, flag):
+        pass
+
+    def leaveok(self, yes):
+        self.leave_ok = bool(yes)
+
+    def putwin(self, file):
+        raise error("putwin() is not supported by the headless backend")
+
+
+# +++ MODULE FUNCTIONS +++
+
+def initscr():
+    global _screen, _stdscr, _isendwin, LINES, COLS
+    if _stdscr is not None:
+        return _stdscr
+    _screen = _Screen(_config["lines"], _config["cols"])
+    _stdscr = _Window(_screen.lines, _screen.cols, 0, 0)
+    LINES, COLS = _screen.lines, _screen.cols
+    _isendwin = False
+    return _stdscr
+
+
+def endwin():
+    global _isendwin
+    _require_screen()
+    _isendwin = True
+
+
+def isendwin():
+    return _isendwin
+
+
+def reset():
+    """Discards the virtual terminal, input queues, colors and counters."""
+    global _screen, _stdscr, _isendwin, COLORS, COLOR_PAIRS
+    _screen = _stdscr = None
+    _isendwin = False
+    COLORS = COLOR_PAIRS = 0
+    _input.clear()
+    _mouse.clear()
+    _pairs.clear()
+    _pairs[0] = (COLOR_WHITE, COLOR_BLACK)
+    _colors.clear()
+    stats.reset()
+
+
+def newwin(*args):
+    screen = _require_screen()
+    if len(args) == 2:
+        nlines, ncols, begin_y, begin_x = 0, 0, args[0], args[1]
+    else:
+        nlines, ncols, begin_y, begin_x = args
+    nlines = nlines or screen.lines - begin_y
+    ncols = ncols or screen.cols - begin_x
+    if nlines <= 0 or ncols <= 0 or begin_y < 0 or begin_x < 0:
+        raise error("curses function returned NULL")
+    return _Window(nlines, ncols, begin_y, begin_x)
+
+
+def newpad(nlines, ncols):
+    _require_screen()
+    if nlines <= 0 or ncols <= 0:
+        raise error("curses function returned NULL")
+    return _Window(nlines, ncols, 0, 0, is_pad=True)
+
+
+def doupdate():
+    """Flushes the virtual screen to the 'physical' one, counting changes."""
+    screen = _require_screen()
+    changed = 0
+    for y in screen.dirty_rows:
+        new_chars, new_attrs = screen.newscr[y]
+        cur_chars, cur_attrs = screen.curscr[y]
+        for x in range(screen.cols):
+            if new_chars[x] != cur_chars[x] or new_attrs[x] != cur_attrs[x]:
+                changed += 1
+        cur_chars[:] = new_chars
+        cur_attrs[:] = new_attrs
+    screen.dirty_rows.clear()
+    stats.doupdates += 1
+    stats.cells_flushed += changed
+
+
+def resize_term(lines, cols):
+    """Resizes the virtual terminal and queues a KEY_RESIZE event."""
+    global LINES, COLS
+    screen = _require_screen()
+    screen.lines, screen.cols = lines, cols
+    screen.newscr = _blank(lines, cols)
+    screen.curscr = _blank(lines, cols)
+    screen.dirty_rows = set(range(lines))
+    _stdscr.resize(lines, cols)
+    LINES, COLS = lines, cols
+    _config.update(lines=lines, cols=cols)
+    _input.append(KEY_RESIZE)
+
+
+# -- screen inspection --
+def screen_lines():
+    """The text of the physical screen, one string per row."""
+    screen = _require_screen()
+    return ["".join(chars) for chars, attrs in screen.curscr]
+
+
+def screen_cell(y, x):
+    """The (char, attr) shown at a physical screen position."""
+    chars, attrs = _require_screen().curscr[y]
+    return (chars[x], attrs[x])
+
+
+def screen_text():
+    return "\n".join(screen_lines())
+
+
+# -- scripted input --
+def push_keys(*keys):
+    """Queues key codes (ints) or the characters of strings as input."""
+    for key in keys:
+        if isinstance(key, int):
+            _input.append(key)
+        else:
+            _input.extend(ord(c) for c in key)
+
+
+def push_mouse(x, y, bstate, id=0, z=0):
+    """Queues a mouse event, delivered as KEY_MOUSE then getmouse()."""
+    _mouse.append((id, x, y, z, bstate))
+    _input.append(KEY_MOUSE)
+
+
+def ungetch(ch):
+    if isinstance(ch, str):
+        ch = ord(ch)
+    _input.appendleft(ch)
+
+
+def flushinp():
+    _input.clear()
+
+
+def getmouse():
+    if not _mouse:
+        raise error("getmouse() returned ERR")
+    return _mouse.popleft()
+
+
+def ungetmouse(id, x, y, z, bstate):
+    _mouse.appendleft((id, x, y, z, bstate))
+    _input.appendleft(KEY_MOUSE)
+
+
+def mousemask(mmask):
+    return (mmask, 0)
+
+
+def mouseinterval(interval):
+    return 0
+
+
+def keyname(k):
+    if k < 32:
+        return ("^" + chr(k + 64)).encode()
+    if k < 256:
+        return chr(k).encode()
+    for name, value in globals().items():
+        if name.startswith("KEY_") and value == k and name not in ("KEY_MIN",):
+            return name.encode()
+    return b"UNKNOWN KEY"
+
+
+def unctrl(ch):
+    if isinstance(ch, str):
+        ch = ord(ch)
+    return keyname(ch & A_CHARTEXT)
+
+
+def has_key(ch):
+    return keyname(ch) != b"UNKNOWN KEY"
+
+
+# -- colors --
+def start_color():
+    global COLORS, COLOR_PAIRS
+    _require_screen()
+    COLORS = _config["colors"]
+    COLOR_PAIRS = _config["color_pairs"]
+
+
+def has_colors():
+    return True
+
+
+def can_change_color():
+    return True
+
+
+def init_pair(pair_number, fg, bg):
+    if COLOR_PAIRS == 0:
+        raise error("must call start_color() first")
+    if not 0 < pair_number < COLOR_PAIRS:
+        raise error("Color pair is greater than COLOR_PAIRS-1 (%d)." % (COLOR_PAIRS - 1))
+    _pairs[pair_number] = (fg, bg)
+
+
+def pair_content(pair_number):
+    return _pairs.get(pair_number, (0, 0))
+
+
+def init_color(color, r, g, b):
+    if COLORS == 0:
+        raise error("must call start_color() first")
+    _colors[color] = (r, g, b)
+
+
+def color_content(color_number):
+    return _colors.get(color_number, (0, 0, 0))
+
+
+def color_pair(n):
+    return (n << 8) & A_COLOR
+
+
+def pair_number(attr):
+    return (attr & A_COLOR) >> 8
+
+
+def use_default_colors():
+    pass
+
+
+# -- terminal modes and miscellany (no effect on a virtual terminal) --
+def _noop(*args):
+    return None
+
+
+cbreak = nocbreak = echo = noecho = raw = noraw = nl = nonl = _noop
+qiflush = noqiflush = def_prog_mode = def_shell_mode = _noop
+reset_prog_mode = reset_shell_mode = filter = use_env = typeahead = _noop
+beep = flash = halfdelay = meta = delay_output = setupterm = putp = _noop
+
+
+def curs_set(visibility):
+    return 1
+
+
+def napms(ms):
+    return 0
+
+
+def baudrate():
+    return 38400
+
+
+def termattrs():
+    return A_ATTRIBUTES & ~A_COLOR
+
+
+def termname():
+    return b"headless"
+
+
+def longname():
+    return b"UniCurses headless virtual terminal"
+
+
+def erasechar():
+    return b"\x7f"
+
+
+def killchar():
+    return b"\x15"
+
+
+def has_ic():
+    return True
+
+
+def has_il():
+    return True
+
+
+def tigetflag(capname):
+    return -1
+
+
+def tigetnum(capname):
+    return -2
+
+
+def tigetstr(capname):
+    return None
+
+
+def tparm(str, *args):
+    return b""
+
+
+def getwin(file):
+    raise error("getwin() is not supported by the headless backend")
+
+
+def getsyx():
+    screen = _require_screen()
+    if screen.leaveok:
+        return (-1, -1)
+    return screen.cursor
+
+
+def setsyx(y, x):
+    screen = _require_screen()
+    screen.leaveok = (y == x == -1)
+    if not screen.leaveok:
+        screen.cursor = (y, x)
+
+
+# +++ PANELS (curses.panel) +++
+
+class _Panel(object):
+    """A panel: a window with a place in the stacking order.
+
+    Like curses.panel, the stack only references panels weakly: a panel
+    leaves the stack once the last reference to it is dropped.
+    """
+    def __init__(self, win):
+        self.win = win
+        self.is_hidden = False
+        self.ptr = None
+        self.ref = weakref.ref(self)
+
+    def above(self):
+        stack = _visible_panels()
+        ix = stack.index(self) if self in stack else -1
+        return stack[ix + 1] if 0 <= ix < len(stack) - 1 else None
+
+    def below(self):
+        stack = _visible_panels()
+        ix = stack.index(self) if self in stack else 0
+        return stack[ix - 1] if ix > 0 else None
+
+    def top(self):
+        stack = _panel_stack()
+        stack.remove(self.ref)
+        stack.append(self.ref)
+        self.is_hidden = False
+
+    def bottom(self):
+        stack = _panel_stack()
+        stack.remove(self.ref)
+        stack.insert(0, self.ref)
+        self.is_hidden = False
+
+    def hide(self):
+        self.is_hidden = True
+
+    def show(self):
+        self.top()
+
+    def hidden(self):
+        return self.is_hidden
+
+    def move(self, y, x):
+        self.win.mvwin(y, x)
+
+    def replace(self, win):
+        self.win = win
+
+    def set_userptr(self, obj):
+        self.ptr = obj
+
+    def userptr(self):
+        return self.ptr
+
+    def window(self):
+        return self.win
+
+
+def _panel_stack():
+    """The screen's panel references, bottom first, without dead ones."""
+    screen = _require_screen()
+    screen.panels = [ref for ref in screen.panels if ref() is not None]
+    return screen.panels
+
+
+def _visible_panels():
+    return [p for p in (ref() for ref in _panel_stack())
+            if p is not None and not p.is_hidden]
+
+
+def new_panel(win):
+    panel = _Panel(win)
+    _panel_stack().append(panel.ref)
+    return panel
+
+
+def top_panel():
+    stack = _visible_panels()
+    return stack[-1] if stack else None
+
+
+def bottom_panel():
+    stack = _visible_panels()
+    return stack[0] if stack else None
+
+
+def update_panels():
+    """Copies stdscr and the visible panels, bottom to top, to the virtual screen."""
+    _require_screen()
+    # Repaint the whole stack so hidden or moved panels leave no residue
+    _stdscr.touchwin()
+    _stdscr.noutrefresh()
+    for panel in _visible_panels():
+        panel.win.touchwin()
+        panel.win.noutrefresh()
+
+
+# `curses.panel` lives in this same module
+panel = sys.modules[__name__]
+
+# --- PANELS ---
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Unicurses widgets -- asyncio application runner
+
+Runs a uniwidgets Window on an asyncio event loop instead of a blocking
+getch() loop. Input is read without blocking (nodelay) when stdin becomes
+readable, key and mouse events are dispatched to handlers (plain functions
+or coroutines), and background tasks can change widgets at any time; the
+changes are drawn on the next frame.
+
+Requires Python 3.5+ (asyncio with async/await).
+
+Example:
+    app = App(win)
+    app.on_key("q", app.stop)
+    app.call_every(0.25, refresh_metrics)
+    app.run()
+"""
+
+import asyncio
+import sys
+
+import unicurses as uni
+
+from uniwidgets import Click, KeyDispatcher, QUIT_KEYS, key_sequence, scheduler
+
+
+__all__ = ["App"]
+
+
+class App(object):
+    """Asyncio runner for a uniwidgets Window."""
+    def __init__(self, window, fps=60, quit_keys=QUIT_KEYS):
+        self.window = window
+        self.interval = 1.0 / fps
+        # Global, focused-widget and modal key bindings
+        self.keys = KeyDispatcher()
+        # Handlers for KEY_MOUSE, called with a uniwidgets.Click located on
+        # the window (click.widget, click.item)
+        self.mouse_handlers = []
+        for key in quit_keys:
+            self.on_key(key, self.stop)
+        self._running = False
+        self._wake = None
+        self._loop = None
+        self._tasks = []
+        self._error = None
+        # True if input is polled every frame instead of watched on stdin
+        self._poll = False
+
+    @property
+    def focus(self):
+        """Widget whose keymap (or else handle_key) gets keys before the global ones."""
+        return self.keys.focus
+
+    @focus.setter
+    def focus(self, widget):
+        self.keys.focus = widget
+
+    # -- registration --
+    def on_key(self, keys, handler=None):
+        """Binds `handler` to a key or chord (see uniwidgets.key_sequence).
+
+        The handler is called with the code of the last key; usable as a
+        decorator.
+        """
+        seq = key_sequence(keys)
+
+        def bind(handler):
+            self.keys.global_keys.bind(seq, self._spawn, handler, seq[-1])
+            return handler
+        if handler is None:
+            return bind
+        return bind(handler)
+
+    def on_mouse(self, handler):
+        """Adds a mouse handler; usable as a decorator."""
+        self.mouse_handlers.append(handler)
+        return handler
+
+    def add_task(self, coro):
+        """Runs a coroutine alongside the UI; started with the app."""
+        if self._loop is not None:
+            self._start(coro)
+        else:
+            self._tasks.append(coro)
+
+    def call_every(self, interval, fn):
+        """Calls `fn` (function or coroutine function) every `interval` seconds."""
+        async def repeat():
+            while self._running:
+                await self._call(fn)
+                await asyncio.sleep(interval)
+        self.add_task(repeat())
+
+    def invalidate(self):
+        """Wakes the render loop so changed widgets are drawn on the next frame."""
+        if self._wake is not None:
+            self._wake.set()
+
+    def stop(self, *args):
+        """Stops the app after the current frame."""
+        self._running = False
+        self.invalidate()
+
+    # -- input --
+    def _read_input(self):
+        """Reads and dispatches all keys that are available without blocking."""
+        while self._running:
+            c = uni.getch()
+            if c == uni.ERR:
+                break
+            self.dispatch(c)
+
+    def dispatch(self, c):
+        """Sends one key code to its handler."""
+        if c == uni.KEY_RESIZE:
+            # Applied by the frame drawn once the resizing has settled
+            self.window.request_resize()
+            self._loop.call_later(self.window.resize_delay, self.invalidate)
+            return
+        if c == uni.KEY_MOUSE:
+            click = Click()
+            click.locate(self.window)
+            for handler in self.mouse_handlers:
+                self._spawn(handler, click)
+        elif not self.keys.dispatch(c) and not self.keys.pending:
+            focus = self.focus
+            if getattr(focus, "keymap", None) is None and \
+                    hasattr(focus, "handle_key"):
+                focus.handle_key(c)
+        self.invalidate()
+
+    async def _call(self, fn, *args):
+        result = fn(*args)
+        if asyncio.iscoroutine(result):
+            await result
+        self.invalidate()
+
+    def _spawn(self, fn, *args):
+        result = fn(*args)
+        if asyncio.iscoroutine(result):
+            self._start(result)
+
+    def _start(self, coro):
+        task = self._loop.create_task(coro)
+        task.add_done_callback(self._finished)
+        self._tasks = [t for t in self._tasks if not t.done()]
+        self._tasks.append(task)
+
+    def _finished(self, task):
+        # A failing handler or background task stops the app; main() re-raises
+        if not task.cancelled() and task.exception() is not None:
+            if self._error is None:
+                self._error = task.exception()
+            self._running = False
+        self.invalidate()
+
+    # -- running --
+    def _watch_stdin(self):
+        """Registers stdin with the loop; falls back to polling if impossible."""
+        if uni.HEADLESS:
+            return False
+        try:
+            self._loop.add_reader(sys.stdin.fileno(), self._read_input)
+        except (NotImplementedError, ValueError, AttributeError, OSError):
+            return False
+        return True
+
+    async def main(self):
+        """Runs the app until stop() is called."""
+        self._loop = asyncio.get_event_loop()
+        self._wake = asyncio.Event()
+        self._running = True
+        self._error = None
+        uni.nodelay(self.window.stdscr, True)
+        self._poll = not self._watch_stdin()
+        pending, self._tasks = self._tasks, []
+        for coro in pending:
+            self._start(coro)
+        try:
+            while self._running:
+                started = self._loop.time()
+                self._wake.clear()
+                self.window.draw()
+                scheduler.flush()
+                if not self._running:
+                    break
+                # Sleep until woken (polling needs a periodic wake-up)
+                try:
+                    await asyncio.wait_for(
+                        self._wake.wait(), self.interval if self._poll else None)
+                except asyncio.TimeoutError:
+                    pass
+                if self._poll:
+                    self._read_input()
+                # Never draw more than one frame per interval
+                delay = started + self.interval - self._loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+        finally:
+            if not self._poll:
+                self._loop.remove_reader(sys.stdin.fileno())
+            for task in self._tasks:
+                task.cancel()
+            uni.nodelay(self.window.stdscr, False)
+        if self._error is not None:
+            raise self._error
+
+    def run(self):
+        """Runs the app on a new event loop."""
+        loop = asyncio.new_event_loop()
+        try:
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.main())
+        finally:
+            loop.close()
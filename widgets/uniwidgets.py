@@ -7,15 +7,36 @@ This module acts as an expansion to unicurses which provides high-level
 widgets and wrappers.
 """
 
+import mmap
+import os
+import threading
 import time
 import sys
-import webbrowser
-from collections import OrderedDict, Container, deque
+from array import array
+from bisect import bisect_right, insort
+from collections import OrderedDict, deque
+from itertools import count, islice
 
 import unicurses as uni
 
+try:
+    unichr
+except NameError:  # Python 3
+    unichr = chr
 
-__all__ = ["SizeError", "Window", "Widget", "Menubar", "Box", "Textbox"]
+# File offsets past 4 GB need 64 bits ("L" is 32 bits on Windows)
+try:
+    _OFFSET_TYPE = array("Q").typecode
+except ValueError:  # Python 2
+    _OFFSET_TYPE = "L"
+
+__all__ = ["SizeError", "ColorPairs", "color_pairs", "scheme", "Style",
+           "Theme", "default_theme", "RenderScheduler", "scheduler",
+           "WindowManager", "window_manager", "Keymap", "KeyDispatcher",
+           "HitIndex", "Click", "CellBuffer", "LineStore", "Layout",
+           "LayoutItem", "Row", "Column", "Split", "Grid", "Window", "Widget",
+           "Menubar", "Box", "Textbox", "LogView", "ListView", "FileView",
+           "ScrollView"]
 
 
 # Errors
@@ -32,44 +53,1157 @@ colors = {
     "magenta": uni.COLOR_MAGENTA,
     "red": uni.COLOR_RED,
     "white": uni.COLOR_WHITE,
-    "yello": uni.COLOR_YELLOW
+    "yellow": uni.COLOR_YELLOW
     }
 
+# COLOR_PAIR() keeps the pair number in 8 attribute bits
+_MAX_ATTR_PAIRS = 256
 
-# Color pairs
-uni.init_pair(0, uni.COLOR_WHITE, uni.COLOR_BLACK)
-uni.init_pair(1, uni.COLOR_BLACK, uni.COLOR_WHITE)
-uni.init_pair(2, uni.COLOR_CYAN, uni.COLOR_BLUE)
-uni.init_pair(3, uni.COLOR_GREEN, uni.COLOR_BLACK)
-'''
-# Named color pairs
-color_schemes = {
-    "normal": uni.COLOR_PAIR(0),
-    "inverse": uni.COLOR_PAIR(1),
-    "cyan": uni.COLOR_PAIR(2),
-    "green": uni.COLOR_PAIR(3)
-    }
-'''
 
-YES_KEYS = [
-    "y", 121,
-    "Y", 89
-    ]
+class ColorPairs(object):
+    """Interns (fg, bg) color combinations to curses color pairs.
+
+    attr(fg, bg) returns the COLOR_PAIR attribute of a combination, ready to
+    OR with A_BOLD and friends. A pair number is assigned, and init_pair()
+    called, only the first time a combination is used; after that a lookup
+    is a dict access. Once all the pairs the terminal has are in use, the
+    least recently used combination gives its number up. Text still on the
+    screen in that combination changes color, so it has to be redrawn.
+    Pair 0 (the terminal's default colors) is never assigned.
+
+    Attributes that are kept and reused without calling attr() again (a
+    compiled Theme, the color_schemes) must be pinned with pin(): pinned
+    pairs are never recycled until they are unpinned.
+    """
+    def __init__(self, limit=None):
+        # Number of pairs to use; None for all the terminal supports
+        self.limit = limit
+        self.evictions = 0
+        # Incremented by reset(); pins taken before a reset are void
+        self.generation = 0
+        self.reset()
+
+    def __len__(self):
+        return len(self._attrs) + len(self._pinned)
+
+    def reset(self):
+        """Forgets all combinations and pins, e.g. after a new initscr()."""
+        self.generation += 1
+        # Unpinned (fg, bg) -> attribute, least recently used first
+        self._attrs = OrderedDict()
+        # Pinned (fg, bg) -> attribute, and how many times each is pinned
+        self._pinned = {}
+        self._pins = {}
+        # (fg, bg) -> pair number
+        self._numbers = {}
+        self._next = 1
+
+    def attr(self, fg, bg=uni.COLOR_BLACK):
+        """COLOR_PAIR attribute for color numbers `fg` on `bg`."""
+        key = (fg, bg)
+        try:
+            attr = self._attrs.pop(key)
+        except KeyError:
+            attr = self._pinned.get(key)
+            if attr is not None:
+                return attr
+            attr = self._allocate(key)
+        # Most recently used last
+        self._attrs[key] = attr
+        return attr
+
+    def pin(self, fg, bg=uni.COLOR_BLACK):
+        """Like attr(), but the pair is not recycled until unpin() is called
+        as many times as pin()."""
+        key = (fg, bg)
+        attr = self.attr(fg, bg)
+        if key not in self._pinned:
+            del self._attrs[key]
+            self._pinned[key] = attr
+        self._pins[key] = self._pins.get(key, 0) + 1
+        return attr
+
+    def unpin(self, fg, bg=uni.COLOR_BLACK, generation=None):
+        """Lets a pinned pair be recycled again (once no other pin holds it).
+
+        Pass the `generation` the pin was taken in: a pin from before the
+        last reset() no longer counts and is ignored.
+        """
+        if generation is not None and generation != self.generation:
+            return
+        key = (fg, bg)
+        count = self._pins.get(key, 0)
+        if count > 1:
+            self._pins[key] = count - 1
+        elif count:
+            del self._pins[key]
+            self._attrs[key] = self._pinned.pop(key)
+
+    def named(self, fg, bg="black"):
+        """COLOR_PAIR attribute for color names from `colors`."""
+        return self.attr(colors[fg], colors[bg])
+
+    def pair_number(self, fg, bg=uni.COLOR_BLACK):
+        """Pair number of a combination (assigning one if needed)."""
+        self.attr(fg, bg)
+        return self._numbers[(fg, bg)]
+
+    def _allocate(self, key):
+        limit = min(self.limit or uni.ucs_color_pairs(), _MAX_ATTR_PAIRS)
+        if self._next < limit:
+            number = self._next
+            self._next += 1
+        elif self._attrs:
+            oldest, _ = self._attrs.popitem(last=False)
+            number = self._numbers.pop(oldest)
+            self.evictions += 1
+        elif self._pinned:
+            raise ValueError("All %d color pairs are pinned." % len(self._pinned))
+        else:
+            raise ValueError("No color pairs available; call start_color() first.")
+        uni.init_pair(number, key[0], key[1])
+        self._numbers[key] = number
+        return uni.COLOR_PAIR(number)
+
+
+# Shared by all widgets
+color_pairs = ColorPairs()
+
+# Named color schemes as (fg, bg); pinned in this order by init_color_pairs(),
+# so they keep pairs 1-3
+color_schemes = OrderedDict([
+    ("inverse", (uni.COLOR_BLACK, uni.COLOR_WHITE)),
+    ("cyan", (uni.COLOR_CYAN, uni.COLOR_BLUE)),
+    ("green", (uni.COLOR_GREEN, uni.COLOR_BLACK)),
+    ])
+
 
-QUIT_KEYS = [
-    'q', 113,
-    'Q', 81,
+def init_color_pairs():
+    """Sets the shared color pairs up; needs initscr() and start_color() first."""
+    color_pairs.reset()
+    for fg, bg in color_schemes.values():
+        color_pairs.pin(fg, bg)
+
+
+def scheme(name):
+    """COLOR_PAIR attribute of a named color scheme ("normal" is pair 0)."""
+    if name == "normal":
+        return uni.COLOR_PAIR(0)
+    return color_pairs.attr(*color_schemes[name])
+
+
+# Key codes as returned by getch()
+YES_KEYS = frozenset([
+    121, 89  # y, Y
+    ])
+
+QUIT_KEYS = frozenset([
+    113, 81,  # q, Q
     27  # Esc
-    ]
+    ])
 
 
 def write(scrid, text, ypos, xpos, color="white"):
     uni.setsyx(ypos, xpos)
     uni.waddstr(scrid, text)
     uni.setsyx(0, 0)
-    uni.refresh()
-    uni.update_panels()
-    uni.doupdate()
+    scheduler.request()
+    scheduler.request_panels()
+    scheduler.maybe_flush()
+
+
+# =============================================================================
+# THEMES
+
+class Style(object):
+    """Colors and attributes of a named style.
+
+    `fg` and `bg` are color numbers or names from `colors` (None for white
+    and black); `attrs` is a mask such as uni.A_BOLD | uni.A_UNDERLINE.
+    """
+    __slots__ = ("fg", "bg", "attrs")
+
+    def __init__(self, fg=None, bg=None, attrs=uni.A_NORMAL):
+        self.fg = fg
+        self.bg = bg
+        self.attrs = attrs
+
+    @property
+    def pair(self):
+        """(fg, bg) color numbers, or None if the style has no colors."""
+        if self.fg is None and self.bg is None:
+            return None
+        fg = colors.get(self.fg, uni.COLOR_WHITE if self.fg is None else self.fg)
+        bg = colors.get(self.bg, uni.COLOR_BLACK if self.bg is None else self.bg)
+        return (fg, bg)
+
+    def compile(self, pairs=None):
+        """The attribute integer; colors are left out if `pairs` is None."""
+        pair = self.pair
+        if pairs is None or pair is None:
+            return self.attrs
+        return self.attrs | pairs.attr(*pair)
+
+
+# Styles the widgets use; a Theme overrides any of them
+DEFAULT_STYLES = {
+    "text": Style(),
+    "border": Style(),
+    "label": Style(),
+    "selected": Style(attrs=uni.A_REVERSE),
+    "error": Style("red", attrs=uni.A_BOLD),
+    }
+
+
+class Theme(object):
+    """A set of named styles, compiled to curses attribute integers.
+
+    Styles are Style objects or plain attribute masks; names a theme leaves
+    out come from DEFAULT_STYLES. compile() turns every style into the final
+    integer once (color pairs included, pinned until release()), so widgets
+    only look values up in `attrs` when they draw. Switch themes with
+    Window.set_theme().
+    """
+    def __init__(self, name="default", **styles):
+        self.name = name
+        self.styles = dict(DEFAULT_STYLES)
+        for key, style in styles.items():
+            if not isinstance(style, Style):
+                style = Style(attrs=style)
+            self.styles[key] = style
+        # Style name -> attribute integer, filled by compile()
+        self.attrs = {}
+        # wborder() characters, and the left, middle and right characters of
+        # a separator row, in the "border" style
+        self.border = ()
+        self.separator = ()
+        # (ColorPairs, generation, (fg, bg)) pinned by compile()
+        self._pinned = []
+
+    def __getitem__(self, name):
+        return self.attrs[name]
+
+    def compile(self, pairs=None):
+        """Compiles the styles; with colors only once start_color() was called."""
+        if pairs is None and uni.ucs_color_pairs():
+            pairs = color_pairs
+        self.release()
+        attrs = {}
+        for key, style in self.styles.items():
+            attrs[key] = style.attrs
+            pair = style.pair
+            if pairs is not None and pair is not None:
+                # Pinned: the integers are reused without asking pairs again
+                attrs[key] |= pairs.pin(*pair)
+                self._pinned.append((pairs, pairs.generation, pair))
+        self.attrs = attrs
+        attr = self.attrs["border"]
+        self.border = tuple(ch | attr for ch in (
+            uni.ACS_VLINE, uni.ACS_VLINE, uni.ACS_HLINE, uni.ACS_HLINE,
+            uni.ACS_ULCORNER, uni.ACS_URCORNER, uni.ACS_LLCORNER,
+            uni.ACS_LRCORNER))
+        self.separator = (uni.ACS_LTEE | attr, uni.ACS_HLINE | attr,
+                          uni.ACS_RTEE | attr)
+        return self.attrs
+
+    def release(self):
+        """Unpins the color pairs of the last compile().
+
+        Pins a ColorPairs.reset() has since discarded are left alone.
+        """
+        for pairs, generation, pair in self._pinned:
+            pairs.unpin(pair[0], pair[1], generation)
+        self._pinned = []
+
+
+default_theme = Theme()
+
+
+# =============================================================================
+# RENDER SCHEDULING
+
+# Monotonic clock where available (Python 3.3+)
+_clock = getattr(time, "monotonic", time.time)
+
+
+class RenderScheduler(object):
+    """Coalesces screen updates and flushes them at most once per frame.
+
+    Drawing code requests the windows (or the panel stack) it changed;
+    maybe_flush() copies them to the virtual screen with noutrefresh and
+    update_panels and calls doupdate() once, but only if a frame interval
+    has passed since the last flush. flush() does the same immediately and
+    should be called before blocking for input.
+    """
+    def __init__(self, fps=60, clock=_clock):
+        self.interval = 1.0 / fps if fps else 0.0
+        self.clock = clock
+        self.flushes = 0
+        self._windows = []
+        self._panels = False
+        self._last_flush = None
+
+    @property
+    def pending(self):
+        """True if there are requested updates not yet flushed."""
+        return bool(self._windows) or self._panels
+
+    def request(self, win=None):
+        """Requests a refresh of `win` (stdscr by default)."""
+        if win is None:
+            win = uni.stdscr
+        if not any(w is win for w in self._windows):
+            self._windows.append(win)
+
+    def request_panels(self):
+        """Requests an update of the panel stack."""
+        self._panels = True
+
+    def maybe_flush(self):
+        """Flushes if a frame interval has passed; returns True if it did."""
+        if not self.pending:
+            return False
+        if self._last_flush is not None and \
+                self.clock() - self._last_flush < self.interval:
+            return False
+        self.flush()
+        return True
+
+    def flush(self):
+        """Writes all requested updates to the terminal now."""
+        if not self.pending:
+            return
+        for win in self._windows:
+            uni.noutrefresh(win)
+        # Panels go on top of plain windows
+        if self._panels:
+            uni.update_panels()
+        uni.doupdate()
+        self._windows = []
+        self._panels = False
+        self._last_flush = self.clock()
+        self.flushes += 1
+
+
+# Shared by all widgets
+scheduler = RenderScheduler()
+
+
+# =============================================================================
+# WINDOW & PANEL LIFECYCLE
+
+class WindowManager(object):
+    """Allocates a curses window and panel per widget and reuses them.
+
+    A widget's window is created on its first render and erased on later
+    renders; it is only resized or moved when the widget's geometry changes.
+    live_windows and live_panels count the windows and panels currently
+    allocated, so they should stay flat over a long-running session.
+    """
+    def __init__(self):
+        self.live_windows = 0
+        self.live_panels = 0
+
+    def acquire(self, widget, height, width, ypos, xpos, erase=True):
+        """Returns the widget's window, fitted to the geometry.
+
+        With erase=False the window is left as it was (see Widget.draw_chrome).
+        """
+        geometry = (height, width, ypos, xpos)
+        old = getattr(widget, "_geometry", None)
+        if widget.win is None:
+            widget.win = uni.newwin(height, width, ypos, xpos)
+            self.live_windows += 1
+            widget.panel = uni.new_panel(widget.win)
+            self.live_panels += 1
+            widget._chrome_key = None
+        else:
+            if old is not None and old[:2] != (height, width):
+                # The inner window does not follow a resize
+                self._drop_body(widget)
+                if uni.wresize(widget.win, height, width) == uni.ERR:
+                    # Fall back to a new window attached to the same panel
+                    win = uni.newwin(height, width, ypos, xpos)
+                    uni.replace_panel(widget.panel, win)
+                    uni.delwin(widget.win)
+                    widget.win = win
+            if old is not None and old[2:] != (ypos, xpos):
+                uni.move_panel(widget.panel, ypos, xpos)
+            if erase:
+                uni.werase(widget.win)
+                widget._chrome_key = None
+        widget._geometry = geometry
+        return widget.win
+
+    def body(self, widget):
+        """The part of the widget's window inside its border, or None if none.
+
+        A derived window sharing the widget window's cells, created on first
+        use and dropped when the widget window is resized or released.
+        """
+        body = getattr(widget, "_body", None)
+        if body is None:
+            height, width = widget._geometry[:2]
+            if height < 3 or width < 3:
+                return None
+            body = uni.derwin(widget.win, height - 2, width - 2, 1, 1)
+            # Changes to the inner window mark the widget window changed
+            uni.syncok(body, True)
+            widget._body = body
+        return body
+
+    def _drop_body(self, widget):
+        if getattr(widget, "_body", None) is not None:
+            uni.delwin(widget._body)
+            widget._body = None
+        widget._chrome_key = None
+
+    def release(self, widget):
+        """Deletes the widget's panel and window."""
+        self._drop_body(widget)
+        if getattr(widget, "panel", None) is not None:
+            uni.del_panel(widget.panel)
+            widget.panel = None
+            self.live_panels -= 1
+        if widget.win is not None:
+            uni.delwin(widget.win)
+            widget.win = None
+            self.live_windows -= 1
+        widget._geometry = None
+
+
+# Shared by all widgets
+window_manager = WindowManager()
+
+
+# =============================================================================
+# KEY BINDINGS
+
+# Key codes below this are looked up by list index; larger ones in a dict
+_KEY_TABLE_SIZE = 1024
+
+
+def ctrl(char):
+    """Key code of Ctrl+`char` (e.g. ctrl("x") -> 24)."""
+    return ord(char.upper()) & 0x1f
+
+
+def key_sequence(keys):
+    """Tuple of key codes from a code, a string or a sequence of either.
+
+    A string is a sequence of characters, so "gg" is a chord of two keys.
+    """
+    if isinstance(keys, int):
+        return (keys,)
+    if isinstance(keys, str):
+        seq = tuple(ord(char) for char in keys)
+    else:
+        seq = ()
+        for key in keys:
+            seq += key_sequence(key)
+    if not seq:
+        raise ValueError("empty key sequence")
+    return seq
+
+
+class _KeyTable(object):
+    """One level of a compiled keymap: key code -> binding or prefix table."""
+    __slots__ = ("slots", "extra")
+
+    def __init__(self):
+        self.slots = [None] * _KEY_TABLE_SIZE
+        self.extra = {}
+
+    def get(self, code):
+        if 0 <= code < _KEY_TABLE_SIZE:
+            return self.slots[code]
+        return self.extra.get(code)
+
+    def set(self, code, entry):
+        if 0 <= code < _KEY_TABLE_SIZE:
+            self.slots[code] = entry
+        else:
+            self.extra[code] = entry
+
+
+class _Binding(object):
+    """A bound action; calling it runs action(*args)."""
+    __slots__ = ("keys", "action", "args")
+
+    def __init__(self, keys, action, args):
+        self.keys = keys
+        self.action = action
+        self.args = args
+
+    def __call__(self):
+        return self.action(*self.args)
+
+
+class Keymap(object):
+    """Key bindings compiled to int-indexed lookup tables.
+
+    A binding is a single key or a chord (a sequence of keys, the first ones
+    acting as prefix keys). Bindings are compiled on the first lookup after
+    a change, so a lookup is a list index per key whatever the number of
+    bindings.
+    """
+    def __init__(self):
+        self.bindings = OrderedDict()
+        self._table = None
+
+    def bind(self, keys, action, *args):
+        """Binds `keys` to action(*args); replaces an existing binding."""
+        seq = key_sequence(keys)
+        for other in self.bindings:
+            n = min(len(seq), len(other))
+            if other != seq and other[:n] == seq[:n]:
+                raise ValueError(
+                    "Key sequence {0} conflicts with {1}".format(seq, other))
+        self.bindings[seq] = _Binding(seq, action, args)
+        self._table = None
+
+    def unbind(self, keys):
+        """Removes the binding of `keys`."""
+        del self.bindings[key_sequence(keys)]
+        self._table = None
+
+    @property
+    def table(self):
+        """The compiled root table."""
+        if self._table is None:
+            self._table = self.compile()
+        return self._table
+
+    def compile(self):
+        """Builds the lookup tables from the bindings."""
+        root = _KeyTable()
+        for seq, binding in self.bindings.items():
+            node = root
+            for code in seq[:-1]:
+                child = node.get(code)
+                if child is None:
+                    child = _KeyTable()
+                    node.set(code, child)
+                node = child
+            node.set(seq[-1], binding)
+        return root
+
+    def get(self, code):
+        """Binding or prefix table for a single key code, or None."""
+        return self.table.get(code)
+
+
+class KeyDispatcher(object):
+    """Resolves key presses against modal, widget-local and global keymaps.
+
+    If a modal keymap is pushed it receives every key; otherwise the focused
+    widget's `keymap` is tried before the global one. After a prefix key
+    the next key is looked up in that prefix's table only.
+    """
+    def __init__(self, global_keys=None):
+        self.global_keys = global_keys if global_keys is not None else Keymap()
+        # Widget whose `keymap` (if any) is consulted before global_keys
+        self.focus = None
+        self._modal = []
+        self._prefix = None
+
+    @property
+    def pending(self):
+        """True if a prefix key is waiting for the rest of its chord."""
+        return self._prefix is not None
+
+    def push_modal(self, keymap):
+        """Sends all keys to `keymap` until it is popped."""
+        self._modal.append(keymap)
+        self._prefix = None
+
+    def pop_modal(self):
+        self._prefix = None
+        return self._modal.pop()
+
+    def lookup(self, code):
+        """Binding for a key press, or None (unbound, or a prefix key)."""
+        entry = None
+        if self._prefix is not None:
+            entry = self._prefix.get(code)
+        elif self._modal:
+            entry = self._modal[-1].get(code)
+        else:
+            keymap = getattr(self.focus, "keymap", None)
+            if keymap is not None:
+                entry = keymap.get(code)
+            if entry is None:
+                entry = self.global_keys.get(code)
+        if isinstance(entry, _KeyTable):
+            self._prefix = entry
+            return None
+        self._prefix = None
+        return entry
+
+    def dispatch(self, code):
+        """Runs the binding for a key press; returns True if there was one."""
+        binding = self.lookup(code)
+        if binding is None:
+            return False
+        binding()
+        return True
+
+
+# =============================================================================
+# HIT TESTING
+
+class HitIndex(object):
+    """Grid-bucket index of clickable screen rectangles.
+
+    Each rectangle is registered in the buckets it overlaps, sorted by
+    z-order (then by size, so an item wins over the widget containing it).
+    hit() only scans the bucket under the point, so a lookup costs about the
+    same however many targets are registered.
+    """
+    def __init__(self, bucket_height=4, bucket_width=16):
+        self.bucket_height = bucket_height
+        self.bucket_width = bucket_width
+        self._buckets = {}
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def clear(self):
+        self._buckets = {}
+        self._count = 0
+
+    def add(self, ypos, xpos, height, width, target, item=None, z=0):
+        """Registers a rectangle (in screen coordinates) for `target`/`item`."""
+        if height <= 0 or width <= 0:
+            return
+        entry = (-z, height * width, self._count,
+                 ypos, xpos, ypos + height, xpos + width, target, item)
+        self._count += 1
+        bh, bw = self.bucket_height, self.bucket_width
+        for by in range(ypos // bh, (ypos + height - 1) // bh + 1):
+            for bx in range(xpos // bw, (xpos + width - 1) // bw + 1):
+                # Entries never compare equal (unique _count), so the target
+                # and item are never compared
+                insort(self._buckets.setdefault((by, bx), []), entry)
+
+    def hit(self, ypos, xpos):
+        """(target, item) of the topmost rectangle at a point, or (None, None)."""
+        bucket = self._buckets.get(
+            (ypos // self.bucket_height, xpos // self.bucket_width), ())
+        for entry in bucket:
+            if entry[3] <= ypos < entry[5] and entry[4] <= xpos < entry[6]:
+                return entry[7], entry[8]
+        return None, None
+
+
+# Stacking order of shown widgets (show() raises a widget's panel to the top)
+_zorder = count()
+
+
+# =============================================================================
+# CELL BUFFER
+
+# Character code that no drawn cell holds; marks front cells as unknown
+_UNKNOWN = 0
+
+
+class CellBuffer(object):
+    """Double-buffered grid of (character, attribute) cells.
+
+    Drawing goes into the back buffer (plain arrays, no curses calls);
+    flush() compares it with the front buffer -- what was last written to
+    the window -- and writes only the runs of cells that changed. A full
+    redraw every frame (clear() then put() everything) therefore costs one
+    curses write per changed run instead of one per cell, and never clears
+    the terminal. Each character takes one column.
+    """
+    def __init__(self, height, width, attr=uni.A_NORMAL):
+        self.attr = attr
+        self.resize(height, width)
+
+    def resize(self, height, width):
+        """Reallocates the buffers (blank); the next flush redraws everything."""
+        self.height = height
+        self.width = width
+        size = height * width
+        self._chars = array("L", [ord(" ")]) * size
+        self._attrs = array("L", [self.attr]) * size
+        self._front_chars = array("L", [_UNKNOWN]) * size
+        self._front_attrs = array("L", [self.attr]) * size
+
+    def invalidate(self):
+        """Forgets what is on the window, e.g. after it was erased elsewhere."""
+        self._front_chars = array("L", [_UNKNOWN]) * len(self._chars)
+
+    def clear(self, char=" ", attr=None):
+        """Fills the back buffer; cheap, unlike curses clear()."""
+        if attr is None:
+            attr = self.attr
+        size = len(self._chars)
+        self._chars = array("L", [ord(char)]) * size
+        self._attrs = array("L", [attr]) * size
+
+    def put(self, ypos, xpos, text, attr=None):
+        """Writes `text` into the back buffer, clipped to the grid."""
+        if attr is None:
+            attr = self.attr
+        if not 0 <= ypos < self.height or xpos >= self.width:
+            return
+        if len(text) == 1 and xpos >= 0:
+            # Single cells are the common case for maps and grids
+            i = ypos * self.width + xpos
+            self._chars[i] = ord(text)
+            self._attrs[i] = attr
+            return
+        if xpos < 0:
+            text = text[-xpos:]
+            xpos = 0
+        text = text[:self.width - xpos]
+        start = ypos * self.width + xpos
+        end = start + len(text)
+        self._chars[start:end] = array("L", map(ord, text))
+        self._attrs[start:end] = array("L", [attr]) * len(text)
+
+    def get(self, ypos, xpos):
+        """The (character, attribute) of a back-buffer cell."""
+        i = ypos * self.width + xpos
+        return unichr(self._chars[i]), self._attrs[i]
+
+    def changes(self):
+        """Yields (y, x, text, attr) for each run of changed cells."""
+        chars, attrs = self._chars, self._attrs
+        front_chars, front_attrs = self._front_chars, self._front_attrs
+        width = self.width
+        for y in range(self.height):
+            start = y * width
+            end = start + width
+            # Whole-row comparisons run in C; most rows are usually unchanged
+            if chars[start:end] == front_chars[start:end] and \
+                    attrs[start:end] == front_attrs[start:end]:
+                continue
+            run = None
+            for i in range(start, end):
+                if chars[i] == front_chars[i] and attrs[i] == front_attrs[i]:
+                    if run is not None:
+                        yield (y, run - start, _cells_text(chars, run, i),
+                               attrs[run])
+                        run = None
+                elif run is not None and attrs[i] != attrs[run]:
+                    yield y, run - start, _cells_text(chars, run, i), attrs[run]
+                    run = i
+                elif run is None:
+                    run = i
+            if run is not None:
+                yield y, run - start, _cells_text(chars, run, end), attrs[run]
+
+    def flush(self, win):
+        """Writes the changed cells to `win`; returns the number of runs."""
+        ops = list(self.changes())
+        if ops:
+            uni.draw_batch(win, ops)
+            scheduler.request(win)
+        self._front_chars = array("L", self._chars)
+        self._front_attrs = array("L", self._attrs)
+        return len(ops)
+
+
+def _cells_text(chars, start, end):
+    return u"".join([unichr(c) for c in chars[start:end]])
+
+
+# =============================================================================
+# TEXT STORAGE
+
+class LineStore(object):
+    """Compact store of text lines for long histories.
+
+    Lines are kept as contiguous UTF-8 bytes plus an array of offsets rather
+    than one Python string each, and the line count and widest line are
+    maintained as lines are added. Supports len(), indexing, slicing and
+    iteration, so it can replace the list in Textbox.all_lines.
+
+    With `path`, the bytes are written to that file (truncated first) and
+    read back through mmap, so the history lives in the OS page cache instead
+    of the Python heap; a file-backed store can only be appended to.
+    """
+    def __init__(self, lines=(), path=None):
+        self.path = path
+        self._file = None
+        self._map = None
+        if path is None:
+            self._data = bytearray()
+        else:
+            self._data = None
+            self._file = open(path, "w+b")
+        self.clear()
+        self.extend(lines)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __iter__(self):
+        for ix in range(len(self)):
+            yield self[ix]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[ix] for ix in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("line index out of range")
+        return self._read(self._offsets[index],
+                          self._offsets[index + 1]).decode("utf-8")
+
+    @property
+    def nbytes(self):
+        """Size of the text, in bytes."""
+        return self._offsets[-1]
+
+    def append(self, text):
+        data = text.encode("utf-8")
+        if self._data is not None:
+            self._data += data
+        else:
+            self._file.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+        if len(text) > self.max_width:
+            self.max_width = len(text)
+
+    def extend(self, lines):
+        for text in lines:
+            self.append(text)
+
+    def insert(self, index, text):
+        """Inserts a line before `index` (moves all later text)."""
+        if self._data is None:
+            raise ValueError("A file-backed LineStore can only be appended to.")
+        index = min(max(index + len(self) if index < 0 else index, 0), len(self))
+        data = text.encode("utf-8")
+        at = self._offsets[index]
+        self._data[at:at] = data
+        self._offsets = self._offsets[:index + 1] + array(
+            _OFFSET_TYPE, [offset + len(data) for offset in self._offsets[index:]])
+        if len(text) > self.max_width:
+            self.max_width = len(text)
+
+    def clear(self):
+        """Removes all lines."""
+        self._offsets = array(_OFFSET_TYPE, [0])
+        self.max_width = 0
+        if self._data is not None:
+            del self._data[:]
+        else:
+            self._unmap()
+            self._file.seek(0)
+            self._file.truncate()
+
+    def close(self):
+        """Closes the backing file, if any."""
+        if self._file is not None:
+            self._unmap()
+            self._file.close()
+            self._file = None
+
+    def _read(self, start, end):
+        if self._data is not None:
+            return bytes(self._data[start:end])
+        if start == end:
+            return b""
+        if self._map is None or len(self._map) < end:
+            # The file grew since it was mapped
+            self._unmap()
+            self._file.flush()
+            self._map = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map[start:end]
+
+    def _unmap(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+# =============================================================================
+# LAYOUT
+
+class Layout(object):
+    """Base class of layout nodes.
+
+    A node is given a rectangle (ypos, xpos, height, width) by its parent and
+    caches it in `rect`. solve() skips a subtree whose rectangle is unchanged
+    and whose constraints have not been updated since, so after a content
+    change only the path to the changed node (and the siblings whose space
+    moved) is laid out again.
+
+    In a Row, Column or Split, a node's size along the parent's axis is at
+    least `min_size` and at most `max_size` (None: unbounded); the space left
+    over is shared out in proportion to `weight`, and a weight of 0 keeps the
+    node at its minimum. `size` fixes the size (min_size = max_size = size).
+    """
+    def __init__(self, min_size=0, max_size=None, weight=1, size=None):
+        if size is not None:
+            min_size = max_size = size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.weight = weight
+        self.parent = None
+        self.children = []
+        self.rect = None
+        self._stale = True
+
+    def update(self, **constraints):
+        """Changes min_size, max_size, weight or size; re-solved on the next solve()."""
+        size = constraints.pop("size", None)
+        if size is not None:
+            constraints["min_size"] = constraints["max_size"] = size
+        for name, value in constraints.items():
+            if name not in ("min_size", "max_size", "weight"):
+                raise TypeError("Unknown layout constraint: {0}".format(name))
+            setattr(self, name, value)
+        self.invalidate()
+
+    def invalidate(self):
+        """Marks the node and its ancestors for re-solving."""
+        node = self
+        while node is not None and not node._stale:
+            node._stale = True
+            node = node.parent
+
+    def solve(self, rect):
+        """Lays the subtree out in `rect`; returns False if nothing changed."""
+        if rect == self.rect and not self._stale:
+            return False
+        self.rect = rect
+        self._stale = False
+        self.arrange(rect)
+        return True
+
+    def arrange(self, rect):
+        """Gives the children their rectangles (subclasses)."""
+        pass
+
+    def widgets(self):
+        """Yields the widgets laid out by the subtree."""
+        for child in self.children:
+            for widget in child.widgets():
+                yield widget
+
+    def _adopt(self, child, constraints):
+        """The child as a node (a widget is wrapped in a LayoutItem)."""
+        if not isinstance(child, Layout):
+            child = LayoutItem(child, **constraints)
+        elif constraints:
+            child.update(**constraints)
+        child.parent = self
+        self.invalidate()
+        return child
+
+
+class LayoutItem(Layout):
+    """Leaf node: sets a widget's xpos, ypos, height and width.
+
+    Widgets are only marked dirty when their geometry actually changes.
+    """
+    def __init__(self, widget, min_size=1, max_size=None, weight=1, size=None):
+        super(LayoutItem, self).__init__(min_size, max_size, weight, size)
+        self.widget = widget
+
+    def arrange(self, rect):
+        widget = self.widget
+        widget.ypos, widget.xpos, widget.height, widget.width = rect
+
+    def widgets(self):
+        yield self.widget
+
+
+def _distribute(nodes, total):
+    """Sizes of `nodes` along one axis that add up to `total` (if possible)."""
+    sizes = [node.min_size for node in nodes]
+    left = total - sum(sizes)
+    if left < 0:
+        # Too small for the minimums: the last nodes give way first
+        for ix in reversed(range(len(sizes))):
+            cut = min(sizes[ix], -left)
+            sizes[ix] -= cut
+            left += cut
+        return sizes
+    growing = [ix for ix, node in enumerate(nodes)
+               if node.weight > 0 and _room(node, sizes[ix]) != 0]
+    while left > 0 and growing:
+        weight = float(sum(nodes[ix].weight for ix in growing))
+        given = 0
+        for ix in growing:
+            extra = int(left * nodes[ix].weight / weight)
+            room = _room(nodes[ix], sizes[ix])
+            if room is not None and extra > room:
+                extra = room
+            sizes[ix] += extra
+            given += extra
+        left -= given
+        growing = [ix for ix in growing if _room(nodes[ix], sizes[ix]) != 0]
+        if not given:
+            # Rounding leftovers (fewer cells than growing nodes): one each
+            for ix in growing[:left]:
+                sizes[ix] += 1
+            break
+    return sizes
+
+
+def _room(node, size):
+    """How much a node can still grow (None: unbounded)."""
+    if node.max_size is None:
+        return None
+    return max(node.max_size - size, 0)
+
+
+class _Linear(Layout):
+    """Children side by side along one axis, `spacing` cells apart."""
+    horizontal = False
+
+    def __init__(self, *children, **options):
+        spacing = options.pop("spacing", 0)
+        super(_Linear, self).__init__(**options)
+        self.spacing = spacing
+        for child in children:
+            self.add(child)
+
+    def add(self, child, **constraints):
+        """Appends a child node or widget; returns its node."""
+        child = self._adopt(child, constraints)
+        self.children.append(child)
+        return child
+
+    def remove(self, child):
+        """Removes a child node, or the node of a widget."""
+        for node in self.children:
+            if node is child or getattr(node, "widget", None) is child:
+                self.children.remove(node)
+                node.parent = None
+                self.invalidate()
+                return
+        raise ValueError("Not in this layout: {0!r}".format(child))
+
+    def arrange(self, rect):
+        ypos, xpos, height, width = rect
+        gaps = self.spacing * max(len(self.children) - 1, 0)
+        if self.horizontal:
+            sizes = _distribute(self.children, width - gaps)
+            for child, size in zip(self.children, sizes):
+                child.solve((ypos, xpos, height, size))
+                xpos += size + self.spacing
+        else:
+            sizes = _distribute(self.children, height - gaps)
+            for child, size in zip(self.children, sizes):
+                child.solve((ypos, xpos, size, width))
+                ypos += size + self.spacing
+
+
+class Row(_Linear):
+    """Lays its children out left to right."""
+    horizontal = True
+
+
+class Column(_Linear):
+    """Lays its children out top to bottom."""
+    horizontal = False
+
+
+class Split(Layout):
+    """Two panes divided at `ratio`: side by side, or one above the other.
+
+    The divider moves with set_ratio(); the panes' min_size and max_size
+    still apply.
+    """
+    def __init__(self, first, second, ratio=0.5, horizontal=True,
+                 **constraints):
+        super(Split, self).__init__(**constraints)
+        self.ratio = ratio
+        self.horizontal = horizontal
+        self.children = [self._adopt(first, {}), self._adopt(second, {})]
+
+    def set_ratio(self, ratio):
+        self.ratio = min(max(ratio, 0.0), 1.0)
+        self.invalidate()
+
+    def arrange(self, rect):
+        ypos, xpos, height, width = rect
+        first, second = self.children
+        total = width if self.horizontal else height
+        size = int(round(total * self.ratio))
+        if second.max_size is not None:
+            size = max(size, total - second.max_size)
+        size = max(size, first.min_size)
+        if first.max_size is not None:
+            size = min(size, first.max_size)
+        size = min(max(min(size, total - second.min_size), 0), total)
+        if self.horizontal:
+            first.solve((ypos, xpos, height, size))
+            second.solve((ypos, xpos + size, height, width - size))
+        else:
+            first.solve((ypos, xpos, size, width))
+            second.solve((ypos + size, xpos, height - size, width))
+
+
+class Grid(Layout):
+    """Rows and columns of cells; a node may span several of them.
+
+    `rows` and `cols` are a number of equal tracks or a list with one weight
+    (or Layout carrying min_size/max_size/weight) per track; the tracks are
+    in grid.rows and grid.cols. The constraints of placed nodes are not used.
+    """
+    def __init__(self, rows, cols, spacing=0, **constraints):
+        super(Grid, self).__init__(**constraints)
+        self.spacing = spacing
+        self.rows = self._tracks(rows)
+        self.cols = self._tracks(cols)
+        # Node -> (row, col, rowspan, colspan)
+        self.cells = {}
+
+    def _tracks(self, spec):
+        if isinstance(spec, int):
+            spec = [1] * spec
+        tracks = []
+        for track in spec:
+            if not isinstance(track, Layout):
+                track = Layout(weight=track)
+            track.parent = self
+            tracks.append(track)
+        return tracks
+
+    def place(self, child, row, col, rowspan=1, colspan=1):
+        """Puts a node or widget in a cell; returns its node."""
+        if not (0 <= row and row + rowspan <= len(self.rows) and
+                0 <= col and col + colspan <= len(self.cols)):
+            raise ValueError("Cell is outside the grid.")
+        child = self._adopt(child, {})
+        self.children.append(child)
+        self.cells[child] = (row, col, rowspan, colspan)
+        return child
+
+    def _starts(self, tracks, start, total):
+        sizes = _distribute(tracks, total - self.spacing * max(len(tracks) - 1, 0))
+        starts = []
+        for size in sizes:
+            starts.append(start)
+            start += size + self.spacing
+        return starts, sizes
+
+    def arrange(self, rect):
+        ypos, xpos, height, width = rect
+        # Tracks are not solved themselves; let their update() reach the grid
+        for track in self.rows + self.cols:
+            track._stale = False
+        row_starts, heights = self._starts(self.rows, ypos, height)
+        col_starts, widths = self._starts(self.cols, xpos, width)
+        for child in self.children:
+            row, col, rowspan, colspan = self.cells[child]
+            last_row = row + rowspan - 1
+            last_col = col + colspan - 1
+            child.solve((row_starts[row], col_starts[col],
+                         row_starts[last_row] + heights[last_row] - row_starts[row],
+                         col_starts[last_col] + widths[last_col] - col_starts[col]))
 
 
 # =============================================================================
@@ -83,15 +1217,42 @@ class Click(object):
         if self.bstate & uni.BUTTON1_PRESSED:
             self.is_clicked = True
         self.debug = "Click: {0}, {1}, {2}".format(self.x, self.y, self.z)
+        # Set by locate()
+        self.widget = None
+        self.item = None
 
     @property
-    def coords(self):  # TODO: are these coords correct?
+    def coords(self):
+        """Screen column and row (0-based) of the event."""
         return (self.x, self.y)
 
+    def locate(self, window):
+        """Finds the topmost widget (and item) under the click; returns the widget."""
+        self.widget, self.item = window.hit_test(self.y, self.x)
+        return self.widget
+
 
 class Widget(object):
     """Base class for unicurses widgets."""
+    # Changing any of these attributes marks the widget for re-rendering
+    _dirty_attrs = frozenset(
+        ["label", "label_indent", "outline", "separators", "xpos", "ypos",
+         "height", "width"])
+    # Widget-local Keymap, consulted by a KeyDispatcher focused on the widget
+    keymap = None
+    # Theme styles the widget draws with; it is re-rendered when one changes
+    styles = frozenset(["border", "label"])
+    # Border, and rows with a horizontal rule joined to the border (e.g. under
+    # a header), drawn by draw_chrome
+    outline = True
+    separators = ()
+
     def __init__(self, window):
+        # Retained mode: only dirty widgets are re-rendered by Window.draw
+        self.dirty = True
+        # Visibility and stacking order, for hit testing
+        self.visible = False
+        self.z = -1
         # Parent window
         self._parent = window
         # Widget window
@@ -99,37 +1260,147 @@ class Widget(object):
         self.height = 0
         self.width = 0
         self.label_indent = 2
-
-    def show(self, render_fn=None):
-        """Show the widget."""
+        # What draw_chrome last drew into the window (None: nothing yet)
+        self._chrome_key = None
+
+    def __setattr__(self, name, value):
+        if name in self._dirty_attrs and getattr(self, name, None) != value:
+            object.__setattr__(self, "dirty", True)
+            if name == "label":
+                # Encoded once here rather than on every draw
+                object.__setattr__(self, "_label_cstr", uni.ucs_encode(value))
+        object.__setattr__(self, name, value)
+
+    def mark_dirty(self):
+        """Flags the widget to be re-rendered on the next Window.draw."""
+        self.dirty = True
+
+    def handle_key(self, key):
+        """Runs the key's binding in `keymap`; returns True if there was one."""
+        if self.keymap is None:
+            return False
+        binding = self.keymap.get(key)
+        if binding is None:
+            return False
+        binding()
+        return True
+
+    def parent_resized(self):
+        """Called when the parent window changes size (see Window.apply_resize).
+
+        Widgets placed by a layout are moved by it; others can fit themselves
+        to the new window size here.
+        """
+        pass
+
+    def show(self, update=True):
+        """Show the widget.
+
+        A widget that is not visible yet is raised to the top of the panel
+        stack; re-rendering a visible widget keeps its place in the stack.
+        """
+        geometry = getattr(self, "_geometry", None)
         # Call render() method if exists
         if hasattr(self, "render"):
             self.render()
-        if hasattr(self, "panel"):
-            uni.show_panel(self.panel)
-        uni.update_panels()
+        raised = not self.visible
+        if raised:
+            if getattr(self, "panel", None) is not None:
+                uni.show_panel(self.panel)
+            self.z = next(_zorder)
+        self.dirty = False
+        self.visible = True
+        # Content changes that move click targets invalidate them themselves
+        if raised or getattr(self, "_geometry", None) != geometry:
+            self._parent.invalidate_hits()
+        # Window.draw updates the panel stack once for all widgets
+        if update:
+            scheduler.request_panels()
 
     def hide(self):
         """Hide the widget."""
         uni.hide_panel(self.panel)
-        uni.update_panels()
+        self.visible = False
+        self._parent.invalidate_hits()
+        scheduler.request_panels()
+
+    def destroy(self):
+        """Frees the widget's curses window and panel."""
+        window_manager.release(self)
+        self.visible = False
+        self._parent.invalidate_hits()
+        self.mark_dirty()
+
+    def hit_regions(self):
+        """Clickable (ypos, xpos, height, width, item) rectangles on screen.
+
+        The whole widget is a region with item None; subclasses add their
+        items (rows, options) on top of it.
+        """
+        yield (self.ypos, self.xpos, self.height, self.width, None)
+
+    def draw_chrome(self):
+        """Draws the border, separators and label, or erases inside them.
+
+        Use after window_manager.acquire(..., erase=False). The chrome is
+        only drawn (and the window erased) when the window is new or resized
+        or the outline, label, separators or their styles changed; otherwise
+        just the area inside the border is erased, so a content update never
+        redraws the chrome.
+        """
+        theme = self._parent.theme
+        pair = getattr(self, "label_color_pair", 0)
+        label_attr = uni.COLOR_PAIR(pair) if pair else theme.attrs["label"]
+        key = (self.outline, self.separators, self.label, self.label_indent,
+               label_attr, theme.border)
+        if self.outline and key == self._chrome_key:
+            body = window_manager.body(self)
+            if body is not None:
+                uni.werase(body)
+                # Erased along with the inside
+                self.draw_separators()
+                return
+        uni.werase(self.win)
+        if self.outline:
+            self.draw_outline()
+            self.draw_separators()
+        if self.label:
+            self.draw_label()
+        self._chrome_key = key
+
+    def draw_outline(self):
+        """Draws the widget border in the theme's "border" style."""
+        uni.wborder(self.win, *self._parent.theme.border)
+
+    def draw_separators(self):
+        """Draws the separator rows, joined to the border."""
+        if not self.separators:
+            return
+        left, line, right = self._parent.theme.separator
+        for row in self.separators:
+            uni.mvwaddch(self.win, row, 0, left)
+            uni.mvwhline(self.win, row, 1, line, self.width - 2)
+            uni.mvwaddch(self.win, row, self.width - 1, right)
 
     def draw_label(self):
-        """Draws widget label."""
+        """Draws widget label in the theme's "label" style.
+
+        A nonzero `label_color_pair` overrides the style with that color pair.
+        """
         if not hasattr(self, "label"):
             raise AttributeError("Widget has no attribute 'label'")
         if (len(self.label) + 2) >= self.width:
             raise SizeError("Label is longer than box.")
-        # TODO: label styles
-        # if self.label_color_pair > 0:
-        # uni.wattron(self.boxwin, uni.COLOR_PAIR(self.label_color_pair))
-        uni.mvwaddstr(self.win, 0, self.label_indent, self.label)
-        # if self.label_color_pair > 0:
-        #    uni.wattroff(self.boxwin, uni.COLOR_PAIR(self.label_color_pair))
+        pair = getattr(self, "label_color_pair", 0)
+        attr = uni.COLOR_PAIR(pair) if pair else self._parent.theme.attrs["label"]
+        uni.mvwaddstr(self.win, 0, self.label_indent, self._label_cstr, attr)
 
 
 class Window(object):
     """Parent window object."""
+    # Seconds without a KEY_RESIZE before a resize is applied
+    resize_delay = 0.05
+
     def __init__(self):
         # Initialize screen
         self.stdscr = uni.initscr()
@@ -141,8 +1412,12 @@ class Window(object):
         uni.noecho()
         # Allow user input
         uni.keypad(self.stdscr, True)
-        # Enable colors
-        uni.start_color()
+        # Drawing order of contained widgets
+        self.widgets = []
+        # Compiled styles the widgets draw with (see set_theme)
+        self.theme = None
+        # Enable colors (and compile the default theme)
+        self.enable_colors()
         # Enable mouse
         uni.mouseinterval(0)
         uni.mousemask(uni.ALL_MOUSE_EVENTS)
@@ -151,8 +1426,16 @@ class Window(object):
         # Make maxx/maxy the last row/col visible
         self.maxy = y - 1
         self.maxx = x - 1
-        # Drawing order of contained widgets
-        self.widgets = []
+        # The background screen is only cleared on the first (or a forced) draw
+        self._drawn = False
+        # Click targets, rebuilt on the first hit test after a widget is
+        # shown, hidden or destroyed
+        self.hits = HitIndex()
+        self._hits_stale = True
+        # Root Layout node placing the widgets (see set_layout)
+        self.layout = None
+        # Time of the last KEY_RESIZE not yet applied (see request_resize)
+        self._resize_at = None
 
     def get_drawing_order(self):
         """Displays the child widgets and index in drawing order."""
@@ -181,21 +1464,167 @@ class Window(object):
         setattr(self, name, widget)
         self.widgets.append(widget)
 
+    def request_resize(self):
+        """Notes a KEY_RESIZE without acting on it yet.
+
+        The resize is applied by the first draw() after no further resize has
+        been requested for `resize_delay` seconds, so dragging the terminal
+        edge redraws once when it stops rather than once per event.
+        """
+        self._resize_at = _clock()
+
+    def handle_resize(self, settle=None):
+        """Handles a KEY_RESIZE in a blocking getch() loop.
+
+        Reads away the rest of a burst of resize events until none has
+        arrived for `settle` seconds (resize_delay by default), then applies
+        the resize once. A key pressed meanwhile is pushed back with ungetch.
+        """
+        if settle is None:
+            settle = self.resize_delay
+        self.request_resize()
+        uni.nodelay(self.stdscr, True)
+        try:
+            while True:
+                c = uni.getch()
+                if c == uni.KEY_RESIZE:
+                    self.request_resize()
+                elif c != uni.ERR:
+                    uni.ungetch(c)
+                    break
+                else:
+                    quiet = _clock() - self._resize_at
+                    if quiet >= settle:
+                        break
+                    uni.napms(max(int((settle - quiet) * 1000), 1))
+        finally:
+            uni.nodelay(self.stdscr, False)
+        return self.apply_resize()
+
+    def apply_resize(self):
+        """Fits the window to the terminal's current size.
+
+        Only what the new size affects is redone: the layout is re-solved,
+        widgets whose geometry changes re-render (their curses windows are
+        resized and moved, not recreated) and the others are just touched so
+        they are copied to the screen again. Returns True if the size changed.
+        """
+        self._resize_at = None
+        # Needed on PDCurses; NCurses has already resized stdscr
+        uni.resize_term(0, 0)
+        y, x = uni.getmaxyx(self.stdscr)
+        if (y - 1, x - 1) == (self.maxy, self.maxx):
+            return False
+        self.maxy = y - 1
+        self.maxx = x - 1
+        for widget in self.widgets:
+            widget.parent_resized()
+        self.relayout()
+        for widget in self.widgets:
+            for w in [widget] + list(getattr(widget, "children", ())):
+                if w.win is not None and not w.dirty:
+                    uni.touchwin(w.win)
+        uni.werase(self.stdscr)
+        scheduler.request(self.stdscr)
+        scheduler.request_panels()
+        self.invalidate_hits()
+        return True
+
+    def set_layout(self, layout):
+        """Places the widgets with a Layout tree covering the whole window.
+
+        Widgets in the layout that were not added with add_widget are added
+        to the drawing order.
+        """
+        self.layout = layout
+        for widget in layout.widgets():
+            if widget not in self.widgets:
+                self.widgets.append(widget)
+        self.relayout()
+
+    def relayout(self):
+        """Solves the parts of the layout whose space or constraints changed."""
+        if self.layout is not None:
+            self.layout.solve((0, 0, self.maxy + 1, self.maxx + 1))
+
     def enable_colors(self):
-        """Turns terminal colors on."""
+        """Turns terminal colors on and defines the widget color pairs."""
         uni.start_color()
-
-    def draw(self):
-        """Draw window and all child widgets."""
-        uni.clrtobot()
-        uni.refresh()
+        init_color_pairs()
+        # Recompiled with colors
+        self.set_theme(self.theme or default_theme)
+
+    def set_theme(self, theme):
+        """Compiles `theme` and re-renders the widgets whose styles changed."""
+        old = self.theme.attrs if self.theme is not None else {}
+        if self.theme is not None and self.theme is not theme:
+            # Its color pairs can be recycled now
+            self.theme.release()
+        theme.compile()
+        self.theme = theme
+        changed = set(key for key, attr in theme.attrs.items()
+                      if old.get(key) != attr)
+        if not changed:
+            return
+        for widget in self.widgets:
+            for w in [widget] + list(getattr(widget, "children", ())):
+                if not changed.isdisjoint(w.styles):
+                    w.mark_dirty()
+
+    def invalidate_hits(self):
+        """Marks the click targets for rebuilding."""
+        self._hits_stale = True
+
+    def hit_test(self, ypos, xpos):
+        """(widget, item) at a screen position, topmost first, or (None, None)."""
+        if self._hits_stale:
+            self.hits.clear()
+            for widget in self.widgets:
+                for w in [widget] + list(getattr(widget, "children", ())):
+                    if not w.visible or w.win is None:
+                        continue
+                    for y, x, h, width, item in w.hit_regions():
+                        self.hits.add(y, x, h, width, w, item, w.z)
+            self._hits_stale = False
+        return self.hits.hit(ypos, xpos)
+
+    def draw(self, force=False):
+        """Draw window and re-render the dirty child widgets.
+
+        Widgets that have not changed since they were last shown are left
+        untouched; if no widget is dirty nothing is drawn. Pass force=True to
+        re-render every widget. A settled resize (see request_resize) is
+        applied and the layout, if any, re-solved first. The terminal update
+        goes through the render scheduler, which is also given the chance to
+        flush a deferred refresh on idle frames. Returns True if anything was
+        drawn.
+        """
+        if force or not self._drawn:
+            uni.clrtobot()
+            scheduler.request(self.stdscr)
+            self._drawn = True
+            force = True
+        resized = False
+        if self._resize_at is not None and \
+                _clock() - self._resize_at >= self.resize_delay:
+            resized = self.apply_resize()
+        self.relayout()
         # Requires all child widgets to have a show method
-        [w.show() for w in self.widgets]
-        uni.update_panels()
-        uni.doupdate()
+        dirty = [w for w in self.widgets if force or w.dirty]
+        if not dirty and not resized:
+            # An idle frame still completes a refresh held back by the limiter
+            scheduler.maybe_flush()
+            return False
+        for w in dirty:
+            w.show(update=False)
+        scheduler.request_panels()
+        scheduler.maybe_flush()
+        return True
 
 
 class Box(Widget):
+    styles = frozenset(["border", "label", "text"])
+
     def __init__(self, window, xpos, ypos, height, width, label="",
                  outline=True, label_color_pair=0):
         super(Box, self).__init__(window)
@@ -211,12 +1640,12 @@ class Box(Widget):
     def render(self):
         """Renders but does not show the widget."""
         # Draw the box line
-        self.win = uni.newwin(self.height, self.width, self.ypos, self.xpos)
-        if self.outline:
-            uni.box(self.win, 0, 0)
-
-        # Label
-        self.draw_label()
+        window_manager.acquire(
+            self, self.height, self.width, self.ypos, self.xpos, erase=False)
+        # Content is written in the "text" style
+        uni.wattrset(self.win, self._parent.theme.attrs["text"])
+        # Box line and label
+        self.draw_chrome()
 
         # Box fill
         # TODO: color fill
@@ -226,11 +1655,16 @@ class Box(Widget):
             ix = self.content.index(line) + 2
             uni.mvwaddstr(self.win, ix, 2, line)
 
-        # Only create panel attribute on display
-        self.panel = uni.new_panel(self.win)
-
     def add_content(self, text):
         self.content.append(text)
+        self.mark_dirty()
+        self._parent.invalidate_hits()
+
+    def hit_regions(self):
+        """The box, and each content line with its index as the item."""
+        yield (self.ypos, self.xpos, self.height, self.width, None)
+        for ix, line in enumerate(self.content):
+            yield (self.ypos + ix + 2, self.xpos + 2, 1, len(line), ix)
 
     def fit_to_content(self):
         max_content = max([len(c) for c in self.content])
@@ -249,6 +1683,8 @@ class _SubmenuOption(object):
 class _Submenu(object):
     def __init__(self, name, options):
         self.name = name
+        # Pre-encoded for drawing (see unicurses.ucs_encode)
+        self.cname = uni.ucs_encode(name)
         self.options = options
         # {"Exit": (win.destroy, "Later dude")}
         # 'e': {"action": options[0], "args": options[1]}
@@ -284,10 +1720,15 @@ class _Submenu(object):
             self.actions[f_letter] = {"action": action,
                                       "args": args}
 
+        # Option keys, compiled once (used while the submenu is open)
+        self.keymap = Keymap()
+        for f_letter in self.actions:
+            self.keymap.bind(f_letter, self.action, f_letter)
+
     @property
     def bounds(self):
         """Bounding box of the object for click-target."""
-        return (range(self.xpos, len(self.name)), 1)
+        return (range(self.xpos, self.xpos + len(self.name)), 1)
 
     def action(self, key):
         """Execute an option's action."""
@@ -305,6 +1746,8 @@ class _Submenu(object):
 
 class Menubar(Widget):
     """Horizontal menubar (File, Edit, Help, etc)."""
+    styles = frozenset(["border", "label", "text"])
+
     def __init__(self, window, label="", label_color_pair=0):
         super(Menubar, self).__init__(window)
         self.label = label
@@ -314,28 +1757,45 @@ class Menubar(Widget):
         #self.sections = OrderedDict()
         self.submenus = []
         self.selection = None
-        # Start window at (0, 0); span 3 down and entire width over
-        self.win = uni.newwin(self.height, self.width, 0, 0)
+        # Window is allocated at (0, 0) on first render
+        self.panel = None
+        # {key code: submenu} and the matching bindings, kept up to date by
+        # add_submenu
+        self.menukeys = {}
+        self.keymap = Keymap()
+
+    def parent_resized(self):
+        self.width = self._parent.maxx
 
     def render(self):
         """Show the menubar."""
         #self.make_panels()
-        # Box line
-        uni.box(self.win, 0, 0)
-        # Label
-        self.draw_label()
-
-        uni.doupdate()
-        self.panel = uni.new_panel(self.win)
-        uni.panel_above(self.panel)
+        # Start window at (0, 0); span 3 down and entire width over
+        window_manager.acquire(self, self.height, self.width, 0, 0, erase=False)
+        uni.wattrset(self.win, self._parent.theme.attrs["text"])
+        # Box line and label
+        self.draw_chrome()
 
         # Print submenu names
         self.update_section_atts()
         self.make_panels()
         for submenu in self.submenus:
-            uni.mvwaddstr(self.win, 1, submenu.xpos, submenu.name)
+            uni.mvwaddstr(self.win, 1, submenu.xpos, submenu.cname)
             # TODO: highlight selected submenu/options
 
+    @property
+    def children(self):
+        """Submenu boxes, for hit testing."""
+        return [submenu.panel for submenu in self.submenus
+                if getattr(submenu, "panel", None) is not None]
+
+    def hit_regions(self):
+        """The menubar, and each submenu name with the submenu as the item."""
+        yield (0, 0, self.height, self.width, None)
+        for submenu in self.submenus:
+            xrange_, ypos = submenu.bounds
+            yield (ypos, submenu.xpos, 1, len(xrange_), submenu)
+
     def update_section_atts(self):
         """Calculates spacing between sections."""
         if self.submenus:
@@ -344,54 +1804,62 @@ class Menubar(Widget):
                 submenu.xpos = xpos
                 xpos += len(submenu.name) + 2
 
-    @property
-    def menukeys(self):
-        """Key for each menubar submenu."""
-        return {ord(submenu.key): submenu for submenu in self.submenus}
-
     def make_panels(self):
         """Dict of submenus by submenu name."""
         for submenu in self.submenus:
-            box = Box(self._parent, submenu.xpos, 2, 20, 20)
-            box.label_indent = 1
-            for option in submenu.options:
-                box.add_content(option)
-            box.fit_to_content()
-            submenu.panel = box
+            # Reuse the submenu's box (and its curses window) across renders
+            box = getattr(submenu, "panel", None)
+            if box is None:
+                box = Box(self._parent, submenu.xpos, 2, 20, 20)
+                box.label_indent = 1
+                for option in submenu.options:
+                    box.add_content(option)
+                box.fit_to_content()
+                submenu.panel = box
+            box.xpos = submenu.xpos
 
     def add_submenu(self, name, options):
         """Add submenu to menubar (e.g. File, Edit, etc.)."""
         new_submenu = _Submenu(name, options)
         self.submenus.append(new_submenu)
+        key = ord(new_submenu.key)
+        self.menukeys[key] = new_submenu
+        self.keymap.bind(key, self.show_submenu, key)
+        self.mark_dirty()
+        self._parent.invalidate_hits()
 
     def show_submenu(self, key):
+        # Clear any opened menus
+        self.reset()
         self.open_submenu = self.menukeys[key]
         self.selection = self.open_submenu.panel
         self.selection.show()
-        uni.update_panels()
 
         # Listen for keypress with submenu open
         while True:
+            scheduler.flush()
             c = uni.wgetch(self.win)
             if c in QUIT_KEYS:
                 self.reset()
                 break
-            elif c in self.open_submenu.actions: # option_keys
-                uni.mvaddstr(win.maxy, 0,
+            binding = self.open_submenu.keymap.get(c)
+            if binding is not None:
+                uni.mvaddstr(self._parent.maxy, 0,
                              "DEBUG: Character pressed: {0}".format(c))
-                uni.refresh()
-                self.open_submenu.action(c)
+                scheduler.request()
+                binding()
 
     def reset(self):
         if self.selection:
             self.selection.hide()
-        uni.update_panels()
-        uni.refresh()
+        scheduler.request()
+        scheduler.request_panels()
 
 
 class Textbox(Box):  # TODO: deque and scroll modes / subclasses
     def __init__(self, window, xpos, ypos, height, width, label="",
-                 outline=True, xpad=0, ypad=0, label_color_pair=0):
+                 outline=True, xpad=0, ypad=0, label_color_pair=0,
+                 store=None):
         super(Textbox, self).__init__(
             window, xpos, ypos, height, width, label=label,
             outline=outline, label_color_pair=label_color_pair)
@@ -400,8 +1868,9 @@ class Textbox(Box):  # TODO: deque and scroll modes / subclasses
         self.ypad = ypad + 1
         self.xpad = xpad + 1
 
-        # Text content, ordered by list index
-        self.all_lines = []
+        # Text content, ordered by list index; a LineStore keeps long
+        # histories compact
+        self.all_lines = [] if store is None else store
 
         # Size rules
         self.min_height = 3
@@ -421,49 +1890,704 @@ class Textbox(Box):  # TODO: deque and scroll modes / subclasses
 
     @property
     def lines(self):
-        return deque(self.all_lines, self.height - 2)
+        """The last lines, as many as fit in the box."""
+        skip = max(len(self.all_lines) - max(self.height - 2, 0), 0)
+        return self.all_lines[skip:]
 
     @property
     def max_line_len(self):
-        return max([len(line) for line in self.all_lines])
+        # Maintained by LineStore; scanned for a plain list
+        max_width = getattr(self.all_lines, "max_width", None)
+        if max_width is None:
+            max_width = max([len(line) for line in self.all_lines] or [0])
+        return max_width
 
     def add_line(self, text, line=None):
         if line is None:
             self.all_lines.append(text)
         else:
             self.all_lines.insert(line, text)
+        self.mark_dirty()
 
     def render(self, line=None):  # Overwrites existing
         if self.max_line_len > self.width:
             raise SizeError("Content is longer than box.")
-        # New window
-        self.win = uni.newwin(self.height, self.width, self.ypos, self.xpos)
-
-        # Draw outline
-        if self.outline:
-            uni.box(self.win, 0, 0)
-        # Draw label
-        self.draw_label()
+        # Reused window
+        window_manager.acquire(
+            self, self.height, self.width, self.ypos, self.xpos, erase=False)
+        uni.wattrset(self.win, self._parent.theme.attrs["text"])
 
-        # Make panel
-        self.panel = uni.new_panel(self.win)
+        # Draw outline and label
+        self.draw_chrome()
 
         # Track the line number currently written
         self.current_line = 0
 
         # Print content
-        for line in self.lines:
+        for ix, line in enumerate(self.lines):
             # Print line text on line number
-            ix = list(self.lines).index(line)
             line_no = ix + self.ypad
             # Print lines according to the text's index in the list
             uni.mvwaddstr(self.win, line_no, self.xpad, " "*(self.width-2))
             uni.mvwaddstr(self.win, line_no, self.xpad, line)
             self.current_line += 1
-            uni.wrefresh(self.win)
+
+
+class LogView(Textbox):
+    """Scrolling log tail backed by a fixed-capacity ring buffer.
+
+    Only the newest `capacity` lines are kept in memory; older lines are
+    appended to `history_file` if one is given. Lines added since the last
+    render are drawn by scrolling the window (wscrl) and writing just the new
+    rows; the whole view is only redrawn after a geometry or label change.
+    Lines wider than the view are truncated instead of raising SizeError.
+    """
+    def __init__(self, window, xpos, ypos, height, width, label="",
+                 outline=True, xpad=0, ypad=0, label_color_pair=0,
+                 capacity=1000, history_file=None):
+        super(LogView, self).__init__(
+            window, xpos, ypos, height, width, label=label, outline=outline,
+            xpad=xpad, ypad=ypad, label_color_pair=label_color_pair)
+        # Ring buffer of the newest lines
+        self.all_lines = deque(maxlen=capacity)
+        self.capacity = capacity
+        # Evicted lines are spilled here (optional)
+        self.history_file = history_file
+        self._history = None
+        # Lines appended since the last render
+        self._pending = 0
+        self._full_render = True
+
+    def __setattr__(self, name, value):
+        if name in self._dirty_attrs and getattr(self, name, None) != value:
+            object.__setattr__(self, "_full_render", True)
+        super(LogView, self).__setattr__(name, value)
+
+    def mark_dirty(self):
+        """Flags the whole view (not just new lines) for re-rendering."""
+        self._full_render = True
+        self.dirty = True
+
+    @property
+    def rows(self):
+        """Number of text rows inside the view."""
+        return max(self.height - 2 * self.ypad, 0)
+
+    @property
+    def lines(self):
+        """The lines currently visible (newest last)."""
+        skip = max(len(self.all_lines) - self.rows, 0)
+        return islice(self.all_lines, skip, None)
+
+    def add_line(self, text, line=None):
+        """Appends a line; `line` is not supported by the ring buffer."""
+        if line is not None:
+            raise ValueError("LogView only supports appending lines.")
+        if len(self.all_lines) == self.capacity and self.history_file:
+            if self._history is None:
+                self._history = open(self.history_file, "a")
+            self._history.write(self.all_lines[0] + "\n")
+        self.all_lines.append(text)
+        self._pending += 1
+        self.dirty = True
+
+    def close(self):
+        """Closes the spill-to-disk history file."""
+        if self._history is not None:
+            self._history.close()
+            self._history = None
+
+    def _draw_row(self, row, text):
+        """Writes one line of text to a view row, clearing the rest."""
+        n = self.width - 2 * self.xpad
+        line_no = row + self.ypad
+        uni.mvwaddnstr(self.win, line_no, self.xpad, " " * n, n)
+        uni.mvwaddnstr(self.win, line_no, self.xpad, text, n)
+
+    def _scroller(self):
+        """(window, first row) of the area scrolled by incremental renders.
+
+        The body inside the border, so the border cells of scrolled-in rows
+        are not blanked; the widget window if it is too small for a body.
+        """
+        body = window_manager.body(self)
+        if body is None:
+            return self.win, self.ypad
+        return body, self.ypad - 1
+
+    def render(self, line=None):
+        rows = self.rows
+        total = len(self.all_lines)
+        # Redraw everything if the new lines only partly fill an unfilled view
+        overflow = total - self._pending < rows < total
+        if (self.win is None or self._full_render or overflow
+                or self._pending >= rows):
+            # Full redraw
+            window_manager.acquire(
+                self, self.height, self.width, self.ypos, self.xpos, erase=False)
+            # New rows are written (and scrolled in) in the "text" style
+            uni.wattrset(self.win, self._parent.theme.attrs["text"])
+            self.draw_chrome()
+            # Only the inside of the border is scrolled
+            scroller, top = self._scroller()
+            uni.wsetscrreg(scroller, top, top + rows - 1)
+            for ix, text in enumerate(self.lines):
+                self._draw_row(ix, text)
+        elif self._pending:
+            first = total - self._pending
+            if total > rows:
+                # Shift the existing rows up and draw only the new ones
+                scroller = self._scroller()[0]
+                uni.scrollok(scroller, True)
+                uni.wscrl(scroller, self._pending)
+                uni.scrollok(scroller, False)
+                row = rows - self._pending
+            else:
+                row = first
+            for ix, text in enumerate(islice(self.all_lines, first, None), row):
+                self._draw_row(ix, text)
+        self._pending = 0
+        self._full_render = False
+
+
+def _navigation_keymap(view, move, pan=None):
+    """Keymap of the arrow, page and Home/End keys of a scrolling view.
+
+    Up/Down call move(-1/1); `view` provides page(n), jump(0) and jump_end().
+    Left/Right call pan(-8/8) if `pan` is given.
+    """
+    keymap = Keymap()
+    keymap.bind(uni.KEY_UP, move, -1)
+    keymap.bind(uni.KEY_DOWN, move, 1)
+    keymap.bind(uni.KEY_PPAGE, view.page, -1)
+    keymap.bind(uni.KEY_NPAGE, view.page, 1)
+    if pan is not None:
+        keymap.bind(uni.KEY_LEFT, pan, -8)
+        keymap.bind(uni.KEY_RIGHT, pan, 8)
+    keymap.bind(uni.KEY_HOME, view.jump, 0)
+    keymap.bind(uni.KEY_END, view.jump_end)
+    return keymap
+
+
+class ListView(Box):
+    """Virtual scrolling list over any sequence.
+
+    `items` only needs __len__ and __getitem__, so it can be a lazy sequence
+    of any size; only the rows currently in view are fetched and drawn.
+    Navigation and jump-to-index are O(1) regardless of the item count.
+    """
+    styles = frozenset(["border", "label", "text", "selected"])
+
+    def __init__(self, window, xpos, ypos, height, width, items, label="",
+                 outline=True, formatter=str, label_color_pair=0):
+        super(ListView, self).__init__(
+            window, xpos, ypos, height, width, label=label, outline=outline,
+            label_color_pair=label_color_pair)
+        self.items = items
+        self.formatter = formatter
+        # Index of the selected item and of the first visible item
+        self.position = 0
+        self.top = 0
+        self.keymap = _navigation_keymap(self, self.navigate)
+
+    @property
+    def rows(self):
+        """Number of item rows inside the view."""
+        return max(self.height - 2, 1)
+
+    @property
+    def selected(self):
+        """The selected item, or None if the list is empty."""
+        if not len(self.items):
+            return None
+        return self.items[self.position]
+
+    def jump(self, index):
+        """Selects the item at `index`, scrolling it into view."""
+        count = len(self.items)
+        index = min(max(index, 0), max(count - 1, 0))
+        top = self.top
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + self.rows:
+            self.top = index - self.rows + 1
+        if self.top != top:
+            # Rows now show other items
+            self._parent.invalidate_hits()
+        if index != self.position:
+            self.position = index
+            self.mark_dirty()
+
+    def navigate(self, n):
+        """Moves the selection by `n` items."""
+        self.jump(self.position + n)
+
+    def page(self, n):
+        """Moves the selection by `n` pages."""
+        self.navigate(n * self.rows)
+
+    def jump_end(self):
+        """Selects the last item."""
+        self.jump(len(self.items) - 1)
+
+    def hit_regions(self):
+        """The list, and each visible row with its item index as the item."""
+        yield (self.ypos, self.xpos, self.height, self.width, None)
+        stop = min(self.top + self.rows, len(self.items))
+        for ix in range(self.top, stop):
+            yield (self.ypos + ix - self.top + 1, self.xpos + 1, 1,
+                   self.width - 2, ix)
+
+    def render(self):
+        """Draws the visible slice of the list."""
+        # The view may have changed size since top was set: fill it, and keep
+        # the selection in it
+        top = min(self.top, max(len(self.items) - self.rows, 0))
+        if self.position >= top + self.rows:
+            top = self.position - self.rows + 1
+        if top != self.top:
+            self.top = top
+            self._parent.invalidate_hits()
+        window_manager.acquire(
+            self, self.height, self.width, self.ypos, self.xpos, erase=False)
+        attrs = self._parent.theme.attrs
+        uni.wattrset(self.win, attrs["text"])
+        self.draw_chrome()
+        n = self.width - 2
+        stop = min(self.top + self.rows, len(self.items))
+        for ix in range(self.top, stop):
+            text = self.formatter(self.items[ix])
+            if ix == self.position:
+                uni.mvwaddnstr(self.win, ix - self.top + 1, 1,
+                               text.ljust(n), n, attrs["selected"])
+            else:
+                uni.mvwaddnstr(self.win, ix - self.top + 1, 1, text, n)
+
+
+class _LineIndex(object):
+    """Byte offsets of the line starts in a buffer, found a chunk at a time.
+
+    extend() may run on a background thread (see start()) while the UI looks
+    lines up; offset_of() indexes on demand only as far as it needs to.
+    """
+    chunk_size = 1 << 20
+
+    def __init__(self, data):
+        self.data = data
+        self.size = len(data)
+        self.offsets = array(_OFFSET_TYPE, [0] if self.size else [])
+        # Bytes indexed so far
+        self.scanned = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+
+    def __len__(self):
+        """Number of lines found so far."""
+        return len(self.offsets)
+
+    @property
+    def complete(self):
+        return self.scanned >= self.size
+
+    def extend(self):
+        """Indexes the next chunk; returns False once the index is complete."""
+        with self._lock:
+            start = pos = self.scanned
+            if start >= self.size:
+                return False
+            end = min(start + self.chunk_size, self.size)
+            offsets = self.offsets
+            # The text after the chunk's last newline is rescanned next time
+            for line in self.data[start:end].split(b"\n")[:-1]:
+                pos += len(line) + 1
+                if pos < self.size:
+                    offsets.append(pos)
+            self.scanned = end
+            return end < self.size
+
+    def offset_of(self, line):
+        """Byte offset of a 0-based line (the last line if past the end)."""
+        while len(self.offsets) <= line and not self.complete:
+            self.extend()
+        if not self.offsets:
+            return 0
+        return self.offsets[min(line, len(self.offsets) - 1)]
+
+    def line_of(self, offset):
+        """0-based line at a byte offset, or None if not indexed that far yet."""
+        if offset >= self.scanned and not self.complete:
+            return None
+        return max(bisect_right(self.offsets, offset) - 1, 0)
+
+    def start(self):
+        """Indexes the rest of the buffer on a daemon thread."""
+        if self._thread is None and not self.complete:
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stopped and self.extend():
+            pass
+
+
+class FileView(Box):
+    """Pager over a file of any size, read through mmap.
+
+    The view is positioned by byte offset, so scrolling, paging, jumping to
+    the end and searching only touch the bytes they pass over; only the rows
+    in view are read and decoded. Line numbers come from a line index that is
+    built in chunks on a background thread, and on demand up to a line that is
+    jumped to. The visible lines are drawn once into a pad and copied into
+    the view, so scrolling sideways does not read them again.
+    """
+    styles = Widget.styles
+    # Lines are cut off after this many columns
+    max_columns = 1024
+
+    def __init__(self, window, xpos, ypos, height, width, path, label="",
+                 outline=True, label_color_pair=0, encoding="utf-8",
+                 background=True):
+        super(FileView, self).__init__(
+            window, xpos, ypos, height, width, label=label, outline=outline,
+            label_color_pair=label_color_pair)
+        self.path = path
+        self.encoding = encoding
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        # Empty files cannot be mapped
+        if size:
+            self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.data = b""
+        self.size = size
+        self.index = _LineIndex(self.data)
+        if background:
+            self.index.start()
+        # Byte offset of the first visible line, and first visible column
+        self.offset = 0
+        self.left = 0
+        # Last search pattern (bytes)
+        self.pattern = None
+        # Off-screen copy of the visible lines and what it was filled from
+        self.pad = None
+        self._pad_size = None
+        self._pad_key = None
+        self.keymap = _navigation_keymap(self, self.scroll, self.pan)
+        self.keymap.bind("n", self.search_next)
+        self.keymap.bind("N", self.search_previous)
+
+    @property
+    def rows(self):
+        """Number of text rows inside the view."""
+        return max(self.height - 2, 1)
+
+    @property
+    def cols(self):
+        """Number of text columns inside the view."""
+        return max(self.width - 2, 1)
+
+    @property
+    def line_number(self):
+        """0-based line at the top of the view, or None until it is indexed."""
+        return self.index.line_of(self.offset)
+
+    def _line_start(self, pos):
+        return self.data.rfind(b"\n", 0, pos) + 1
+
+    def _next_line(self, pos):
+        """Offset of the line after the one at `pos`, or None at the last line."""
+        end = self.data.find(b"\n", pos)
+        if end < 0 or end + 1 >= self.size:
+            return None
+        return end + 1
+
+    def _last_page(self):
+        """Offset of the top line when the last line is at the bottom."""
+        pos = self._line_start(max(self.size - 1, 0))
+        for _ in range(self.rows - 1):
+            if pos == 0:
+                break
+            pos = self._line_start(pos - 1)
+        return pos
+
+    def _move_to(self, pos):
+        pos = min(pos, self._last_page())
+        if pos != self.offset:
+            self.offset = pos
+            self.mark_dirty()
+
+    def scroll(self, n):
+        """Scrolls by `n` lines (up if negative)."""
+        pos = self.offset
+        for _ in range(abs(n)):
+            if n < 0:
+                if pos == 0:
+                    break
+                pos = self._line_start(pos - 1)
+            else:
+                next_pos = self._next_line(pos)
+                if next_pos is None:
+                    break
+                pos = next_pos
+        self._move_to(pos)
+
+    def page(self, n):
+        """Scrolls by `n` pages."""
+        self.scroll(n * self.rows)
+
+    def pan(self, n):
+        """Scrolls sideways by `n` columns."""
+        left = max(self.left + n, 0)
+        if left != self.left:
+            self.left = left
+            self.mark_dirty()
+
+    def jump(self, line):
+        """Shows the 0-based `line` at the top (indexing the file up to it)."""
+        self._move_to(self.index.offset_of(max(line, 0)))
+
+    def jump_end(self):
+        """Shows the last page of the file."""
+        self._move_to(self._last_page())
+
+    def jump_offset(self, pos):
+        """Shows the line containing byte `pos` at the top."""
+        self._move_to(self._line_start(min(max(pos, 0), self.size)))
+
+    def search(self, pattern, backward=False):
+        """Shows the next line containing `pattern` (str or bytes) at the top.
+
+        Searches forward from the line after the top one, or backward from the
+        top line. Returns True if a match was found.
+        """
+        if not isinstance(pattern, bytes):
+            pattern = pattern.encode(self.encoding)
+        self.pattern = pattern
+        if backward:
+            hit = self.data.rfind(pattern, 0, self.offset)
+        else:
+            start = self._next_line(self.offset)
+            hit = -1 if start is None else self.data.find(pattern, start)
+        if hit < 0:
+            return False
+        self.jump_offset(hit)
+        return True
+
+    def search_next(self):
+        """Repeats the last search forward."""
+        return self.pattern is not None and self.search(self.pattern)
+
+    def search_previous(self):
+        """Repeats the last search backward."""
+        return self.pattern is not None and self.search(self.pattern, True)
+
+    def _visible_lines(self):
+        lines = []
+        pos = self.offset
+        while pos < self.size and len(lines) < self.rows:
+            end = self.data.find(b"\n", pos)
+            if end < 0:
+                end = self.size
+            text = self.data[pos:end].decode(self.encoding, "replace")
+            lines.append(text.rstrip("\r").expandtabs())
+            pos = end + 1
+        return lines
+
+    def _fill_pad(self):
+        """Draws the visible lines into the pad."""
+        lines = self._visible_lines()
+        size = (self.rows, min(max([self.cols] + [len(line) for line in lines]),
+                               self.max_columns))
+        if size != self._pad_size:
+            if self.pad is not None:
+                uni.delwin(self.pad)
+            self.pad = uni.newpad(*size)
+            self._pad_size = size
+        else:
+            uni.werase(self.pad)
+        for y, text in enumerate(lines):
+            uni.mvwaddnstr(self.pad, y, 0, text, size[1])
+        self._pad_key = (self.offset, self.rows, self.cols)
+
+    def render(self):
+        """Draws the visible part of the file."""
+        window_manager.acquire(
+            self, self.height, self.width, self.ypos, self.xpos, erase=False)
+        self.draw_chrome()
+        if self._pad_key != (self.offset, self.rows, self.cols):
+            self._fill_pad()
+        self.left = min(self.left, self._pad_size[1] - self.cols)
+        uni.copywin(self.pad, self.win, 0, self.left, 1, 1,
+                    self.rows, self.cols, False)
+
+    def close(self):
+        """Stops indexing and closes the file."""
+        self.index.stop()
+        if self.pad is not None:
+            uni.delwin(self.pad)
+            self.pad = None
+            self._pad_key = self._pad_size = None
+        if self.size:
+            self.data.close()
+        self._file.close()
+
+
+class ScrollView(Box):
+    """Scrollable viewport onto content larger than the widget.
+
+    Content is drawn once into an off-screen pad, which grows as content is
+    added; the view shows the part of the pad at (top, left). Scrolling only
+    moves that origin and copies the pad into the view again (copywin), so
+    the content itself is never redrawn.
+    """
+    styles = Widget.styles
+
+    def __init__(self, window, xpos, ypos, height, width, label="",
+                 outline=True, label_color_pair=0):
+        super(ScrollView, self).__init__(
+            window, xpos, ypos, height, width, label=label, outline=outline,
+            label_color_pair=label_color_pair)
+        # Extent of the content drawn so far
+        self.content_height = 0
+        self.content_width = 0
+        # Content row and column at the top left of the view
+        self.top = 0
+        self.left = 0
+        self.pad = None
+        self._pad_size = (0, 0)
+        self.keymap = _navigation_keymap(self, self.scroll, self.pan)
+
+    @property
+    def inset(self):
+        """Rows/columns taken by the outline on each side."""
+        return 1 if self.outline else 0
+
+    @property
+    def rows(self):
+        """Number of content rows in view."""
+        return max(self.height - 2 * self.inset, 1)
+
+    @property
+    def cols(self):
+        """Number of content columns in view."""
+        return max(self.width - 2 * self.inset, 1)
+
+    def _reserve(self, height, width):
+        """Grows the pad (at least doubling) to hold height x width cells."""
+        pad_height, pad_width = self._pad_size
+        if height <= pad_height and width <= pad_width:
+            return
+        if height > pad_height:
+            pad_height = max(height, 2 * pad_height)
+        if width > pad_width:
+            pad_width = max(width, 2 * pad_width)
+        if self.pad is None:
+            self.pad = uni.newpad(pad_height, pad_width)
+        else:
+            uni.wresize(self.pad, pad_height, pad_width)
+        self._pad_size = (pad_height, pad_width)
+
+    def write(self, ypos, xpos, text, attr=uni.A_NORMAL):
+        """Draws text into the content at (ypos, xpos)."""
+        # One spare column: curses cannot write the last cell of a pad
+        self._reserve(ypos + 1, xpos + len(text) + 1)
+        uni.mvwaddstr(self.pad, ypos, xpos, text, attr)
+        self.content_height = max(self.content_height, ypos + 1)
+        self.content_width = max(self.content_width, xpos + len(text))
+        self.mark_dirty()
+
+    def add_line(self, text, attr=uni.A_NORMAL):
+        """Appends a line of text below the content."""
+        self.write(self.content_height, 0, text, attr)
+
+    def clear(self):
+        """Removes all content and scrolls back to the top."""
+        if self.pad is not None:
+            uni.werase(self.pad)
+        self.content_height = self.content_width = 0
+        self.top = self.left = 0
+        self.mark_dirty()
+
+    def scroll_to(self, top, left=None):
+        """Moves the view's origin, clamped to the content."""
+        if left is None:
+            left = self.left
+        top = min(max(top, 0), max(self.content_height - self.rows, 0))
+        left = min(max(left, 0), max(self.content_width - self.cols, 0))
+        if (top, left) != (self.top, self.left):
+            self.top, self.left = top, left
+            self._parent.invalidate_hits()
+            self._blit()
+
+    def scroll(self, n):
+        """Scrolls by `n` rows (up if negative)."""
+        self.scroll_to(self.top + n)
+
+    def page(self, n):
+        """Scrolls by `n` pages."""
+        self.scroll(n * self.rows)
+
+    def pan(self, n):
+        """Scrolls sideways by `n` columns."""
+        self.scroll_to(self.top, self.left + n)
+
+    def jump(self, row):
+        """Shows content row `row` at the top."""
+        self.scroll_to(row)
+
+    def jump_end(self):
+        """Shows the last page of content."""
+        self.scroll_to(self.content_height)
+
+    def hit_regions(self):
+        """The view, and each visible row with its content row as the item."""
+        yield (self.ypos, self.xpos, self.height, self.width, None)
+        inset = self.inset
+        for ix in range(min(self.rows, self.content_height - self.top)):
+            yield (self.ypos + inset + ix, self.xpos + inset, 1, self.cols,
+                   self.top + ix)
+
+    def _blit(self):
+        """Copies the visible part of the pad into the view."""
+        if self.win is None or self.dirty:
+            # Not rendered yet (or about to be); render() copies it
+            self.mark_dirty()
+            return
+        self._reserve(self.top + self.rows, self.left + self.cols)
+        inset = self.inset
+        uni.copywin(self.pad, self.win, self.top, self.left, inset, inset,
+                    inset + self.rows - 1, inset + self.cols - 1, False)
+        scheduler.request_panels()
+
+    def render(self):
+        """Draws the frame and the visible part of the content."""
+        window_manager.acquire(
+            self, self.height, self.width, self.ypos, self.xpos, erase=False)
+        self.draw_chrome()
+        self.dirty = False
+        self._blit()
+
+    def close(self):
+        """Frees the pad and its content."""
+        if self.pad is not None:
+            uni.delwin(self.pad)
+            self.pad = None
+            self._pad_size = (0, 0)
+        self.content_height = self.content_width = 0
+        self.top = self.left = 0
 
 
 if __name__ == "__main__":
+    import webbrowser
+
     try:
         win = Window()
 
@@ -494,36 +2618,42 @@ if __name__ == "__main__":
         textbox.add_line("clicking")
         win.add_widget("textbox", textbox)
 
+        # Menubar accelerators are global key bindings
+        keys = KeyDispatcher(menu.keymap)
+
         # Main loop
         while True:
             # Draw window and child widgets
             win.draw()
 
-            # Get keys
+            # Get keys (the screen must be up to date before blocking)
+            scheduler.flush()
             c = uni.getch()
 
             # Quit
             if c in QUIT_KEYS:
                 break
 
-            # Open submenus with corresponding key
-            if c in menu.menukeys.keys():
-                # Clear any opened menus
-                menu.reset()
+            # Redraw once a burst of resize events is over
+            if c == uni.KEY_RESIZE:
+                win.handle_resize()
+                continue
 
-                # Show submenu by keypress
-                menu.show_submenu(c)
+            # Open submenus with corresponding key
+            keys.dispatch(c)
 
             if c == uni.KEY_MOUSE:
                 click = Click()
                 if click.is_clicked:
-                    textbox.add_line(str(click.coords))
+                    click.locate(win)
+                    textbox.add_line("{0} {1}".format(
+                        click.coords, type(click.widget).__name__))
                     uni.mvaddstr(win.maxy, 0, "DEBUG: {0}".format(click.debug))
 
             if c != 539:
                 uni.mvaddstr(win.maxy, 0,
                              "DEBUG: Character pressed: {0}".format(c))
-            uni.refresh()
+            scheduler.request()
 
     except Exception as e:
         raw_input(e)